@@ -0,0 +1,198 @@
+import sys
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, UpdateOne
+
+import pothole_store
+
+CELLS_COLLECTION = "pothole_cells"
+ROADS_COLLECTION = "pothole_roads"
+
+# Geohash precisions kept up to date on every insert (2 is ~1250 km, 8 is ~40 m)
+CELL_PRECISIONS = range(2, 9)
+# Road segments are a road name within a precision-6 cell (~1.2 x 0.6 km)
+ROAD_SEGMENT_PRECISION = 6
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_indexes_ready = False
+
+
+def geohash_encode(lat, lon, precision):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits, bit_count, even = 0, 0, True
+    while len(geohash) < precision:
+        value_range, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits <<= 1
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(geohash)
+
+
+def zoom_to_precision(zoom):
+    # Roughly one cell per ~50 px tile area on a Google Maps zoom level
+    return min(max(int(zoom) // 2, CELL_PRECISIONS[0]), CELL_PRECISIONS[-1])
+
+
+def road_name(address):
+    # "12, Jalan Ampang, Kuala Lumpur, ..." -> "Jalan Ampang"
+    if not address or address == "Address not found":
+        return None
+    for part in address.split(','):
+        part = part.strip()
+        if part and not part.replace(' ', '').isdigit():
+            return part
+    return None
+
+
+def _cell_updates(frame):
+    location = frame.get('location')
+    if not location:
+        return []
+    lon, lat = location['coordinates']
+    potholes = int(frame.get('detections_count') or 0)
+    seen = frame.get('captured_at') or datetime.utcnow()
+    updates = []
+    for precision in CELL_PRECISIONS:
+        geohash = geohash_encode(lat, lon, precision)
+        updates.append(UpdateOne(
+            {'_id': f"{precision}:{geohash}"},
+            {
+                '$setOnInsert': {'precision': precision, 'geohash': geohash},
+                '$inc': {'frames': 1, 'potholes': potholes, 'lat_sum': lat, 'lon_sum': lon},
+                '$max': {'last_seen': seen},
+                '$set': {'sample_id': frame.get('_id'), 'location': location},
+            },
+            upsert=True
+        ))
+    return updates
+
+
+def _road_update(frame):
+    location = frame.get('location')
+    road = road_name((frame.get('info') or {}).get('address'))
+    if not location or not road:
+        return None
+    lon, lat = location['coordinates']
+    segment = geohash_encode(lat, lon, ROAD_SEGMENT_PRECISION)
+    potholes = int(frame.get('detections_count') or 0)
+    return UpdateOne(
+        {'_id': f"{road}|{segment}"},
+        {
+            '$setOnInsert': {'road': road, 'segment': segment},
+            '$inc': {'frames': 1, 'potholes': potholes, 'lat_sum': lat, 'lon_sum': lon},
+            '$max': {'max_potholes': potholes, 'last_seen': frame.get('captured_at') or datetime.utcnow()},
+            '$set': {'location': location},
+        },
+        upsert=True
+    )
+
+
+def ensure_indexes():
+    global _indexes_ready
+    cells = pothole_store.get_collection(CELLS_COLLECTION)
+    cells.create_index([('precision', ASCENDING), ('location', GEOSPHERE)])
+    roads = pothole_store.get_collection(ROADS_COLLECTION)
+    roads.create_index([('location', GEOSPHERE)])
+    roads.create_index([('potholes', DESCENDING)])
+    _indexes_ready = True
+
+
+def _collection(name):
+    if not _indexes_ready:
+        ensure_indexes()
+    return pothole_store.get_collection(name)
+
+
+def record_frames(frames):
+    """Fold newly stored frames into the per-cell and per-road-segment totals."""
+    cell_updates = []
+    road_updates = []
+    for frame in frames:
+        cell_updates.extend(_cell_updates(frame))
+        road_update = _road_update(frame)
+        if road_update is not None:
+            road_updates.append(road_update)
+    if cell_updates:
+        _collection(CELLS_COLLECTION).bulk_write(cell_updates, ordered=False)
+    if road_updates:
+        _collection(ROADS_COLLECTION).bulk_write(road_updates, ordered=False)
+
+
+def _centroid(doc):
+    return {
+        'latitude': doc['lat_sum'] / doc['frames'],
+        'longitude': doc['lon_sum'] / doc['frames'],
+    }
+
+
+def clusters(zoom, bbox=None, limit=2000):
+    """Pre-aggregated pothole counts per geohash cell for a zoom level and viewport."""
+    precision = zoom_to_precision(zoom)
+    query = {'precision': precision}
+    if bbox:
+        query['location'] = pothole_store.build_query(bbox=bbox)['location']
+    cursor = _collection(CELLS_COLLECTION).find(query).limit(limit)
+    return precision, [
+        {
+            'geohash': doc['geohash'],
+            'frames': doc['frames'],
+            'potholes': doc['potholes'],
+            'last_seen': doc['last_seen'].isoformat() if isinstance(doc.get('last_seen'), datetime) else None,
+            'sample_id': str(doc['sample_id']) if doc.get('sample_id') else None,
+            **_centroid(doc),
+        }
+        for doc in cursor
+    ]
+
+
+def road_segments(bbox=None, limit=100):
+    """Road segments ordered by total potholes detected."""
+    query = {}
+    if bbox:
+        query['location'] = pothole_store.build_query(bbox=bbox)['location']
+    cursor = _collection(ROADS_COLLECTION).find(query).sort('potholes', DESCENDING).limit(limit)
+    return [
+        {
+            'road': doc['road'],
+            'segment': doc['segment'],
+            'frames': doc['frames'],
+            'potholes': doc['potholes'],
+            'max_potholes': doc['max_potholes'],
+            'last_seen': doc['last_seen'].isoformat() if isinstance(doc.get('last_seen'), datetime) else None,
+            **_centroid(doc),
+        }
+        for doc in cursor
+    ]
+
+
+def rebuild():
+    """Recompute every aggregate from the stored potholes (for data saved before aggregation existed)."""
+    pothole_store.get_collection(CELLS_COLLECTION).delete_many({})
+    pothole_store.get_collection(ROADS_COLLECTION).delete_many({})
+    ensure_indexes()
+    batch = []
+    for frame in pothole_store.get_collection().find({}, pothole_store.META_PROJECTION):
+        batch.append(frame)
+        if len(batch) == 500:
+            record_frames(batch)
+            batch = []
+    record_frames(batch)
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path='../my-app/.env')
+    if sys.argv[1:] == ['rebuild']:
+        rebuild()
+    else:
+        print("Usage: python aggregates.py rebuild")
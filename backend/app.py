@@ -1,40 +1,60 @@
-from flask import Flask, request, Response, jsonify
+import time
+# Startup is timed from here and checked against IMPORT_TIME_BUDGET_S at the end of the module
+_import_started = time.perf_counter()
+from flask import Flask, request, Response, jsonify, g
 from flask_cors import CORS
-import supervision as sv
-import numpy as np
-from ultralytics import YOLO, RTDETR
 import cv2
 import os
 from werkzeug.utils import secure_filename
 import base64
-import requests  # Add this import statement
-import easyocr
-import re
-import os
+import json
+import logging
+import threading
+import uuid
 from dotenv import load_dotenv
-from google.cloud import vision
-from pymongo import MongoClient
-from azure.storage.blob import BlobServiceClient, BlobClient
-import torch
-import torchvision.transforms as T
-from transformers import DetrForObjectDetection, DetrImageProcessor
-import pytorch_lightning as pl
-import torch
-import cv2
-from detectron2.engine import DefaultPredictor
-from detectron2.config import get_cfg
-from detectron2 import model_zoo
+from bson.errors import InvalidId
+from datetime import datetime
+from contextlib import nullcontext
+from types import SimpleNamespace
+from detectors import DETECTION_THRESHOLDS, available_models, create_detector, split_model_name
+from model_registry import ModelRegistry
+from video_pipeline import VideoPipeline
+from frame_sampling import FrameSampler, SAMPLING_MODES
+from jobs import JobManager
+from ocr import OverlayOCR, OverlayChangeDetector, is_valid_overlay, overlay_crop
+from geocoding import GeocodeCache
+from comparison import MultiModelDetector, pairwise_agreement
+from tracking import PotholeTracker
+from rendering import DEFAULT_RENDERER, IMAGE_FORMATS, FrameRenderer, build_frame_result
+from image_cache import ImageCache, DERIVATIVE_SIZES, ORIGINAL
+from preprocessing import PreprocessedDetector, RoiPreprocessor, parse_roi, parse_inference_sizes
+from uploads import UploadManager, UploadError, UploadAborted, UploadOffsetMismatch, open_capture
+from remote_inference import RemoteDetector
+from batching import BatchingDetector
+from result_cache import CachedDetector, ResultCache, file_digest, fingerprint
+import pothole_store
+import aggregates
+import telemetry
 load_dotenv(dotenv_path='../my-app/.env')
 
 blob_service_url = f"https://{os.getenv('VITE_STORAGE_ACCOUNT_NAME')}.blob.core.windows.net"
-DEVICE = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
-CONFIDENCE_TRESHOLD = 0.5
-image_processor = DetrImageProcessor.from_pretrained('facebook/detr-resnet-50')
-# Initialize the BlobServiceClient
-blob_service_client = BlobServiceClient(account_url=blob_service_url, credential=os.getenv('VITE_AZURE_SAS_TOKEN'))
+_container_client = None
+_container_client_lock = threading.Lock()
 
-# Get the container client
-container_client = blob_service_client.get_container_client(os.getenv('VITE_CONTAINER_NAME'))
+def container_client():
+    # The Azure SDK is imported and the client created on the first blob download
+    global _container_client
+    with _container_client_lock:
+        if _container_client is None:
+            from azure.storage.blob import BlobServiceClient
+            # AZURE_STORAGE_CONNECTION_STRING points the client elsewhere instead,
+            # e.g. at a local Azurite emulator ("UseDevelopmentStorage=true")
+            if os.getenv('AZURE_STORAGE_CONNECTION_STRING'):
+                blob_service_client = BlobServiceClient.from_connection_string(os.getenv('AZURE_STORAGE_CONNECTION_STRING'))
+            else:
+                blob_service_client = BlobServiceClient(account_url=blob_service_url, credential=os.getenv('VITE_AZURE_SAS_TOKEN'))
+            _container_client = blob_service_client.get_container_client(os.getenv('VITE_CONTAINER_NAME'))
+        return _container_client
 
 
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "qualified-sum-446001-r2-5b5768312bd4.json"
@@ -42,503 +62,891 @@ app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 # model = YOLO("yolo11_117_epochs_best.pt")
 
+# Logging: LOG_LEVEL for the app's loggers; each message template is limited to
+# LOG_RATE_LIMIT_BURST records per LOG_RATE_LIMIT_INTERVAL_S so per-frame errors can't flood the log
+telemetry.configure_logging(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    burst=int(os.getenv('LOG_RATE_LIMIT_BURST', '10')),
+    interval_s=float(os.getenv('LOG_RATE_LIMIT_INTERVAL_S', '60'))
+)
+logger = logging.getLogger('potholytics')
+# Per-job span traces (GET /jobs/<id>/trace): TRACING=1 traces every job, otherwise only
+# requests sent with trace=1; the TRACE_MAX_JOBS most recent traces are kept
+tracer = telemetry.Tracer(
+    enabled=os.getenv('TRACING', '0') != '0',
+    max_traces=int(os.getenv('TRACE_MAX_JOBS', '50'))
+)
 
-# Add these lines near the top of the file with your model loading
-MODELS = {
-    'yolov11n': "SEA_yolo11n_200epochs.pt",
-    'yolov11l': "SEA_yolo11l_best.pt",
-    'rt-detr': "SEA_rt-detr.pt",
-    'detr': "SEA_DETR.ckpt",
-    'faster_rcnn': "SEA_Faster_RCNN_final.pth"
-}
 
-client = vision.ImageAnnotatorClient()
+# Dashcam overlay OCR: OCR_ENGINE is 'easyocr' (local, with cloud fallback unless
+# OCR_CLOUD_FALLBACK=0) or 'cloud' (Google Cloud Vision only)
+OCR_ENGINE = os.getenv('OCR_ENGINE', 'easyocr')
+OCR_CLOUD_FALLBACK = os.getenv('OCR_CLOUD_FALLBACK', '1') != '0'
+OCR_BATCH_SIZE = int(os.getenv('OCR_BATCH_SIZE', '8'))
+# Skip OCR and inference on frames whose overlay strip hasn't changed. Only the text after the
+# date and clock is compared, found from the word spacing; OVERLAY_CHANGE_REGION ("start,end"
+# fractions of the strip width) sets the compared columns explicitly instead.
+OVERLAY_CHANGE_DETECTION = os.getenv('OVERLAY_CHANGE_DETECTION', '1') != '0'
+OVERLAY_CHANGE_REGION = os.getenv('OVERLAY_CHANGE_REGION')
+OVERLAY_CHANGE_REGION = tuple(float(v) for v in OVERLAY_CHANGE_REGION.split(',')) if OVERLAY_CHANGE_REGION else None
+overlay_ocr = OverlayOCR(engine=OCR_ENGINE, cloud_fallback=OCR_CLOUD_FALLBACK)
+# Inference preprocessing: frames are cropped to ROAD_ROI ("top,bottom,left,right" fractions,
+# the OCR overlay strip is always cut off) and downsized to the model's inference size
+# (MODEL_INFERENCE_SIZES like "yolov11n=480,detr=800", 0 for full resolution)
+PREPROCESSING = os.getenv('PREPROCESSING', '1') != '0'
+ROAD_ROI = parse_roi(os.getenv('ROAD_ROI', '0,1,0,1'))
+MODEL_INFERENCE_SIZES = parse_inference_sizes(os.getenv('MODEL_INFERENCE_SIZES', ''))
+# ONNX Runtime threads for the "-onnx" / "-onnx-int8" model variants (0 = ONNX Runtime default)
+ONNX_INTRA_OP_THREADS = int(os.getenv('ONNX_INTRA_OP_THREADS', '0'))
+ONNX_INTER_OP_THREADS = int(os.getenv('ONNX_INTER_OP_THREADS', '1'))
+# SERVING_MODE=remote leaves the models to the inference server (inference_server.py, started
+# with the web workers by serve.py) listening on INFERENCE_SOCKET, so every web worker shares one
+# copy of each model; 'local' loads them in this process
+SERVING_MODE = os.getenv('SERVING_MODE', 'local')
+INFERENCE_SOCKET = os.getenv('INFERENCE_SOCKET', '/tmp/potholytics-inference.sock')
+INFERENCE_AUTHKEY = os.getenv('INFERENCE_AUTHKEY', 'potholytics').encode()
+# Micro-batching: concurrent predict() calls on a model, from any job or comparison, are merged into
+# forward passes of up to MICRO_BATCH_MAX_SIZE frames. A call waits at most MICRO_BATCH_MAX_WAIT_MS
+# for others to join, and less if INFERENCE_LATENCY_SLO_MS (0 = none) would otherwise be exceeded.
+# Requests are only batched together if they may run at once, so with micro-batching on models
+# have no concurrency limit by default (see DEFAULT_MODEL_CONCURRENCY).
+MICRO_BATCHING = os.getenv('MICRO_BATCHING', '1') != '0'
+MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', '16'))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', '10'))
+INFERENCE_LATENCY_SLO_MS = float(os.getenv('INFERENCE_LATENCY_SLO_MS', '0')) or None
+# /compare-models runs the requested models on each batch concurrently unless COMPARISON_PARALLEL=0
+COMPARISON_PARALLEL = os.getenv('COMPARISON_PARALLEL', '1') != '0'
 # Configure upload folder
 UPLOAD_FOLDER = 'uploads'
+# Chunked uploads: each session gets its own directory under UPLOAD_FOLDER and is dropped
+# after UPLOAD_SESSION_TTL_S without new chunks
+UPLOAD_SESSION_TTL_S = float(os.getenv('UPLOAD_SESSION_TTL_S', str(24 * 3600)))
+UPLOAD_MAX_CHUNK_MB = float(os.getenv('UPLOAD_MAX_CHUNK_MB', '16'))
+# Number of sampled frames sent to the detector in one forward pass
+DETECTION_BATCH_SIZE = int(os.getenv('DETECTION_BATCH_SIZE', '8'))
+# Video pipeline sizing: bounded queue length between stages and worker threads for OCR / encoding
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '32'))
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '4'))
+ENCODE_WORKERS = int(os.getenv('ENCODE_WORKERS', '2'))
+# Default video sampling: seconds of video between processed frames and the sampling mode
+# (interval, keyframe or scene), both overridable per request
+SAMPLING_INTERVAL_S = float(os.getenv('SAMPLING_INTERVAL_S', '1.0'))
+SAMPLING_MODE = os.getenv('SAMPLING_MODE', 'interval')
+# Detection jobs: worker threads for queued jobs, and how many jobs and video requests may use each
+# model at once (MODEL_CONCURRENCY looks like "yolov11l=2,detr=1", other models use
+# DEFAULT_MODEL_CONCURRENCY; 0 is unlimited, the default with micro-batching, 1 without)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+DEFAULT_MODEL_CONCURRENCY = int(os.getenv('DEFAULT_MODEL_CONCURRENCY', '0' if MICRO_BATCHING else '1'))
+MODEL_CONCURRENCY = {
+    name.strip(): int(limit)
+    for name, limit in (item.split('=') for item in os.getenv('MODEL_CONCURRENCY', '').split(',') if '=' in item)
+}
+# Cross-frame dedup: TRACKING follows potholes across sampled frames and keeps only the best
+# frame of each (TRACK_LOST_AFTER is how many sampled frames a pothole may go unseen). Saved frames
+# holding a single pothole within POTHOLE_MERGE_RADIUS_M of a stored single pothole are merged into
+# it; off (0) by default, since frame positions are the vehicle's and 1 s samples at city speed are
+# ~8 m apart, so keep it to a few metres when enabled
+TRACKING = os.getenv('TRACKING', '1') != '0'
+TRACK_LOST_AFTER = int(os.getenv('TRACK_LOST_AFTER', '2'))
+TRACK_MATCH_THRESHOLD = float(os.getenv('TRACK_MATCH_THRESHOLD', '0.8'))
+POTHOLE_MERGE_RADIUS_M = float(os.getenv('POTHOLE_MERGE_RADIUS_M', '0'))
+# Frame results: the frame downscaled to RESULT_IMAGE_SCALE with the boxes drawn on it, encoded as
+# RESULT_IMAGE_FORMAT ('jpeg', 'webp', or 'boxes' for coordinates only, no image) at
+# RESULT_IMAGE_QUALITY. Requests can pick another format with the 'image_format' field; the
+# bundled frontend shows JPEG only.
+RESULT_IMAGE_FORMAT = os.getenv('RESULT_IMAGE_FORMAT', 'jpeg')
+if RESULT_IMAGE_FORMAT not in IMAGE_FORMATS:
+    raise ValueError(f"RESULT_IMAGE_FORMAT must be one of {', '.join(IMAGE_FORMATS)}")
+RESULT_IMAGE_QUALITY = int(os.getenv('RESULT_IMAGE_QUALITY', '95'))
+RESULT_IMAGE_SCALE = float(os.getenv('RESULT_IMAGE_SCALE', '0.25'))
+renderers = {
+    image_format: FrameRenderer(image_format, RESULT_IMAGE_QUALITY, RESULT_IMAGE_SCALE)
+    for image_format in IMAGE_FORMATS
+}
+# Page size for /get-pothole-data
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '500'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '5000'))
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
+upload_manager = UploadManager(os.path.join(UPLOAD_FOLDER, 'sessions'), keep_s=UPLOAD_SESSION_TTL_S)
 
 if not os.getenv('VITE_GOOGLE_MAPS_API_KEY'):
     raise ValueError("GOOGLE_MAPS_API_KEY environment variable is not set")
 
-def resize_image(image):
-    # Calculate new dimensions (25% of original)
-    width = int(image.shape[1] * 0.25)
-    height = int(image.shape[0] * 0.25)
-    # Resize image
-    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+# Reverse-geocoding cache: coordinates are rounded to GEOCODE_PRECISION decimals (4 is ~11 m)
+# and addresses are kept in memory and in a SQLite file for GEOCODE_TTL_DAYS
+geocode_cache = GeocodeCache(
+    os.getenv('VITE_GOOGLE_MAPS_API_KEY'),
+    db_path=os.getenv('GEOCODE_CACHE_PATH', 'geocode_cache.sqlite3'),
+    precision=int(os.getenv('GEOCODE_PRECISION', '4')),
+    ttl_s=float(os.getenv('GEOCODE_TTL_DAYS', '30')) * 24 * 3600,
+    max_memory_entries=int(os.getenv('GEOCODE_MEMORY_ENTRIES', '10000'))
+)
+
+# Result cache: finished runs are stored under RESULT_CACHE_DIR by the hash of the uploaded file,
+# the model(s) and the settings that shape the results, and a repeat upload is answered from
+# there (RESULT_CACHE_MB bounds the directory). Detections and overlay readings of sampled frames
+# are kept by pixel hash (up to RESULT_CACHE_FRAME_MB), so a video whose run was interrupted is
+# only OCR'd and run through the model again from the first frame not seen before.
+RESULT_CACHE = os.getenv('RESULT_CACHE', '1') != '0'
+result_cache = ResultCache(
+    os.getenv('RESULT_CACHE_DIR', 'result_cache'),
+    max_bytes=int(float(os.getenv('RESULT_CACHE_MB', '1024')) * 1024 ** 2),
+    max_frame_bytes=int(float(os.getenv('RESULT_CACHE_FRAME_MB', '64')) * 1024 ** 2)
+) if RESULT_CACHE else None
+
+# Overlay readings by crop pixels; readings that failed are attempted again next time
+read_overlays = result_cache.batched(
+    fingerprint('ocr', OCR_ENGINE, OCR_CLOUD_FALLBACK),
+    overlay_ocr.read,
+    lambda parsed: json.dumps(parsed).encode(),
+    json.loads,
+    cacheable=is_valid_overlay
+) if result_cache else overlay_ocr.read
+
+def get_address_from_coordinates(lat, lon):
+    return geocode_cache.address(lat, lon)
 
-def detect_text(frame):
+def extract_image_infos(images):
     """
-    Extract text from a single video frame using Google Cloud Vision API.
+    Read the dashcam overlay of each image (local OCR first, cloud OCR as
+    fallback) and look up the address for the parsed coordinates.
     """
-    # Convert frame (NumPy array) to bytes
-    _, encoded_image = cv2.imencode('.jpg', frame)
-    content = encoded_image.tobytes()
+    parsed_infos = read_overlays([overlay_crop(image) for image in images])
 
-    # Prepare image for Google Vision API
-    image = vision.Image(content=content)
-    response = client.text_detection(image=image)
+    # Resolve the whole batch at once so each street is looked up only once
+    located = [parsed for parsed in parsed_infos if parsed['latitude'] and parsed['longitude']]
+    addresses = geocode_cache.addresses([(parsed['latitude'], parsed['longitude']) for parsed in located])
+    address_by_id = {id(parsed): address for parsed, address in zip(located, addresses)}
 
-    if response.error.message:
-        raise Exception(response.error.message)
+    return [{**parsed, 'address': address_by_id.get(id(parsed))} for parsed in parsed_infos]
 
-    # Extract text from response
-    text = response.text_annotations[0].description if response.text_annotations else ""
-    return text.replace("\n", " ")  # Replace newlines with a space
+def extract_image_info(image):
+    return extract_image_infos([image])[0]
 
+def pothole_tracker():
+    # Like the overlay check, tracking state is per video
+    if not TRACKING:
+        return None
+    return PotholeTracker(lost_after=TRACK_LOST_AFTER, matching_threshold=TRACK_MATCH_THRESHOLD)
 
-def get_address_from_coordinates(lat, lon):
-    api_key = os.getenv('VITE_GOOGLE_MAPS_API_KEY')
-    url = f'https://maps.googleapis.com/maps/api/geocode/json?latlng={lat},{lon}&key={api_key}'
-    
-    response = requests.get(url)
-    result = response.json()
-    
-    if response.status_code == 200 and result['status'] == 'OK':
-        return result['results'][0]['formatted_address']
-    return "Address not found"
+def overlay_change_check():
+    # A fresh detector per video, since it remembers the previous overlay
+    if not OVERLAY_CHANGE_DETECTION:
+        return None
+    change_detector = OverlayChangeDetector(region=OVERLAY_CHANGE_REGION)
+    return lambda frame: change_detector.changed(overlay_crop(frame))
 
-def extract_image_info(image):
-   
-    # Get bottom portion of image
-    height = image.shape[0]
 
-    bottom_crop = image[height-100:height, :]
+# Models stay loaded between requests. MODEL_MEMORY_BUDGET_MB caps the memory they may
+# hold (least recently used models are evicted first) and WARM_MODELS lists models to
+# load at startup instead of on first use ("all" loads every model).
+def inference_size(name):
+    return MODEL_INFERENCE_SIZES.get(name, MODEL_INFERENCE_SIZES.get(split_model_name(name)[0]))
 
-    # Extract text using EasyOCR
-    text = detect_text(bottom_crop)
-    print("Extracted text:", text)  # Debug print
+def detector_fingerprint(name, path):
+    # Changes with anything that changes what the model returns for a frame, so
+    # retrained weights under the same file name don't reuse cached results
+    try:
+        stat = os.stat(path)
+        weights = (stat.st_size, stat.st_mtime)
+    except OSError:
+        weights = None
+    preprocessing = (ROAD_ROI, inference_size(name)) if PREPROCESSING else None
+    return fingerprint(name, path, weights, preprocessing, DETECTION_THRESHOLDS)
 
-    # Separate patterns for date and time
-    date_pattern = re.compile(r'(\d{2}-\d{2}-\d{4})')
-    time_pattern = re.compile(r'(\d{2}:\d{2}:\d{2})')
-    date_match = date_pattern.search(text)
-    time_match = time_pattern.search(text)
+def load_detector(name, path):
+    if SERVING_MODE == 'remote':
+        # Preprocessing still runs here, so only the cropped, downsized frames are shared
+        detector = RemoteDetector(name, INFERENCE_SOCKET, INFERENCE_AUTHKEY).load()
+    else:
+        detector = create_detector(name, path, ONNX_INTRA_OP_THREADS, ONNX_INTER_OP_THREADS)
+    detector = telemetry.InstrumentedDetector(detector, name)
+    # The inference server does the batching in remote mode
+    if MICRO_BATCHING and SERVING_MODE != 'remote':
+        detector = BatchingDetector(detector, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS, INFERENCE_LATENCY_SLO_MS)
+    # Preprocessing runs on the calling threads, ahead of the batch
+    if PREPROCESSING:
+        detector = PreprocessedDetector(detector, RoiPreprocessor(ROAD_ROI, inference_size(name)))
+    # Frames seen before skip preprocessing and inference alike
+    if result_cache is not None:
+        detector = CachedDetector(detector, result_cache, detector_fingerprint(name, path))
+    return detector
 
-    # Updated pattern to match the specific format with km/h
-    longitude_pattern = re.compile(r'km/h\s*E\s*(\d+\s*\.\s*\d+)')
-    latitude_pattern = re.compile(r',\s*[№N]\s*(\d+\s*\.\s*\d+)')  # Updated to capture potential spaces and both '№' and 'N'
-    
-    latitude_match = latitude_pattern.search(text)
-    longitude_match = longitude_pattern.search(text)
-
-    # Clean and convert latitude
-    latitude = None
-    if latitude_match:
-        lat_str = latitude_match.group(1)
-        # First remove all spaces
-        lat_str = lat_str.replace(" ", "")
-        # Then keep only digits and decimal point
-        lat_str = ''.join(char for char in lat_str if char.isdigit() or char == '.')
-        try:
-            latitude = float(lat_str)
-        except ValueError:
-            latitude = None
-
-    # Clean and convert longitude
-    longitude = None
-    if longitude_match:
-        long_str = longitude_match.group(1)
-        # First remove all spaces
-        long_str = long_str.replace(" ", "")
-        # Then keep only digits and decimal point
-        long_str = ''.join(char for char in long_str if char.isdigit() or char == '.')
+# In remote mode the inference server needs the model packages, not this process
+models_available, models_unavailable = available_models(check_dependencies=SERVING_MODE != 'remote')
+for name, missing in models_unavailable.items():
+    logger.warning("Model %s disabled, missing packages: %s", name, ', '.join(missing))
+model_registry = ModelRegistry(
+    {name: (lambda name=name, path=path: load_detector(name, path)) for name, path in models_available.items()},
+    memory_budget_mb=float(os.getenv('MODEL_MEMORY_BUDGET_MB', '0')) or None
+)
+# Results of queued jobs are spooled to UPLOAD_FOLDER/jobs until the job is forgotten
+job_manager = JobManager(
+    os.path.join(UPLOAD_FOLDER, 'jobs'),
+    max_workers=JOB_WORKERS,
+    model_concurrency=MODEL_CONCURRENCY,
+    default_model_concurrency=DEFAULT_MODEL_CONCURRENCY
+)
+
+# Warm-up runs in the background so the web server answers (and /healthz passes) straight
+# away; /readyz reports ready once it is done. WARM_OCR=1 also loads the local OCR engine.
+warm_models = os.getenv('WARM_MODELS', '')
+WARM_OCR = os.getenv('WARM_OCR', '0') != '0'
+
+def warm_up():
+    if warm_models:
+        model_registry.warm_up(None if warm_models == 'all' else [m.strip() for m in warm_models.split(',') if m.strip() in model_registry])
+    if WARM_OCR:
         try:
-            longitude = float(long_str)
-        except ValueError:
-            longitude = None
-
-    result = {
-        'date': date_match.group(1) if date_match else None,
-        'time': time_match.group(1) if time_match else None,
-        'latitude': latitude,
-        'longitude': longitude,
-        'address': get_address_from_coordinates(latitude, longitude) if latitude and longitude else None
+            overlay_ocr.warm_up()
+        except Exception:
+            logger.exception("Failed to warm up OCR")
+
+warm_up_thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+warm_up_thread.start()
+
+def job_counts():
+    counts = {}
+    for job in job_manager.jobs():
+        counts[job.status] = counts.get(job.status, 0) + 1
+    return [({'status': status}, count) for status, count in counts.items()]
+
+telemetry.Gauge('potholytics_jobs', 'Known detection jobs by status', ('status',), function=job_counts)
+telemetry.register_stats('potholytics_ocr', overlay_ocr.stats, counters={
+    'frames': 'Overlay crops read',
+    'local_hits': 'Overlays read by the local OCR engine',
+    'cloud_calls': 'Cloud OCR calls',
+    'cloud_hits': 'Overlays read by cloud OCR',
+    'cloud_errors': 'Cloud OCR calls that failed',
+    'failures': 'Overlays no engine could read',
+}, gauges={
+    'local_hit_rate': 'Share of overlays read locally',
+    'cloud_hit_rate': 'Share of cloud OCR calls that read the overlay',
+})
+telemetry.register_stats('potholytics_geocode', geocode_cache.stats, counters={
+    'memory_hits': 'Addresses served from memory',
+    'disk_hits': 'Addresses served from the SQLite cache',
+    'api_calls': 'Geocoding API calls',
+    'api_errors': 'Failed geocoding API calls',
+}, gauges={
+    'hit_ratio': 'Share of address lookups served from cache',
+})
+
+if result_cache is not None:
+    telemetry.register_stats('potholytics_result_cache', result_cache.stats, counters={
+        'hits': 'Runs answered from stored results',
+        'misses': 'Runs with no stored results',
+        'stored': 'Finished runs stored',
+        'frame_hits': 'Frame detections and overlay readings served from cache',
+        'frame_misses': 'Frame detections and overlay readings computed',
+    }, gauges={
+        'bytes': 'Size of the stored runs',
+        'frame_bytes': 'Size of the cached frame entries',
+    })
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    start = g.get('request_start')
+    if start is None:
+        return response
+    labels = {
+        'route': request.url_rule.rule if request.url_rule else 'unmatched',
+        'method': request.method,
+        'status': str(response.status_code),
+        'model': g.get('model', ''),
     }
-    return result
+    # Runs once the last chunk is sent, so streamed detections are timed to the end
+    response.call_on_close(lambda: telemetry.REQUEST_SECONDS.observe(time.perf_counter() - start, **labels))
+    return response
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness: the web server is up, whatever state the models are in
+    return jsonify({'status': 'ok', 'startup_s': startup_s}), 200
 
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness. Without parameters: 200 once the startup warm-up is done.
+    With ?model=<name>: 200 only while that model is loaded. The body
+    always lists which models are warm and which can't be loaded.
+    """
+    models = model_registry.stats()['models']
+    warm_up_done = not warm_up_thread.is_alive()
+    body = {
+        'serving_mode': SERVING_MODE,
+        'warm_up_done': warm_up_done,
+        'models': {name: 'warm' if entry['loaded'] else 'cold' for name, entry in models.items()},
+        'unavailable_models': models_unavailable,
+        'ocr_warm': overlay_ocr.warm,
+    }
+    model = request.args.get('model')
+    if model:
+        if model not in models:
+            return jsonify({**body, 'error': 'Unknown or unavailable model'}), 404
+        ready = models[model]['loaded']
+    else:
+        ready = warm_up_done
+    return jsonify({**body, 'ready': ready}), 200 if ready else 503
 
-class Detr(pl.LightningModule):
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(telemetry.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
-    def __init__(self, lr, lr_backbone, weight_decay):
-        super().__init__()
-        self.model = DetrForObjectDetection.from_pretrained(
-            pretrained_model_name_or_path='facebook/detr-resnet-50', 
-            num_labels= 1,
-            ignore_mismatched_sizes=True
-        )
-        
-        self.lr = lr
-        self.lr_backbone = lr_backbone
-        self.weight_decay = weight_decay
-
-    def forward(self, pixel_values, pixel_mask):
-        return self.model(pixel_values=pixel_values, pixel_mask=pixel_mask)
-
-    def common_step(self, batch, batch_idx):
-        pixel_values = batch["pixel_values"]
-        pixel_mask = batch["pixel_mask"]
-        labels = [{k: v.to(self.device) for k, v in t.items()} for t in batch["labels"]]
-
-        outputs = self.model(pixel_values=pixel_values, pixel_mask=pixel_mask, labels=labels)
-
-        loss = outputs.loss
-        loss_dict = outputs.loss_dict
-
-        return loss, loss_dict
-
-    def training_step(self, batch, batch_idx):
-        loss, loss_dict = self.common_step(batch, batch_idx)     
-        # logs metrics for each training_step, and the average across the epoch
-        self.log("training_loss", loss)
-        for k,v in loss_dict.items():
-            self.log("train_" + k, v.item())
-
-        return loss
-
-    def validation_step(self, batch, batch_idx):
-        loss, loss_dict = self.common_step(batch, batch_idx)     
-        self.log("validation/loss", loss)
-        for k, v in loss_dict.items():
-            self.log("validation_" + k, v.item())
-            
-        return loss
-
-    def configure_optimizers(self):
-        # DETR authors decided to use different learning rate for backbone
-        # you can learn more about it here: 
-        # - https://github.com/facebookresearch/detr/blob/3af9fa878e73b6894ce3596450a8d9b89d918ca9/main.py#L22-L23
-        # - https://github.com/facebookresearch/detr/blob/3af9fa878e73b6894ce3596450a8d9b89d918ca9/main.py#L131-L139
-        param_dicts = [
-            {
-                "params": [p for n, p in self.named_parameters() if "backbone" not in n and p.requires_grad]},
-            {
-                "params": [p for n, p in self.named_parameters() if "backbone" in n and p.requires_grad],
-                "lr": self.lr_backbone,
-            },
-        ]
-        return torch.optim.AdamW(param_dicts, lr=self.lr, weight_decay=self.weight_decay)
+@app.route('/models', methods=['GET'])
+def get_models():
+    # Report which models are loaded, their load time and resident size
+    return jsonify(model_registry.stats()), 200
 
-@app.route('/stop-detection', methods=['POST'])
-def stop_detection():
-    global is_detection_stopped
-    is_detection_stopped = True  # Set the flag to stop detection
-    return jsonify({'message': 'Detection stopped'}), 200
+def parse_detection_request(multi_model=False):
+    """
+    Validate the upload form shared by /detect-potholes, /jobs and
+    /compare-models (which takes a 'models' list instead of 'model').
+    Returns (options, None) on success or (None, error response).
+    """
+    if multi_model:
+        # Repeated 'models' fields or one comma-separated value, in display order
+        models = [m.strip() for value in request.form.getlist('models') for m in value.split(',') if m.strip()]
+        models = list(dict.fromkeys(models))
+        if len(models) < 2:
+            return None, (jsonify({'error': 'Select at least two different models'}), 400)
+        if any(model not in model_registry for model in models):
+            return None, (jsonify({'error': 'Invalid model selected'}), 400)
+        selected_model = '+'.join(models)
+    else:
+        # Get the selected model from the request, default to YOLOv11l if not specified
+        selected_model = request.form.get('model', 'yolov11l')
+        if selected_model not in model_registry:
+            return None, (jsonify({'error': 'Invalid model selected'}), 400)
+        models = [selected_model]
+    g.model = selected_model
 
-@app.route('/detect-potholes', methods=['POST'])
-def detect_potholes():
-    global is_detection_stopped
-    is_detection_stopped = False  # Reset the stop flag at the start
-    
-    # Get the selected model from the request, default to YOLOv11l if not specified
-    selected_model = request.form.get('model', 'yolov11l')
-    print(selected_model)
-    # Load the selected model
-    model_path = MODELS.get(selected_model)
-    if selected_model == "yolov11n" or selected_model == "yolov11l":
-        model = YOLO(model_path)
-    elif selected_model == "rt-detr":
-        model = RTDETR(model_path)
-    elif selected_model == "faster_rcnn":
-        cfg = get_cfg()
-        cfg.merge_from_file(model_zoo.get_config_file("COCO-Detection/faster_rcnn_R_50_FPN_1x.yaml"))  # Load model config from detectron2's model zoo
-        cfg.MODEL.WEIGHTS = 'C:/Users/longh/Documents/potholytics/backend/SEA_Faster_RCNN.pth'  # Path to your trained model weights
-        cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = 0.7  # Confidence threshold for predictions
-        cfg.MODEL.ROI_HEADS.NUM_CLASSES = 1  # Set number of classes (1 for your case)
-
-        # Force model to run on CPU
-        cfg.MODEL.DEVICE = 'cpu'
-
-        # Initialize the predictor with the configured settings
-        predictor = DefaultPredictor(cfg)
+    # Either a file in the form, or the id of a chunked upload (which may still be in progress)
+    upload = None
+    file = None
+    upload_id = request.form.get('upload_id')
+    if upload_id:
+        upload = upload_manager.get(upload_id)
+        if upload is None:
+            return None, (jsonify({'error': 'Upload not found'}), 404)
+        filename = upload.filename
     else:
-        model = Detr.load_from_checkpoint(lr=1e-4, lr_backbone=1e-5, weight_decay=1e-4, checkpoint_path=model_path)
-        DETR_CONFIDENCE_TRESHOLD = 0.5
-        DETR_IOU_TRESHOLD = 0.6
-    if not model_path:
-        return jsonify({'error': 'Invalid model selected'}), 400
-
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
-    try:
-        # Save the file temporarily
+        if 'file' not in request.files:
+            return None, (jsonify({'error': 'No file provided'}), 400)
+
+        file = request.files['file']
+        if file.filename == '':
+            return None, (jsonify({'error': 'No file selected'}), 400)
         filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-
-        # Check if file is MP4
-        is_video = filename.lower().endswith('.mp4')
-        detections = []
-        annotated_frames = []  # Store annotated frames
-        last_info = {
-        'date': None,
-        'time': None,
-        'latitude': None,
-        'longitude': None,
-        'address': None
-        }
-        
-        if is_video:
-            # Process video
-            cap = cv2.VideoCapture(filepath)
-            frame_count = 0
-            
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                if is_detection_stopped:  # Check if detection should stop
-                    break
-                if frame_count % 30 == 0:  # Process every 30th frame (1 fps)
-                    info = extract_image_info(frame)
-                    if info.get("latitude") == last_info.get("latitude") and info.get("longitude") == last_info.get("longitude"):
-                        frame_count += 1
-                        last_info = info
-                        continue
-                    else:
-                        last_info = info
-                        if selected_model == "yolov11n" or selected_model == "yolov11l" or selected_model == "rt-detr":
-                            print(1)
-                            results = model(frame)
-                            print(2)
-                            if len(results) >0:
-                                result = results[0]
-                                detection_data = sv.Detections.from_ultralytics(result)
-                            print(3)
-                            # Only process frames with detections
-                            if len(detection_data) !=0:
-                                # Create annotators
-                                box_annotator = sv.BoxAnnotator(thickness=4)
-                                label_annotator = sv.LabelAnnotator(text_thickness=2, text_scale=1)
-                                
-                                # Prepare labels
-                                labels = []
-                                for detection in detection_data:
-                                    confidence = float(detection[2])
-                                    class_id = int(detection[3])
-                                    labels.append(f"{model.names[int(class_id)]} {confidence:0.2f}")
-                                print(detection_data)
-                                # Annotate the frame
-                                frame = box_annotator.annotate(scene=frame, detections=detection_data)
-                                frame = label_annotator.annotate(scene=frame, detections=detection_data, labels=labels)
-                                
-                                # Resize the frame
-                                frame = resize_image(frame)
-                                
-                                # Convert frame to base64 for sending to frontend
-                                _, buffer = cv2.imencode('.jpg', frame)
-                                frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                                
-                                annotated_frames.insert(0, {
-                                    "info": info,
-                                    "image": frame_base64,
-                                    "detections_count": len(detection_data)
-                                })
-                            results = None
-                        elif selected_model == "faster_rcnn":
-                            outputs = predictor(frame)
-                            res = outputs['instances'].to('cpu')  # Move the results to CPU for easier manipulation
-                            # Draw the predictions on the image
-                            if len(res) !=0:
-                                for i, s in enumerate(res.scores.tolist()):
-                                    # Get bounding box coordinates and the score
-                                    box = res.pred_boxes.tensor.tolist()[i]
-                                    x1, y1, x2, y2 = map(int, box)
-                                    cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 255), 4)
-                                    cv2.putText(frame, f'{s:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 4)  # Display score above the box
-
-                                # Convert BGR (OpenCV) format to RGB (for matplotlib display)
-                                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                                frame = resize_image(frame)
-                                # Convert frame to base64 for sending to frontend
-                                _, buffer = cv2.imencode('.jpg', frame)
-                                frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                                annotated_frames.insert(0, {
-                                    "info": info,
-                                    "image": frame_base64,
-                                    "detections_count": len(res)
-                                })
-                            results = None
-                        else:
-                            with torch.no_grad():
-                            # load image and predict
-                                inputs = image_processor(images=frame, return_tensors='pt').to(DEVICE)
-                                outputs = model(**inputs)
-                                # post-process
-                                target_sizes = torch.tensor([frame.shape[:2]]).to(DEVICE)
-                                results = image_processor.post_process_object_detection(
-                                    outputs=outputs, 
-                                    threshold=DETR_CONFIDENCE_TRESHOLD, 
-                                    target_sizes=target_sizes
-                                )[0]
-                                if len(results) >0:
-                                    detection_data = sv.Detections.from_transformers(transformers_results=results).with_nms(threshold=DETR_IOU_TRESHOLD)
-                                if len(detection_data) !=0:
-                                    detection_data.with_nms(threshold=0.1)
-                                labels2 = []
-                                for detection in detection_data:
-                                    confidence = float(detection[2])
-                                    class_id = int(detection[3])
-                                    labels2.append(f"pothole {confidence:0.2f}")
-                                box_annotator = sv.BoxAnnotator(thickness=4)
-                                label_annotator = sv.LabelAnnotator(text_thickness=2, text_scale=1)
-
-                                frame = box_annotator.annotate(scene=frame, detections=detection_data)
-                                frame = label_annotator.annotate(scene=frame, detections=detection_data, labels=labels2)
-                                frame = resize_image(frame)
-                                # Convert frame to base64 for sending to frontend
-                                _, buffer = cv2.imencode('.jpg', frame)
-                                frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                                annotated_frames.insert(0, {
-                                    "info": info,
-                                    "image": frame_base64,
-                                    "detections_count": len(detection_data)
-                                })
-                            results = None
-
-                    # Process results
-                frame_count += 1
-            
-            cap.release()
 
-        else:
-            # Process image
-            frame = cv2.imread(filepath)
-            if is_detection_stopped:  # Check if detection should stop
-                return jsonify({'error': 'Detection stopped'}), 200
-
-            if selected_model == "yolov11n" or selected_model == "yolov11l" or selected_model == "rt-detr":
-                results = model(frame)
-                if len(results) > 0:
-                    result = results[0]
-                    detection_data = sv.Detections.from_ultralytics(result)
-                    
-                    # Only process if there are detections
-                    if len(detection_data) > 0:
-                        info = extract_image_info(frame)
-                        # Create annotators
-                        box_annotator = sv.BoxAnnotator(thickness=4)
-                        label_annotator = sv.LabelAnnotator(text_thickness=2, text_scale=1)
-                        # Prepare labels
-                        labels = []
-                        for detection in detection_data:
-                            confidence = float(detection[2])
-                            class_id = int(detection[3])
-                            labels.append(f"{model.names[int(class_id)]} {confidence:0.2f}")
-                        
-                        # Annotate the frame
-                        frame = box_annotator.annotate(scene=frame, detections=detection_data)
-                        frame = label_annotator.annotate(scene=frame, detections=detection_data, labels=labels)
-
-                        # Resize the frame
-                        frame = resize_image(frame)
-                        # Convert frame to base64
-                        _, buffer = cv2.imencode('.jpg', frame)
-                        frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                        annotated_frames.insert(0, {
-                            "info": info,
-                            "image": frame_base64,
-                            "detections_count": len(detection_data)
-                        })
-            elif selected_model == "faster_rcnn":
-                outputs = predictor(frame)
-                res = outputs['instances'].to('cpu')  # Move the results to CPU for easier manipulation
-                # Draw the predictions on the image
-                if len(res) !=0:
-                    info = extract_image_info(frame)
-                    for i, s in enumerate(res.scores.tolist()):
-                        # Get bounding box coordinates and the score
-                        box = res.pred_boxes.tensor.tolist()[i]
-                        x1, y1, x2, y2 = map(int, box)
-                        
-                        # Draw bounding box and label with score on the image
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 255), 4)
-                        cv2.putText(frame, f'pothole {s:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 4)  # Display score above the box
-
-                    # Convert BGR (OpenCV) format to RGB (for matplotlib display)
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    frame = resize_image(frame)
-                    # Convert frame to base64 for sending to frontend
-                    _, buffer = cv2.imencode('.jpg', frame)
-                    frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                    annotated_frames.insert(0, {
-                        "info": info,
-                        "image": frame_base64,
-                        "detections_count": len(res)
-                    })
-            else:
-                with torch.no_grad():
-                # load image and predict
-                    inputs = image_processor(images=frame, return_tensors='pt').to(DEVICE)
-                    outputs = model(**inputs)
-                    print(1)
-                    # post-process
-                    target_sizes = torch.tensor([frame.shape[:2]]).to(DEVICE)
-                    results = image_processor.post_process_object_detection(
-                        outputs=outputs, 
-                        threshold=CONFIDENCE_TRESHOLD, 
-                        target_sizes=target_sizes
-                    )[0]
-                    if len(results) >0:
-                        info = extract_image_info(frame)
-                        detection_data = sv.Detections.from_transformers(transformers_results=results)
-                    if len(detection_data) !=0:
-                        detection_data.with_nms(threshold=0.1)
-                    labels2 = []
-                    for detection in detection_data:
-                        confidence = float(detection[2])
-                        class_id = int(detection[3])
-                        labels2.append(f"pothole {confidence:0.2f}")
-                    box_annotator = sv.BoxAnnotator(thickness=4)
-                    label_annotator = sv.LabelAnnotator(text_thickness=2, text_scale=1)
-                    frame = box_annotator.annotate(scene=frame, detections=detection_data)
-                    frame = label_annotator.annotate(scene=frame, detections=detection_data, labels=labels2)
-                    # Resize the frame
-                    frame = resize_image(frame)
-                    # Convert frame to base64
-                    _, buffer = cv2.imencode('.jpg', frame)
-                    frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                    annotated_frames.insert(0, {
-                        "info": info,
-                        "image": frame_base64,
-                        "detections_count": len(detection_data)
-                    })
+    sampling_mode = request.form.get('sampling_mode', SAMPLING_MODE)
+    if sampling_mode not in SAMPLING_MODES:
+        return None, (jsonify({'error': 'Invalid sampling mode'}), 400)
+    try:
+        sampling_interval = float(request.form.get('sampling_interval', SAMPLING_INTERVAL_S))
+    except ValueError:
+        return None, (jsonify({'error': 'Invalid sampling interval'}), 400)
+    if sampling_interval <= 0:
+        return None, (jsonify({'error': 'Invalid sampling interval'}), 400)
+    image_format = request.form.get('image_format', RESULT_IMAGE_FORMAT)
+    if image_format not in renderers:
+        return None, (jsonify({'error': 'Invalid image format'}), 400)
+
+    return {
+        'model': selected_model,
+        'models': models,
+        'file': file,
+        'upload': upload,
+        'filename': filename,
+        'sampling_mode': sampling_mode,
+        'sampling_interval': sampling_interval,
+        'image_format': image_format,
+        # Record a span trace of this job even with TRACING off
+        'trace': request.form.get('trace') in ('1', 'true')
+    }, None
+
+def save_upload(options):
+    # Chunked uploads are already on disk (or arriving there)
+    if options['upload'] is not None:
+        return options['upload'].path
+    # Prefix uploads with a unique id so concurrent uploads with the same name don't overwrite each other
+    filepath = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_{options['filename']}")
+    options['file'].save(filepath)
+    return filepath
+
+def result_cache_key(options, track=True):
+    """
+    Key function (file digest -> key) under which the results of a run with
+    these options are stored: the file, the models and every setting that
+    changes which frames come out and what they hold.
+    """
+    settings = fingerprint(
+        [detector_fingerprint(name, models_available[name]) for name in options['models']],
+        options['sampling_mode'], options['sampling_interval'],
+        (TRACK_LOST_AFTER, TRACK_MATCH_THRESHOLD) if track and TRACKING else None,
+        ('overlay_change', OVERLAY_CHANGE_REGION) if OVERLAY_CHANGE_DETECTION else None,
+        (OCR_ENGINE, OCR_CLOUD_FALLBACK, geocode_cache.precision),
+        (options['image_format'], RESULT_IMAGE_QUALITY, RESULT_IMAGE_SCALE)
+    )
+    return lambda digest: fingerprint(digest, settings)
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """
+    Start a resumable upload. Body: {"filename": ..., "size": total bytes}.
+    Chunks are then sent with PATCH /uploads/<id>, and the id can be passed
+    to /detect-potholes or /jobs as upload_id before the upload finishes.
+    """
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename:
+        return jsonify({'error': 'No filename provided'}), 400
+    size = data.get('size')
+    if size is not None and (not isinstance(size, int) or size <= 0):
+        return jsonify({'error': 'Invalid size'}), 400
+    upload = upload_manager.create(filename, size)
+    return jsonify(upload.to_dict()), 201
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    # Where to resume: the offset is the number of bytes received so far
+    upload = upload_manager.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(upload.to_dict()), 200
+
+@app.route('/uploads/<upload_id>', methods=['PATCH'])
+def append_upload(upload_id):
+    """Append the raw request body at the Upload-Offset header; 409 carries the offset to resume from."""
+    upload = upload_manager.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'error': 'Missing or invalid Upload-Offset header'}), 400
+    if request.content_length and request.content_length > UPLOAD_MAX_CHUNK_MB * 1024 ** 2:
+        return jsonify({'error': 'Chunk too large'}), 413
+    try:
+        upload.append(offset, request.get_data(cache=False))
+        if request.headers.get('Upload-Complete') == '1':
+            upload.finish()
+    except UploadOffsetMismatch as e:
+        return jsonify({'error': str(e), **upload.to_dict()}), 409
+    except UploadError as e:
+        return jsonify({'error': str(e) or 'Upload aborted'}), 400
+    return jsonify(upload.to_dict()), 200
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def delete_upload(upload_id):
+    if upload_manager.get(upload_id) is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    upload_manager.remove(upload_id)
+    return '', 204
+
+@app.route('/ocr-stats', methods=['GET'])
+def get_ocr_stats():
+    # Hit rates of the local OCR path and the cloud fallback
+    return jsonify(overlay_ocr.stats()), 200
+
+@app.route('/geocode-stats', methods=['GET'])
+def get_geocode_stats():
+    # Cache hit ratio and API calls made by the reverse-geocoding cache
+    return jsonify(geocode_cache.stats()), 200
+
+@app.route('/result-cache-stats', methods=['GET'])
+def get_result_cache_stats():
+    if result_cache is None:
+        return jsonify({'error': 'Result cache is disabled'}), 404
+    return jsonify(result_cache.stats()), 200
+
+@app.route('/stop-detection', methods=['POST'])
+def stop_detection():
+    # Cancel a single detection job; the job id comes from /jobs or the first streamed event
+    data = request.get_json(silent=True) or request.form
+    job_id = data.get('job_id')
+    if not job_id:
+        return jsonify({'error': 'No job_id provided'}), 400
+    if not job_manager.cancel(job_id):
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'message': 'Detection stopped', 'job_id': job_id}), 200
+
+def parse_stream_format():
+    # Streaming mode: NDJSON or Server-Sent Events, chosen by the 'stream' form field or the Accept header
+    stream_format = request.form.get('stream')
+    if not stream_format:
+        if request.accept_mimetypes.best == 'application/x-ndjson':
+            stream_format = 'ndjson'
+        elif request.accept_mimetypes.best == 'text/event-stream':
+            stream_format = 'sse'
+    return stream_format
+
+def respond_with_frames(options, loaded_model, encode=None, track=True, summary=None, cleanup=None):
+    """
+    Run detection on the uploaded file on this thread and return the frames,
+    streamed or as one JSON document. summary() adds fields to the final
+    response (the 'done' event when streaming). cleanup() runs once the
+    response is over, whether the run finished, failed or the client went
+    away.
+    """
+    stream_format = parse_stream_format()
+    if stream_format and stream_format not in STREAM_FORMATS:
+        if cleanup:
+            cleanup()
+        return jsonify({'error': 'Invalid stream format'}), 400
+
+    # Save the file temporarily
+    filepath = save_upload(options)
+
+    # Check if file is MP4
+    is_video = options['filename'].lower().endswith('.mp4')
+    sampler = FrameSampler(interval_s=options['sampling_interval'], mode=options['sampling_mode'])
+    # The request runs on this thread, but is registered as a job so it can be cancelled on its own
+    job = job_manager.create(options['model'], options['filename'])
+    job.mark_running()
+    frame_results = generate_frame_results(
+        filepath, is_video, loaded_model, sampler, lambda: job.cancelled, job.report_progress, options['upload'],
+        encode=encode, track=track, trace=tracer.start(job.id, force=options['trace']),
+        cache_key=result_cache_key(options, track), renderer=renderers[options['image_format']],
+        # Videos take the same per-model limit as queued jobs, once the results aren't in result_cache.
+        # A single image is one predict call, so it isn't held up behind someone's whole video
+        model_slots=(lambda: job_manager.model_slots(options['models'], lambda: job.cancelled)) if is_video else None
+    )
+
+    if stream_format:
+        response = Response(
+            stream_frame_results(frame_results, stream_format, job, summary),
+            mimetype=STREAM_FORMATS[stream_format],
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Job-Id': job.id}
+        )
+        if cleanup:
+            # Runs when the server closes the response, even if the stream was never read
+            response.call_on_close(cleanup)
+        return response
+
+    try:
+        annotated_frames = []  # Store annotated frames, most recent first
+        for frame_result in frame_results:
+            annotated_frames.insert(0, frame_result)
+        job.mark_finished()
         return jsonify({
-            "frames": annotated_frames
+            "job_id": job.id,
+            "frames": annotated_frames,
+            **(summary() if summary else {})
         })
 
     except Exception as e:
+        logger.exception("Detection job %s failed", job.id)
+        job.mark_finished(error=str(e))
         return jsonify({'error': str(e)}), 500
     finally:
+        frame_results.close()
+        if cleanup:
+            cleanup()
+
+@app.route('/detect-potholes', methods=['POST'])
+def detect_potholes():
+    options, error = parse_detection_request()
+    if error:
+        return error
+    selected_model = options['model']
+    logger.debug("Detection requested with model %s", selected_model)
+
+    # Fetch the selected model from the registry (loaded once, then kept in memory)
+    try:
+        loaded_model = model_registry.get(selected_model)
+    except Exception as e:
+        return jsonify({'error': f'Failed to load model: {e}'}), 500
+
+    return respond_with_frames(options, loaded_model)
+
+@app.route('/compare-models', methods=['POST'])
+def compare_models():
+    """
+    Run several models over one upload in a single pass: the video is
+    decoded, OCR'd and geocoded once and each sampled frame goes to every
+    model. Each frame carries the per-model results side by side plus their
+    pairwise agreement; the response ends with per-model latency and
+    overall agreement statistics.
+    """
+    options, error = parse_detection_request(multi_model=True)
+    if error:
+        return error
+    try:
+        loaded_models = {name: model_registry.get(name) for name in options['models']}
+    except Exception as e:
+        return jsonify({'error': f'Failed to load model: {e}'}), 500
+
+    detector = MultiModelDetector(loaded_models, parallel=COMPARISON_PARALLEL)
+    renderer = renderers[options['image_format']]
+
+    def encode(frame, comparison, info):
+        results = {}
+        for name, detections in comparison.detections.items():
+            if len(detections):
+                result = build_frame_result(frame, detections, detector.labels(name, detections), info, renderer)
+                del result['info']
+            else:
+                result = {'detections_count': 0}
+            results[name] = result
+        return {'info': info, 'models': results, 'agreement': pairwise_agreement(comparison.detections)}
+
+    def summary():
+        return {'stats': detector.stats()}
+
+    # Each model takes its own inference lock inside MultiModelDetector
+    comparison_model = SimpleNamespace(model=detector, lock=nullcontext())
+    # Tracking would pick different best frames per model, so frames stay aligned instead.
+    # The detector's thread pool goes with the response, however the run ends
+    return respond_with_frames(
+        options, comparison_model, encode=encode, track=False, summary=summary, cleanup=detector.close
+    )
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a detection job and return its id immediately (202)."""
+    options, error = parse_detection_request()
+    if error:
+        return error
+    selected_model = options['model']
+    filepath = save_upload(options)
+    upload = options['upload']
+    is_video = options['filename'].lower().endswith('.mp4')
+    sampler = FrameSampler(interval_s=options['sampling_interval'], mode=options['sampling_mode'])
+
+    def work(job):
+        loaded_model = model_registry.get(selected_model)
+        frame_results = generate_frame_results(
+            filepath, is_video, loaded_model, sampler, lambda: job.cancelled, job.report_progress, upload,
+            trace=tracer.start(job.id, force=options['trace']), cache_key=result_cache_key(options),
+            renderer=renderers[options['image_format']]
+        )
+        try:
+            for frame_result in frame_results:
+                job.add_result(frame_result)
+        finally:
+            frame_results.close()
+
+    def cleanup():
+        # generate_frame_results removes the file, unless the job was cancelled before it started
+        if upload is not None:
+            upload_manager.remove(upload.id)
+        elif os.path.exists(filepath):
+            os.remove(filepath)
+
+    job = job_manager.submit(selected_model, options['filename'], work, cleanup)
+    return jsonify(job.to_dict()), 202
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify([job.to_dict() for job in job_manager.jobs()]), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    # Progress: status, frames processed / expected and ETA
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def get_job_results(job_id):
+    # Frames found so far; 'since' skips the first N so clients can poll incrementally
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    since = request.args.get('since', 0, type=int)
+    frames = job.results.since(since)
+    return jsonify({
+        **job.to_dict(),
+        "frames": frames[::-1],
+        "next": since + len(frames)
+    }), 200
+
+@app.route('/jobs/<job_id>/trace', methods=['GET'])
+def get_job_trace(job_id):
+    # Chrome trace event JSON (open in Perfetto); only for jobs run with tracing on
+    trace = tracer.get(job_id)
+    if trace is None:
+        return jsonify({'error': 'No trace for this job'}), 404
+    return jsonify(trace.to_chrome_trace()), 200
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if not job_manager.cancel(job_id):
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_manager.get(job_id).to_dict()), 200
+
+def generate_frame_results(filepath, is_video, loaded_model, sampler, should_stop, on_progress=None, upload=None,
+                           encode=None, track=True, trace=telemetry.NULL_TRACE, cache_key=None,
+                           renderer=DEFAULT_RENDERER, model_slots=None):
+    """
+    Yield the annotated result of every frame with detections, in frame
+    order, and remove the uploaded file once done. With a chunked upload,
+    video decoding starts on the chunks received so far. encode(frame,
+    detections, info) builds each result (renderer.render by default).
+    Stage timings go to trace. cache_key(file digest) names the results in
+    result_cache: a finished run is stored there and replayed for the same
+    file instead of being processed again. model_slots() is held while
+    the models run; it yields False if the run was cancelled while waiting.
+    """
+    writer = None
+    try:
+        digest = None
+        if cache_key is not None and result_cache is not None:
+            # A chunked upload still arriving is hashed once complete; its results are stored then
+            digest = upload.digest if upload is not None else file_digest(filepath)
+            cached = result_cache.results(cache_key(digest)) if digest else None
+            if cached is not None:
+                frames_count = 0
+                with trace.span('replay_cached'):
+                    for result in cached:
+                        frames_count += 1
+                        yield result
+                if on_progress:
+                    on_progress(frames_count, frames_count)
+                return
+            writer = result_cache.writer()
+
+        with (model_slots or nullcontext)() as acquired:
+            if acquired is False:
+                return
+            results = detect_frames(
+                filepath, is_video, loaded_model, sampler, should_stop, on_progress, upload, encode, track, trace,
+                renderer
+            )
+            try:
+                for result in results:
+                    if writer is not None:
+                        writer.add(result)
+                    yield result
+            finally:
+                # Stops the pipeline right away when the consumer goes away
+                results.close()
+
+        if writer is not None and not should_stop():
+            digest = digest or upload.digest
+            # Cancelled runs and aborted uploads are not stored; their frames are (see result_cache.py)
+            if digest:
+                writer.commit(cache_key(digest))
+                writer = None
+    finally:
+        if writer is not None:
+            writer.discard()
         # Clean up temporary file
-        if os.path.exists(filepath):
+        if upload is not None:
+            upload_manager.remove(upload.id)
+        elif os.path.exists(filepath):
             os.remove(filepath)
-            
+
+def detect_frames(filepath, is_video, loaded_model, sampler, should_stop, on_progress, upload, encode, track, trace,
+                  renderer):
+    # Runs one upload through OCR, detection and encoding for generate_frame_results
+    detector = loaded_model.model
+    if encode is None:
+        encode = lambda frame, detection_data, info: renderer.render(frame, detection_data, detector.labels(detection_data), info)
+    if is_video:
+        # Process video through the staged decode/OCR/detect/encode pipeline
+        yield from VideoPipeline(
+            filepath,
+            detector,
+            loaded_model.lock,
+            extract_image_infos,
+            encode,
+            sampler=sampler,
+            batch_size=DETECTION_BATCH_SIZE,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            ocr_workers=OCR_WORKERS,
+            ocr_batch_size=OCR_BATCH_SIZE,
+            encode_workers=ENCODE_WORKERS,
+            should_stop=should_stop,
+            on_progress=on_progress,
+            overlay_changed=overlay_change_check(),
+            tracker=pothole_tracker() if track else None,
+            trace=trace,
+            # Keyframe sampling needs the whole file for ffprobe
+            open_capture=(lambda stop: open_capture(upload, streaming=sampler.mode != 'keyframe', should_stop=stop)) if upload else None
+        )
+
+    else:
+        # Process image
+        if upload is not None:
+            try:
+                upload.wait_complete(should_stop)
+            except UploadAborted:
+                return
+        with trace.span('decode'):
+            frame = cv2.imread(filepath)
+        if should_stop():  # Check if detection should stop
+            return
+
+        telemetry.FRAMES_SAMPLED.inc()
+        with trace.span('detect_batch', frames=1):
+            with loaded_model.lock:
+                detection_data = detector.predict([frame])[0]
+        if on_progress:
+            on_progress(1, 1)
+        # Only process if there are detections
+        if len(detection_data) > 0:
+            with trace.span('ocr_batch', frames=1):
+                info = extract_image_info(frame)
+            with trace.span('encode_frame', detections=len(detection_data)):
+                result = encode(frame, detection_data, info)
+            yield result
+        else:
+            telemetry.FRAMES_DROPPED.inc(reason='no_detections')
+
+def stream_frame_results(frame_results, stream_format, job, summary=None):
+    """
+    Serialize frame results one event at a time. The WSGI server pulls the
+    next event only once the previous one has been written, so a slow client
+    backs up into the pipeline's bounded queues instead of server memory.
+    """
+    def event(event_type, payload):
+        if stream_format == 'sse':
+            return f"event: {event_type}\ndata: {json.dumps(payload)}\n\n"
+        return json.dumps({'type': event_type, **payload}) + "\n"
+
+    frames_count = 0
+    try:
+        # First event tells the client which job to cancel
+        yield event('job', {'job_id': job.id})
+        for frame_result in frame_results:
+            frames_count += 1
+            yield event('frame', frame_result)
+        job.mark_finished()
+        yield event('done', {'frames_count': frames_count, 'cancelled': job.cancelled, **(summary() if summary else {})})
+    except Exception as e:
+        logger.exception("Detection job %s failed", job.id)
+        job.mark_finished(error=str(e))
+        yield event('error', {'error': str(e)})
+    finally:
+        if job.finished_at is None:
+            # Client went away mid-stream: stop the pipeline and record the job as cancelled
+            job.cancel()
+            job.mark_finished()
+        frame_results.close()
+
 def insert_frames(frames):
     try:
-        # Create a MongoClient
-        client = MongoClient(os.environ["MONGODB_URI"])
-
-        # Connect to the database
-        database = client["potholytics"]
-        collection = database["potholes"]
-        print("MongoDB connection successful")
-        # Insert the frames into the collection
-        result = collection.insert_many(frames)
-        
-        # Close the connection
-        client.close()
+        # Insert the frames with the indexed location / capture time fields; frames at the spot
+        # of an already stored pothole only update it
+        new_frames = pothole_store.save_frames(frames, merge_radius_m=POTHOLE_MERGE_RADIUS_M)
+        # Keep the map's per-cell and per-road totals up to date incrementally
+        aggregates.record_frames(new_frames)
         return(True)
 
-    except Exception as e:
-        print("Failed to connect to MongoDB:", e)
+    except Exception:
+        logger.exception("Failed to save frames to MongoDB")
 
 @app.route('/save-detections', methods=['POST'])
 def save_detections():
@@ -548,67 +956,180 @@ def save_detections():
         if insert_result:
             return jsonify({'message': 'Detections saved successfully!'}), 201
         else:
-            print("Error")
             return jsonify({'message': 'Failed to save detections'}), 500
-    except Exception as e:
-        print("Error saving detections:", e)
+    except Exception:
+        logger.exception("Error saving detections")
         return jsonify({'message': 'Failed to save detections'}), 500
     
 
 
+def parse_date_arg(name):
+    value = request.args.get(name)
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
 @app.route('/get-pothole-data', methods=['GET'])
 def get_pothole_data():
+    """
+    One page of pothole records, without images unless fields=all.
+
+    Query parameters: limit, cursor (next_cursor of the previous page),
+    bbox=min_lon,min_lat,max_lon,max_lat, from / to (YYYY-MM-DD).
+    """
     try:
-        # Create a MongoClient
-        client = MongoClient(os.environ["MONGODB_URI"])
-        database = client["potholytics"]
-        collection = database["potholes"]
-        
-        # Retrieve all documents from the collection
-        pothole_data = list(collection.find({}))
-        
-        # Convert ObjectId to string
-        for pothole in pothole_data:
-            pothole['_id'] = str(pothole['_id'])  # Convert ObjectId to string
-        
-        # Close the connection
-        client.close()
-        
-        # Return the data as JSON
-        return jsonify(pothole_data), 200
-    except Exception as e:
-        print("Error retrieving data:", e)
+        limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+        include_image = request.args.get('fields') == 'all'
+        bbox = parse_bbox_arg()
+        date_to = parse_date_arg('to')
+        query = pothole_store.build_query(
+            bbox=bbox,
+            date_from=parse_date_arg('from'),
+            # 'to' is inclusive of the whole day
+            date_to=date_to.replace(hour=23, minute=59, second=59) if date_to else None,
+            after=request.args.get('cursor')
+        )
+    except (ValueError, InvalidId) as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
+
+    try:
+        cursor = pothole_store.find_potholes(query, limit, include_image=include_image)
+    except Exception:
+        logger.exception("Error retrieving pothole data")
+        return jsonify({'error': 'Failed to retrieve data'}), 500
+
+    def generate():
+        # Serialize one document at a time instead of building the whole page in memory
+        yield '{"items": ['
+        last_id = None
+        count = 0
+        has_more = False
+        for pothole in cursor:
+            if count == limit:
+                has_more = True
+                break
+            pothole = pothole_store.serialize(pothole)
+            yield (',' if count else '') + json.dumps(pothole)
+            last_id = pothole['_id']
+            count += 1
+        cursor.close()
+        yield '], "next_cursor": ' + json.dumps(last_id if has_more else None) + '}'
+
+    return Response(generate(), mimetype='application/json')
+
+def parse_bbox_arg():
+    bbox = request.args.get('bbox')
+    bbox = tuple(float(v) for v in bbox.split(',')) if bbox else None
+    if bbox and len(bbox) != 4:
+        raise ValueError('bbox needs 4 values')
+    return bbox
+
+@app.route('/pothole-clusters', methods=['GET'])
+def get_pothole_clusters():
+    """Pothole counts per geohash cell for a map zoom level and bbox=min_lon,min_lat,max_lon,max_lat."""
+    try:
+        zoom = request.args.get('zoom', 10, type=float)
+        bbox = parse_bbox_arg()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
+    try:
+        precision, cells = aggregates.clusters(zoom, bbox)
+    except Exception:
+        logger.exception("Error retrieving clusters")
+        return jsonify({'error': 'Failed to retrieve clusters'}), 500
+    return jsonify({'precision': precision, 'clusters': cells}), 200
+
+@app.route('/road-segments', methods=['GET'])
+def get_road_segments():
+    """Per-road-segment pothole totals, most affected first."""
+    try:
+        bbox = parse_bbox_arg()
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
+    try:
+        return jsonify({'segments': aggregates.road_segments(bbox, limit)}), 200
+    except Exception:
+        logger.exception("Error retrieving road segments")
+        return jsonify({'error': 'Failed to retrieve road segments'}), 500
+
+@app.route('/get-pothole-data/<pothole_id>/image', methods=['GET'])
+def get_pothole_image(pothole_id):
+    try:
+        image = pothole_store.find_pothole_image(pothole_id)
+    except InvalidId:
+        return jsonify({'error': 'Invalid id'}), 400
+    except Exception:
+        logger.exception("Error retrieving pothole data")
         return jsonify({'error': 'Failed to retrieve data'}), 500
+    if image is None:
+        return jsonify({'error': 'Pothole not found'}), 404
+    return jsonify({'image': image}), 200
+
+def download_blob(blob_name):
+    blob_data = container_client().download_blob(blob_name)
+    return blob_data.readall()  # Read the blob data into memory
 
-def retrieve_image(blob_url):
-    container_client = blob_service_client.get_container_client(os.getenv("VITE_CONTAINER_NAME"))
+# Blob images and their thumbnail / medium previews, cached in memory and on disk
+image_cache = ImageCache(
+    download_blob,
+    cache_dir=os.getenv('IMAGE_CACHE_DIR', 'image_cache'),
+    max_disk_bytes=int(float(os.getenv('IMAGE_CACHE_DISK_MB', '512')) * 1024 ** 2),
+    max_memory_bytes=int(float(os.getenv('IMAGE_CACHE_MEMORY_MB', '64')) * 1024 ** 2)
+)
+
+def retrieve_image(blob_url, size=ORIGINAL):
     blob_name = blob_url.split("/").pop().split("?")[0]
-    blob_data = container_client.download_blob(blob_name)
-    image_data = blob_data.readall()  # Read the blob data into memory
-    return image_data
+    return image_cache.get(blob_name, size)
 
 # Flask route to fetch the image and return it as Base64
 @app.route('/get_image', methods=['GET'])
 def get_image():
     # Extract the blob URL from the query parameters
     blob_url = request.args.get('blob_url')
-    print(blob_url)
+    logger.debug("Image requested: %s", blob_url)
 
     if not blob_url:
         return jsonify({"error": "No blob_url provided"}), 400
+
+    # size is 'original' (default), 'thumb' or 'medium'
+    size = request.args.get('size', ORIGINAL)
+    if size != ORIGINAL and size not in DERIVATIVE_SIZES:
+        return jsonify({"error": "Invalid size"}), 400
     
     try:
         # Retrieve the image data as bytes
-        image_data = retrieve_image(blob_url)
+        image_data = retrieve_image(blob_url, size)
         
         # Encode the image data to Base64
         image_base64 = base64.b64encode(image_data).decode('utf-8')  # Decode to get a string
 
-        # Return the Base64 string as a JSON response
-        return jsonify({"image_base64": image_base64})
+        # Return the Base64 string as a JSON response; a blob's content never changes
+        response = jsonify({"image_base64": image_base64})
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+        return response
     except Exception as e:
+        logger.exception("Error retrieving image %s", blob_url)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/image-cache-stats', methods=['GET'])
+def get_image_cache_stats():
+    return jsonify(image_cache.stats()), 200
+
+telemetry.register_stats('potholytics_image_cache', image_cache.stats, counters={
+    'memory_hits': 'Images served from memory',
+    'disk_hits': 'Images served from the disk cache',
+    'downloads': 'Images downloaded from blob storage',
+}, gauges={
+    'hit_ratio': 'Share of image requests served from cache',
+})
+
+# Module import time, without the background warm-up; python import_budget.py breaks it down
+startup_s = round(time.perf_counter() - _import_started, 2)
+IMPORT_TIME_BUDGET_S = float(os.getenv('IMPORT_TIME_BUDGET_S', '5'))
+if startup_s > IMPORT_TIME_BUDGET_S:
+    logger.warning("Startup took %.2fs, over the %.1fs budget", startup_s, IMPORT_TIME_BUDGET_S)
+else:
+    logger.info("Started in %.2fs", startup_s)
+
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,200 @@
+import collections
+import os
+import threading
+import time
+
+import telemetry
+
+# Weight of the newest sample in the running estimates
+EWMA_ALPHA = 0.2
+# A thread that called predict() this recently may call again soon, so it is worth waiting for
+ACTIVE_CALLER_S = 2.0
+
+
+class _Request:
+    __slots__ = ('frames', 'caller', 'arrived', 'done', 'result', 'error')
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.caller = threading.get_ident()
+        self.arrived = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchingDetector:
+    """
+    Merges concurrent predict() calls on one detector into micro-batches of
+    up to max_batch_size frames, run by a single scheduler thread, and hands
+    each caller back its own slice of the results.
+
+    A batch is sent as soon as it is full. Otherwise the oldest waiting call
+    is held back for other calls to join for at most max_wait_ms, and
+    never so long that the estimated inference time of the batch would take
+    it past latency_slo_ms. It does not wait at all when every recently
+    active caller is already queued, or when the recent arrival rate says
+    no other call will come in time, so a single user's frames go straight
+    through.
+    """
+    # Callers don't need the registry's per-model lock; the scheduler thread serializes inference
+    thread_safe = True
+
+    def __init__(self, detector, max_batch_size=16, max_wait_ms=10.0, latency_slo_ms=None):
+        self.detector = detector
+        self.name = detector.name
+        self.model_path = getattr(detector, 'model_path', None)
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.latency_slo_s = latency_slo_ms / 1000 if latency_slo_ms else None
+
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        # Used by callers once closed, when there is no scheduler thread any more
+        self._direct_lock = threading.Lock()
+        # Running estimates: inference seconds per frame, seconds between calls, frames per call
+        self._frame_s = None
+        self._interarrival_s = None
+        self._frames_per_call = None
+        self._last_arrival = None
+        # Thread id -> time of its last call
+        self._callers = {}
+
+        # The scheduler thread starts on first use, so a model loaded before a fork
+        # (inference_server.py) gets its thread in the process that uses it
+        self._scheduler_pid = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def model(self):
+        return self.detector.model
+
+    def labels(self, detections):
+        return self.detector.labels(detections)
+
+    def predict(self, frames):
+        frames = list(frames)
+        if not frames:
+            return []
+        self._ensure_scheduler()
+        request = _Request(frames)
+        with self._condition:
+            if self._closed:
+                request = None
+            else:
+                self._record_arrival(request)
+                self._queue.append(request)
+                self._condition.notify()
+        if request is None:
+            with self._direct_lock:
+                return self.detector.predict(frames)
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def close(self):
+        """Stop the scheduler once the queued calls are served; later calls run directly."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def _ensure_scheduler(self):
+        if self._scheduler_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._scheduler_pid != os.getpid():
+                threading.Thread(target=self._run, name=f'batcher-{self.name}', daemon=True).start()
+                self._scheduler_pid = os.getpid()
+
+    def _record_arrival(self, request):
+        if self._last_arrival is not None:
+            self._interarrival_s = _ewma(self._interarrival_s, request.arrived - self._last_arrival)
+        self._last_arrival = request.arrived
+        self._callers[request.caller] = request.arrived
+        if len(self._callers) > 64:
+            self._callers = {
+                caller: arrived for caller, arrived in self._callers.items()
+                if request.arrived - arrived < ACTIVE_CALLER_S
+            }
+        self._frames_per_call = _ewma(self._frames_per_call, len(request.frames))
+
+    def _queued_frames(self):
+        # Frames of the whole calls that fit in one batch (a larger single call goes alone)
+        total = 0
+        for request in self._queue:
+            if total and total + len(request.frames) > self.max_batch_size:
+                break
+            total += len(request.frames)
+        return total
+
+    def _wait_budget(self, frames):
+        """How much longer the oldest queued call may wait for others to join."""
+        now = time.perf_counter()
+        queued = {request.caller for request in self._queue}
+        if not any(caller not in queued and now - arrived < ACTIVE_CALLER_S for caller, arrived in self._callers.items()):
+            # Nobody else is around to join the batch
+            return 0
+        waited = now - self._queue[0].arrived
+        budget = self.max_wait_s - waited
+        if self.latency_slo_s is not None and self._frame_s is not None:
+            # Leave time to run the batch, plus the call we would be waiting for, within the SLO
+            expected_frames = frames + (self._frames_per_call or 1)
+            budget = min(budget, self.latency_slo_s - waited - self._frame_s * expected_frames)
+        # Don't wait for a call that, at the recent rate, won't arrive in time
+        if self._interarrival_s is None or self._last_arrival + self._interarrival_s > now + budget:
+            return 0
+        return budget
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                while True:
+                    frames = self._queued_frames()
+                    if frames >= self.max_batch_size:
+                        break
+                    budget = self._wait_budget(frames)
+                    if budget <= 0:
+                        break
+                    self._condition.wait(budget)
+                batch = self._take_batch()
+            self._execute(batch)
+
+    def _take_batch(self):
+        batch = [self._queue.popleft()]
+        total = len(batch[0].frames)
+        while self._queue and total + len(self._queue[0].frames) <= self.max_batch_size:
+            request = self._queue.popleft()
+            batch.append(request)
+            total += len(request.frames)
+        return batch
+
+    def _execute(self, batch):
+        start = time.perf_counter()
+        for request in batch:
+            telemetry.BATCH_WAIT_SECONDS.observe(start - request.arrived, model=self.name)
+        frames = [frame for request in batch for frame in request.frames]
+        try:
+            detections = self.detector.predict(frames)
+        except Exception as e:
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+        self._frame_s = _ewma(self._frame_s, (time.perf_counter() - start) / len(frames))
+
+        offset = 0
+        for request in batch:
+            request.result = detections[offset:offset + len(request.frames)]
+            offset += len(request.frames)
+            request.done.set()
+
+
+def _ewma(previous, sample):
+    return sample if previous is None else (1 - EWMA_ALPHA) * previous + EWMA_ALPHA * sample
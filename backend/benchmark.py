@@ -0,0 +1,418 @@
+"""
+Offline benchmark of the detection pipeline, stage by stage.
+
+Runs the real decode -> sample -> metadata -> detect -> encode pipeline on a
+synthetic dashcam video (or --video), and optionally single images
+(--images), for every model / batch size / thread count combination. OCR
+and geocoding are stubbed with a fixed, configurable delay so the numbers
+don't depend on the network or on what easyocr makes of synthetic text.
+Each combination runs in a fresh process so its peak RSS is its own.
+
+    python benchmark.py --models yolov11n,yolov11l --batch-sizes 1,8 --threads 1,4 --output results.json
+    python benchmark.py --baseline benchmarks/baseline.json --tolerance 0.15
+
+Reported per combination: sampled frames per second, p50 / p95 latency of
+each stage call (decode, ocr, inference, annotate, jpeg, base64) in ms,
+the mean per frame, and peak RSS. With --baseline the run is compared to a
+saved result file and the exit status is 1 if throughput dropped or a
+stage's p95 grew by more than --tolerance.
+"""
+import argparse
+import base64
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+import supervision as sv
+
+from detectors import MODELS, create_detector, split_model_name
+from evaluation import load_images
+from frame_sampling import FrameSampler
+from preprocessing import DEFAULT_INFERENCE_SIZES, PreprocessedDetector, RoiPreprocessor
+from rendering import DEFAULT_RENDERER
+from video_pipeline import VideoPipeline
+
+STAGES = ('decode', 'ocr', 'inference', 'annotate', 'jpeg', 'base64')
+SYNTHETIC_SEED = 1234
+
+
+def synthetic_frame(index, width, height, rng, start=datetime(2024, 6, 1, 8, 0, 0), fps=30):
+    """A grey road with dark pothole-like blobs and a dashcam overlay strip in the expected format."""
+    frame = np.full((height, width, 3), (90, 90, 90), dtype=np.uint8)
+    frame[: height // 3] = (200, 170, 120)  # Sky
+    for _ in range(rng.integers(1, 4)):
+        center = (int(rng.integers(width // 5, 4 * width // 5)), int(rng.integers(height // 2, height - 150)))
+        axes = (int(rng.integers(30, 120)), int(rng.integers(15, 50)))
+        cv2.ellipse(frame, center, axes, 0, 0, 360, (35, 35, 40), -1)
+    noise = rng.integers(0, 12, size=frame.shape, dtype=np.uint8)
+    frame = cv2.add(frame, noise)
+
+    moment = start + timedelta(seconds=index / fps)
+    latitude = 3.1390 + index * 0.00001
+    longitude = 101.6869 + index * 0.00001
+    text = f"{moment:%d-%m-%Y %H:%M:%S} 42km/h E {longitude:.5f} , N {latitude:.5f}"
+    cv2.rectangle(frame, (0, height - 100), (width, height), (0, 0, 0), -1)
+    cv2.putText(frame, text, (20, height - 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+    return frame
+
+
+def write_synthetic_video(path, seconds=30, fps=30, width=1920, height=1080):
+    rng = np.random.default_rng(SYNTHETIC_SEED)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for index in range(int(seconds * fps)):
+        writer.write(synthetic_frame(index, width, height, rng, fps=fps))
+    writer.release()
+    return path
+
+
+def synthetic_images(count=20, width=1920, height=1080):
+    rng = np.random.default_rng(SYNTHETIC_SEED)
+    return [(f"synthetic_{i}", synthetic_frame(i * 30, width, height, rng)) for i in range(count)]
+
+
+class StageTimes:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = {stage: [] for stage in STAGES}
+        self.frames = {stage: 0 for stage in STAGES}
+
+    def record(self, stage, seconds, frames=1):
+        with self._lock:
+            self.calls[stage].append(seconds)
+            self.frames[stage] += frames
+
+    def summary(self):
+        summary = {}
+        for stage in STAGES:
+            calls = self.calls[stage]
+            if not calls:
+                continue
+            summary[stage] = {
+                'calls': len(calls),
+                'p50_ms': round(1000 * float(np.percentile(calls, 50)), 2),
+                'p95_ms': round(1000 * float(np.percentile(calls, 95)), 2),
+                'per_frame_ms': round(1000 * sum(calls) / self.frames[stage], 2),
+            }
+        return summary
+
+
+class TimedSampler(FrameSampler):
+    # Time spent producing each candidate frame (decode plus grab()s over the skipped ones)
+    def __init__(self, times, **kwargs):
+        super().__init__(**kwargs)
+        self.times = times
+
+    def read(self, cap, source_path, should_stop=None):
+        frames = super().read(cap, source_path, should_stop)
+        while True:
+            start = time.perf_counter()
+            item = next(frames, None)
+            if item is None:
+                return
+            self.times.record('decode', time.perf_counter() - start)
+            yield item
+
+
+class TimedDetector:
+    """
+    Times predict() calls. Frames the model finds nothing on (likely, on
+    synthetic frames) get a placeholder box when placeholder is set, so the
+    annotation and encoding stages are always exercised.
+    """
+
+    def __init__(self, detector, times, placeholder=True):
+        self.detector = detector
+        self.times = times
+        self.placeholder = placeholder
+
+    def predict(self, frames):
+        start = time.perf_counter()
+        detections = self.detector.predict(frames)
+        self.times.record('inference', time.perf_counter() - start, len(frames))
+        if self.placeholder:
+            detections = [d if len(d) else self._placeholder(frame) for d, frame in zip(detections, frames)]
+        return detections
+
+    def _placeholder(self, frame):
+        height, width = frame.shape[:2]
+        return sv.Detections(
+            xyxy=np.array([[width * 0.4, height * 0.6, width * 0.6, height * 0.75]], dtype=np.float32),
+            confidence=np.array([0.5], dtype=np.float32),
+            class_id=np.array([0]),
+            data={'class_name': np.array(['pothole'])}
+        )
+
+    def labels(self, detections):
+        return self.detector.labels(detections)
+
+
+def stub_extract_infos(times, delay_s):
+    # Stands in for OCR + geocoding: fixed delay per batch, a new position for every frame
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def extract_infos(frames):
+        start = time.perf_counter()
+        if delay_s:
+            time.sleep(delay_s)
+        infos = []
+        with lock:
+            for _ in frames:
+                i = next(counter)
+                infos.append({
+                    'date': '01-06-2024', 'time': '08:00:00',
+                    'latitude': 3.1390 + i * 0.0001, 'longitude': 101.6869 + i * 0.0001,
+                    'address': 'Jalan Benchmark, Kuala Lumpur',
+                })
+        times.record('ocr', time.perf_counter() - start, len(frames))
+        return infos
+
+    return extract_infos
+
+
+def timed_encode(times, detector):
+    # The same steps as rendering.build_frame_result, timed one by one
+    def encode(frame, detections, info):
+        start = time.perf_counter()
+        annotated = DEFAULT_RENDERER.annotate(frame, detections, detector.labels(detections))
+        annotated_at = time.perf_counter()
+        _, buffer = cv2.imencode('.jpg', annotated, [cv2.IMWRITE_JPEG_QUALITY, DEFAULT_RENDERER.quality])
+        encoded_at = time.perf_counter()
+        image = base64.b64encode(buffer).decode('utf-8')
+        done_at = time.perf_counter()
+        times.record('annotate', annotated_at - start)
+        times.record('jpeg', encoded_at - annotated_at)
+        times.record('base64', done_at - encoded_at)
+        return {'info': info, 'image': image, 'detections_count': len(detections)}
+
+    return encode
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def load_benchmark_detector(name):
+    # Loaded the way the server loads it, with the default preprocessing
+    base = split_model_name(name)[0]
+    detector = create_detector(name, MODELS[base])
+    return PreprocessedDetector(detector, RoiPreprocessor(inference_size=DEFAULT_INFERENCE_SIZES.get(base)))
+
+
+def run_config(model, batch_size, threads, video_path, images, ocr_delay_s, interval_s, placeholder):
+    """Benchmark one combination in this process and return its results."""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        # ONNX variants run without torch
+        pass
+    cv2.setNumThreads(threads)
+
+    start = time.perf_counter()
+    detector = load_benchmark_detector(model)
+    load_s = time.perf_counter() - start
+
+    times = StageTimes()
+    timed_detector = TimedDetector(detector, times, placeholder)
+    encode = timed_encode(times, timed_detector)
+    result = {
+        'model': model,
+        'batch_size': batch_size,
+        'threads': threads,
+        'load_s': round(load_s, 2),
+    }
+
+    if video_path:
+        sampler = TimedSampler(times, interval_s=interval_s)
+        start = time.perf_counter()
+        outputs = sum(1 for _ in VideoPipeline(
+            video_path, timed_detector, threading.Lock(), stub_extract_infos(times, ocr_delay_s), encode,
+            sampler=sampler, batch_size=batch_size, ocr_workers=threads, encode_workers=threads
+        ))
+        elapsed = time.perf_counter() - start
+        sampled = len(times.calls['decode'])
+        result['video'] = {
+            'sampled_frames': sampled,
+            'results': outputs,
+            'wall_s': round(elapsed, 2),
+            'frames_per_s': round(sampled / elapsed, 2) if elapsed else None,
+            'stages': times.summary(),
+        }
+
+    if images:
+        times = StageTimes()
+        timed_detector.times = times
+        encode = timed_encode(times, timed_detector)
+        extract_infos = stub_extract_infos(times, ocr_delay_s)
+        start = time.perf_counter()
+        for offset in range(0, len(images), batch_size):
+            batch = [image for _, image in images[offset:offset + batch_size]]
+            infos = extract_infos(batch)
+            for frame, detections, info in zip(batch, timed_detector.predict(batch), infos):
+                encode(frame, detections, info)
+        elapsed = time.perf_counter() - start
+        result['images'] = {
+            'count': len(images),
+            'wall_s': round(elapsed, 2),
+            'images_per_s': round(len(images) / elapsed, 2) if elapsed else None,
+            'stages': times.summary(),
+        }
+
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def _child(result_queue, kwargs):
+    try:
+        result_queue.put(run_config(**kwargs))
+    except Exception as e:
+        result_queue.put({'model': kwargs['model'], 'batch_size': kwargs['batch_size'],
+                          'threads': kwargs['threads'], 'error': repr(e)})
+
+
+def run_isolated(**kwargs):
+    # A fresh interpreter per combination keeps peak RSS and warm caches separate
+    context = multiprocessing.get_context('spawn')
+    result_queue = context.Queue()
+    process = context.Process(target=_child, args=(result_queue, kwargs))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+
+def config_key(result):
+    return f"{result['model']}|batch={result['batch_size']}|threads={result['threads']}"
+
+
+def find_regressions(results, baseline, tolerance):
+    """Throughput drops and stage p95 increases beyond tolerance, compared to a baseline run."""
+    previous = {config_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(config_key(result))
+        if before is None or 'error' in result or 'error' in before:
+            continue
+        for source, rate in (('video', 'frames_per_s'), ('images', 'images_per_s')):
+            if source not in result or source not in before:
+                continue
+            old, new = before[source][rate], result[source][rate]
+            if old and new is not None and new < old * (1 - tolerance):
+                regressions.append(f"{config_key(result)} {source} {rate}: {old} -> {new}")
+            for stage, stats in result[source]['stages'].items():
+                old_stage = before[source]['stages'].get(stage)
+                if old_stage and stats['p95_ms'] > old_stage['p95_ms'] * (1 + tolerance):
+                    regressions.append(
+                        f"{config_key(result)} {source} {stage} p95: {old_stage['p95_ms']} -> {stats['p95_ms']} ms"
+                    )
+    return regressions
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+    }
+
+
+def print_result(result):
+    print(f"\n{config_key(result)}" + (f"  ERROR {result['error']}" if 'error' in result else
+                                       f"  load {result['load_s']}s  peak RSS {result['peak_rss_mb']} MB"))
+    for source, rate in (('video', 'frames_per_s'), ('images', 'images_per_s')):
+        if source not in result:
+            continue
+        print(f"  {source}: {result[source][rate]} {rate.replace('_per_s', '')}/s")
+        for stage, stats in result[source]['stages'].items():
+            print(f"    {stage:<10} p50 {stats['p50_ms']:>9} ms  p95 {stats['p95_ms']:>9} ms  "
+                  f"per frame {stats['per_frame_ms']:>9} ms  ({stats['calls']} calls)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', default=','.join(MODELS), help='comma-separated models (ONNX variants allowed)')
+    parser.add_argument('--batch-sizes', default='1,8')
+    parser.add_argument('--threads', default=str(os.cpu_count() or 1), help='comma-separated thread counts')
+    parser.add_argument('--video', help='video to use instead of the synthetic one')
+    parser.add_argument('--video-seconds', type=float, default=30, help='length of the synthetic video')
+    parser.add_argument('--images', help='directory of sample images; "synthetic" generates them')
+    parser.add_argument('--no-video', action='store_true', help='only benchmark images')
+    parser.add_argument('--interval', type=float, default=1.0, help='sampling interval in seconds')
+    parser.add_argument('--ocr-ms', type=float, default=0.0, help='simulated OCR + geocoding time per batch')
+    parser.add_argument('--no-placeholder', action='store_true',
+                        help="don't add a placeholder box to frames without detections")
+    parser.add_argument('--output', help='write results as JSON (usable as a later --baseline)')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    video_path = None
+    if not args.no_video:
+        video_path = args.video
+        if not video_path:
+            video_path = os.path.join(tempfile.mkdtemp(prefix='potholytics-bench-'), 'synthetic.mp4')
+            write_synthetic_video(video_path, seconds=args.video_seconds)
+    images = None
+    if args.images == 'synthetic':
+        images = synthetic_images()
+    elif args.images:
+        images = load_images(args.images)
+
+    results = []
+    for model, batch_size, threads in itertools.product(
+        args.models.split(','),
+        [int(b) for b in args.batch_sizes.split(',')],
+        [int(t) for t in args.threads.split(',')]
+    ):
+        result = run_isolated(
+            model=model, batch_size=batch_size, threads=threads, video_path=video_path, images=images,
+            ocr_delay_s=args.ocr_ms / 1000, interval_s=args.interval, placeholder=not args.no_placeholder
+        )
+        print_result(result)
+        results.append(result)
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {
+            'video': args.video or (f"synthetic {args.video_seconds}s" if video_path else None),
+            'images': args.images,
+            'interval_s': args.interval,
+            'ocr_ms': args.ocr_ms,
+            'placeholder': not args.no_placeholder,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
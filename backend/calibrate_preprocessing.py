@@ -0,0 +1,86 @@
+"""
+Calibrate the inference preprocessing (ROI crop and inference size) per model.
+
+For every model in MODELS and every candidate inference size / ROI it reports
+the mean CPU latency per frame and how well the detections match a reference:
+YOLO-format labels when --labels is given, otherwise the model's own output
+on the full, uncropped frame at full resolution.
+
+    python calibrate_preprocessing.py --images samples/ --sizes 320,480,640,960,0 --roi 0.35,1,0,1
+    python calibrate_preprocessing.py --video clip.mp4 --every 1 --output calibration.json
+
+An inference size of 0 means full resolution. Pick the smallest size whose
+F1 is still acceptable and set it with MODEL_INFERENCE_SIZES / ROAD_ROI.
+"""
+import argparse
+import json
+
+import numpy as np
+
+from detectors import MODELS, create_detector
+from evaluation import load_images, load_video_frames, load_labels, timed_predict, match_counts, f1_score
+from preprocessing import PreprocessedDetector, RoiPreprocessor, parse_roi
+
+
+def calibrate_model(name, frames, sizes, rois, labels_dir=None):
+    detector = create_detector(name, MODELS[name])
+    if labels_dir:
+        references = [load_labels(labels_dir, frame_name, frame.shape) for frame_name, frame in frames]
+    else:
+        baseline, _ = timed_predict(detector, frames)
+        references = [detections.xyxy for detections in baseline]
+
+    rows = []
+    for roi in rois:
+        for size in sizes:
+            preprocessed = PreprocessedDetector(detector, RoiPreprocessor(roi, size or None))
+            detections, latencies = timed_predict(preprocessed, frames)
+            totals = np.sum([match_counts(d, r) for d, r in zip(detections, references)], axis=0)
+            precision, recall, f1 = f1_score(*totals)
+            rows.append({
+                'model': name,
+                'roi': list(roi),
+                'inference_size': size or None,
+                'mean_latency_ms': round(1000 * float(np.mean(latencies)), 1),
+                'p95_latency_ms': round(1000 * float(np.percentile(latencies, 95)), 1),
+                'precision': precision,
+                'recall': recall,
+                'f1': f1,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--images', help='directory of sample frames')
+    source.add_argument('--video', help='video to sample frames from')
+    parser.add_argument('--every', type=float, default=1.0, help='seconds between frames taken from --video')
+    parser.add_argument('--labels', help='directory of YOLO-format labels named like the images')
+    parser.add_argument('--models', default=','.join(MODELS), help='comma-separated models to calibrate')
+    parser.add_argument('--sizes', default='320,480,640,960,0', help='inference sizes to try (0 = full resolution)')
+    parser.add_argument('--roi', help='road ROI "top,bottom,left,right" to try besides the full frame')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    frames = load_images(args.images) if args.images else load_video_frames(args.video, args.every)
+    if not frames:
+        parser.error('no frames found')
+    sizes = [int(size) for size in args.sizes.split(',')]
+    rois = [(0.0, 1.0, 0.0, 1.0)] + ([parse_roi(args.roi)] if args.roi else [])
+
+    results = []
+    print(f"{'model':<12} {'roi':<22} {'size':>6} {'mean ms':>9} {'p95 ms':>8} {'prec':>6} {'recall':>6} {'f1':>6}")
+    for name in args.models.split(','):
+        for row in calibrate_model(name, frames, sizes, rois, args.labels):
+            results.append(row)
+            print(f"{row['model']:<12} {str(tuple(row['roi'])):<22} {str(row['inference_size'] or 'full'):>6} "
+                  f"{row['mean_latency_ms']:>9} {row['p95_latency_ms']:>8} {row['precision']:>6} {row['recall']:>6} {row['f1']:>6}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'frames': len(frames), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
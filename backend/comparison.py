@@ -0,0 +1,111 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from evaluation import match_counts, f1_score
+
+
+class ComparisonResult:
+    """
+    The detections of every compared model on one frame. len() is the most
+    boxes any single model found, so pipeline code that drops frames
+    without detections keeps the frames where at least one model found
+    something.
+    """
+
+    def __init__(self, detections):
+        self.detections = detections
+
+    def __len__(self):
+        return max((len(detections) for detections in self.detections.values()), default=0)
+
+
+def pairwise_agreement(detections):
+    """F1 at IoU 0.5 between every pair of models' detections on one frame."""
+    agreement = []
+    for a, b in itertools.combinations(detections, 2):
+        _, _, f1 = f1_score(*match_counts(detections[a], detections[b].xyxy))
+        agreement.append({'models': [a, b], 'f1': f1})
+    return agreement
+
+
+class MultiModelDetector:
+    """
+    Runs the same batch of frames through several loaded models, in
+    parallel when there is more than one, and returns a ComparisonResult per
+    frame. Each model is still used under its own inference lock. Keeps
+    running latency, detection and agreement totals for stats().
+    """
+
+    def __init__(self, loaded_models, parallel=True):
+        # name -> LoadedModel, in the order the models were requested
+        self.loaded_models = loaded_models
+        self.pool = ThreadPoolExecutor(max_workers=len(loaded_models)) if parallel and len(loaded_models) > 1 else None
+        self._lock = threading.Lock()
+        self._frames = 0
+        self._models = {
+            name: {'inference_s': 0.0, 'detections': 0, 'frames_with_detections': 0}
+            for name in loaded_models
+        }
+        self._agreement = {pair: [0, 0, 0] for pair in itertools.combinations(loaded_models, 2)}
+
+    def _predict_one(self, name, frames):
+        entry = self.loaded_models[name]
+        start = time.perf_counter()
+        with entry.lock:
+            detections = entry.model.predict(frames)
+        return detections, time.perf_counter() - start
+
+    def predict(self, frames):
+        if not frames:
+            return []
+        if self.pool is not None:
+            futures = {name: self.pool.submit(self._predict_one, name, frames) for name in self.loaded_models}
+            outputs = {name: future.result() for name, future in futures.items()}
+        else:
+            outputs = {name: self._predict_one(name, frames) for name in self.loaded_models}
+
+        results = [
+            ComparisonResult({name: outputs[name][0][i] for name in self.loaded_models})
+            for i in range(len(frames))
+        ]
+        with self._lock:
+            self._frames += len(frames)
+            for name, (detections, elapsed) in outputs.items():
+                totals = self._models[name]
+                totals['inference_s'] += elapsed
+                totals['detections'] += sum(len(d) for d in detections)
+                totals['frames_with_detections'] += sum(1 for d in detections if len(d))
+            for result in results:
+                for (a, b), counts in self._agreement.items():
+                    for i, count in enumerate(match_counts(result.detections[a], result.detections[b].xyxy)):
+                        counts[i] += count
+        return results
+
+    def labels(self, name, detections):
+        return self.loaded_models[name].model.labels(detections)
+
+    def stats(self):
+        with self._lock:
+            frames = self._frames
+            return {
+                'frames': frames,
+                'models': {
+                    name: {
+                        'mean_latency_ms': round(1000 * totals['inference_s'] / frames, 1) if frames else None,
+                        'detections': totals['detections'],
+                        'frames_with_detections': totals['frames_with_detections'],
+                    }
+                    for name, totals in self._models.items()
+                },
+                # Precision / recall of the first model taking the second as reference
+                'agreement': [
+                    dict(zip(('precision', 'recall', 'f1'), f1_score(*counts)), models=list(pair))
+                    for pair, counts in self._agreement.items()
+                ],
+            }
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
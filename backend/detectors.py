@@ -0,0 +1,260 @@
+import importlib.util
+import os
+import threading
+import numpy as np
+import supervision as sv
+
+# Model name -> weights file
+MODELS = {
+    'yolov11n': "SEA_yolo11n_200epochs.pt",
+    'yolov11l': "SEA_yolo11l_best.pt",
+    'rt-detr': "SEA_rt-detr.pt",
+    'detr': "SEA_DETR.ckpt",
+    'faster_rcnn': "SEA_Faster_RCNN_final.pth"
+}
+
+# Exported variants, served through ONNX Runtime as "<model>-onnx" / "<model>-onnx-int8"
+# (see export_onnx.py); Faster R-CNN has no export path
+ONNX_VARIANTS = ('onnx', 'onnx-int8')
+ONNX_EXPORTABLE = ('yolov11n', 'yolov11l', 'rt-detr', 'detr')
+
+# Packages each model family needs. They are imported when a model is loaded, not with
+# this module, so the server starts without them and only the affected models are missing
+MODEL_DEPENDENCIES = {
+    'yolov11n': ('ultralytics',),
+    'yolov11l': ('ultralytics',),
+    'rt-detr': ('ultralytics',),
+    'detr': ('torch', 'pytorch_lightning', 'transformers'),
+    'faster_rcnn': ('torch', 'detectron2'),
+}
+ONNX_DEPENDENCIES = ('onnxruntime',)
+
+CONFIDENCE_TRESHOLD = 0.5
+DETR_CONFIDENCE_TRESHOLD = 0.5
+DETR_IOU_TRESHOLD = 0.6
+FASTER_RCNN_CONFIDENCE_TRESHOLD = 0.7
+# Ultralytics predict() defaults, so the exported ONNX models filter like the PyTorch path
+ULTRALYTICS_CONFIDENCE_TRESHOLD = 0.25
+ULTRALYTICS_IOU_TRESHOLD = 0.7
+# Part of the result cache key (see result_cache.py): cached detections are only reused under the same thresholds
+DETECTION_THRESHOLDS = {
+    'confidence': CONFIDENCE_TRESHOLD,
+    'detr_confidence': DETR_CONFIDENCE_TRESHOLD,
+    'detr_iou': DETR_IOU_TRESHOLD,
+    'faster_rcnn_confidence': FASTER_RCNN_CONFIDENCE_TRESHOLD,
+    'ultralytics_confidence': ULTRALYTICS_CONFIDENCE_TRESHOLD,
+    'ultralytics_iou': ULTRALYTICS_IOU_TRESHOLD,
+}
+
+_device = None
+_device_lock = threading.Lock()
+
+
+def torch_device():
+    global _device
+    with _device_lock:
+        if _device is None:
+            import torch
+            _device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
+        return _device
+
+
+def _with_class_name(detections, class_name='pothole'):
+    # Models trained with a single class don't always carry names, so fill them in
+    if 'class_name' not in detections.data:
+        detections.data['class_name'] = np.array([class_name] * len(detections))
+    return detections
+
+
+class Detector:
+    """
+    Common interface for the detection backends. predict() takes a list of
+    BGR frames and returns one sv.Detections per frame, with xyxy boxes in
+    frame coordinates, confidence, class_id and a 'class_name' data field.
+    """
+
+    # Whether predict() may be called from several threads at once; if not, the
+    # model registry serializes calls with a per-model lock
+    thread_safe = False
+
+    def __init__(self, name, model_path):
+        self.name = name
+        self.model_path = model_path
+        self.model = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def predict(self, frames):
+        raise NotImplementedError
+
+    def close(self):
+        # Called when the registry evicts the model; for wrappers that hold threads
+        pass
+
+    def labels(self, detections):
+        # "<class name> <confidence>", formatted over the whole array at once
+        return np.char.add(
+            np.asarray(detections.data['class_name'], dtype=str),
+            np.char.mod(' %0.2f', detections.confidence)
+        ).tolist()
+
+
+class UltralyticsDetector(Detector):
+
+    def __init__(self, name, model_path, model_class='YOLO'):
+        super().__init__(name, model_path)
+        # Name of the ultralytics class, imported on load
+        self.model_class = model_class
+
+    def load(self):
+        import ultralytics
+        self.model = getattr(ultralytics, self.model_class)(self.model_path)
+        return self
+
+    def predict(self, frames):
+        if not frames:
+            return []
+        # Ultralytics batches a list of images in a single forward pass
+        results = self.model(list(frames), verbose=False)
+        return [_with_class_name(sv.Detections.from_ultralytics(result)) for result in results]
+
+
+class FasterRCNNDetector(Detector):
+
+    def load(self):
+        from detectron2 import model_zoo
+        from detectron2.config import get_cfg
+        from detectron2.engine import DefaultPredictor
+
+        cfg = get_cfg()
+        cfg.merge_from_file(model_zoo.get_config_file("COCO-Detection/faster_rcnn_R_50_FPN_1x.yaml"))  # Load model config from detectron2's model zoo
+        cfg.MODEL.WEIGHTS = 'C:/Users/longh/Documents/potholytics/backend/SEA_Faster_RCNN.pth'  # Path to your trained model weights
+        cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = FASTER_RCNN_CONFIDENCE_TRESHOLD  # Confidence threshold for predictions
+        cfg.MODEL.ROI_HEADS.NUM_CLASSES = 1  # Set number of classes (1 for your case)
+
+        # Force model to run on CPU
+        cfg.MODEL.DEVICE = 'cpu'
+
+        # DefaultPredictor only takes one image at a time, so keep it for its
+        # preprocessing and call the underlying model with batched inputs
+        self.predictor = DefaultPredictor(cfg)
+        self.model = self.predictor.model
+        return self
+
+    def predict(self, frames):
+        import torch
+
+        if not frames:
+            return []
+        inputs = []
+        for frame in frames:
+            image = frame[:, :, ::-1] if self.predictor.input_format == "RGB" else frame
+            height, width = image.shape[:2]
+            image = self.predictor.aug.get_transform(image).apply_image(image)
+            image = torch.as_tensor(image.astype("float32").transpose(2, 0, 1))
+            inputs.append({"image": image, "height": height, "width": width})
+
+        with torch.no_grad():
+            outputs = self.model(inputs)
+        return [_with_class_name(sv.Detections.from_detectron2(output)) for output in outputs]
+
+
+class DetrDetector(Detector):
+
+    def load(self):
+        from transformers import DetrImageProcessor
+        from detr_model import Detr
+
+        self.image_processor = DetrImageProcessor.from_pretrained('facebook/detr-resnet-50')
+        self.model = Detr.load_from_checkpoint(lr=1e-4, lr_backbone=1e-5, weight_decay=1e-4, checkpoint_path=self.model_path)
+        self.model.to(torch_device())
+        self.model.eval()
+        return self
+
+    def predict(self, frames):
+        import torch
+
+        if not frames:
+            return []
+        # The processor pads the batch to a common size and returns the matching pixel_mask
+        inputs = self.image_processor(images=list(frames), return_tensors='pt').to(torch_device())
+        with torch.no_grad():
+            outputs = self.model(pixel_values=inputs['pixel_values'], pixel_mask=inputs['pixel_mask'])
+        target_sizes = torch.tensor([frame.shape[:2] for frame in frames]).to(torch_device())
+        results = self.image_processor.post_process_object_detection(
+            outputs=outputs,
+            threshold=DETR_CONFIDENCE_TRESHOLD,
+            target_sizes=target_sizes
+        )
+        return [
+            _with_class_name(sv.Detections.from_transformers(transformers_results=result).with_nms(threshold=DETR_IOU_TRESHOLD))
+            for result in results
+        ]
+
+
+DETECTOR_CLASSES = {
+    'yolov11n': lambda name, path: UltralyticsDetector(name, path, 'YOLO'),
+    'yolov11l': lambda name, path: UltralyticsDetector(name, path, 'YOLO'),
+    'rt-detr': lambda name, path: UltralyticsDetector(name, path, 'RTDETR'),
+    'detr': DetrDetector,
+    'faster_rcnn': FasterRCNNDetector
+}
+
+
+def split_model_name(name):
+    """'yolov11n-onnx-int8' -> ('yolov11n', 'onnx-int8'); plain names have no variant."""
+    for variant in sorted(ONNX_VARIANTS, key=len, reverse=True):
+        if name.endswith(f"-{variant}"):
+            return name[:-len(variant) - 1], variant
+    return name, None
+
+
+def onnx_model_path(model_path, variant):
+    root = os.path.splitext(model_path)[0]
+    return f"{root}.int8.onnx" if variant == 'onnx-int8' else f"{root}.onnx"
+
+
+def missing_dependencies(name):
+    """The packages a model (or ONNX variant) needs that are not installed."""
+    base, variant = split_model_name(name)
+    if variant:
+        needed = ONNX_DEPENDENCIES + (('transformers',) if base == 'detr' else ())
+    else:
+        needed = MODEL_DEPENDENCIES[base]
+    return [package for package in needed if importlib.util.find_spec(package) is None]
+
+
+def create_detector(name, model_path, intra_op_threads=0, inter_op_threads=0):
+    """
+    Build and load the detector for an entry in MODELS, or for an ONNX
+    variant of one ("yolov11n-onnx-int8") given the base model's path.
+    """
+    base, variant = split_model_name(name)
+    if variant:
+        from onnx_detectors import create_onnx_detector
+        return create_onnx_detector(
+            name, base, onnx_model_path(model_path, variant), intra_op_threads, inter_op_threads
+        ).load()
+    return DETECTOR_CLASSES[name](name, model_path).load()
+
+
+def available_models(check_dependencies=True):
+    """
+    Every model in MODELS plus the ONNX variants that have been exported
+    (export_onnx.py), split into {name: weights path} of the models whose
+    packages are installed and {name: missing packages} of the rest.
+    """
+    models = dict(MODELS)
+    for name in ONNX_EXPORTABLE:
+        for variant in ONNX_VARIANTS:
+            if os.path.exists(onnx_model_path(MODELS[name], variant)):
+                models[f"{name}-{variant}"] = MODELS[name]
+    available, unavailable = {}, {}
+    for name, path in models.items():
+        missing = missing_dependencies(name) if check_dependencies else []
+        if missing:
+            unavailable[name] = missing
+        else:
+            available[name] = path
+    return available, unavailable
@@ -0,0 +1,111 @@
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+import supervision as sv
+
+IOU_THRESHOLD = 0.5
+
+
+def load_images(images_dir):
+    paths = sorted(
+        path for path in glob.glob(os.path.join(images_dir, '*'))
+        if path.lower().endswith(('.jpg', '.jpeg', '.png'))
+    )
+    return [(os.path.splitext(os.path.basename(path))[0], cv2.imread(path)) for path in paths]
+
+
+def load_video_frames(video_path, every_s):
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, int(round(fps * every_s)))
+    frames = []
+    index = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % step == 0:
+            frames.append((f"frame_{index}", frame))
+        index += 1
+    cap.release()
+    return frames
+
+
+def load_labels(labels_dir, name, frame_shape):
+    # YOLO format: class cx cy w h, normalised to the image size
+    path = os.path.join(labels_dir, f"{name}.txt")
+    height, width = frame_shape[:2]
+    boxes = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 5:
+                    continue
+                cx, cy, w, h = (float(v) for v in parts[1:5])
+                boxes.append([(cx - w / 2) * width, (cy - h / 2) * height, (cx + w / 2) * width, (cy + h / 2) * height])
+    return np.array(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def timed_predict(detector, frames):
+    """Run detector one frame at a time; returns the detections and per-frame latencies in seconds."""
+    detector.predict([frames[0][1]])  # Warm-up
+    detections, latencies = [], []
+    for _, frame in frames:
+        start = time.perf_counter()
+        detections.append(detector.predict([frame])[0])
+        latencies.append(time.perf_counter() - start)
+    return detections, latencies
+
+
+def _matches(predicted, reference):
+    # Greedy one-to-one matching in confidence order; returns (confidences, is true positive)
+    order = np.argsort(-predicted.confidence) if predicted.confidence is not None else np.arange(len(predicted))
+    confidences = predicted.confidence[order] if predicted.confidence is not None else np.ones(len(predicted))
+    hits = np.zeros(len(predicted), dtype=bool)
+    if len(predicted) == 0 or len(reference) == 0:
+        return confidences, hits
+    iou = sv.box_iou_batch(predicted.xyxy[order], reference)
+    matched = set()
+    for i, row in enumerate(iou):
+        candidates = [j for j in np.argsort(-row) if row[j] >= IOU_THRESHOLD and j not in matched]
+        if candidates:
+            matched.add(candidates[0])
+            hits[i] = True
+    return confidences, hits
+
+
+def match_counts(predicted, reference):
+    """Matches at IOU_THRESHOLD; returns (true positives, predicted, reference)."""
+    _, hits = _matches(predicted, reference)
+    return int(hits.sum()), len(predicted), len(reference)
+
+
+def f1_score(true_positives, predicted, reference):
+    precision = true_positives / predicted if predicted else 1.0
+    recall = true_positives / reference if reference else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return round(precision, 3), round(recall, 3), round(f1, 3)
+
+
+def average_precision(detections, references):
+    """AP at IOU_THRESHOLD (all-point interpolation) over a set of frames."""
+    confidences, hits = [], []
+    for predicted, reference in zip(detections, references):
+        frame_confidences, frame_hits = _matches(predicted, reference)
+        confidences.append(frame_confidences)
+        hits.append(frame_hits)
+    total_reference = sum(len(reference) for reference in references)
+    if not total_reference:
+        return None
+    confidences = np.concatenate(confidences) if confidences else np.zeros(0)
+    hits = np.concatenate(hits) if hits else np.zeros(0, dtype=bool)
+    order = np.argsort(-confidences)
+    true_positives = np.cumsum(hits[order])
+    recall = np.concatenate([[0.0], true_positives / total_reference, [1.0]])
+    precision = np.concatenate([[1.0], true_positives / np.arange(1, len(order) + 1), [0.0]])
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    return round(float(np.sum((recall[1:] - recall[:-1]) * precision[1:])), 3)
@@ -0,0 +1,183 @@
+"""
+Export the models in MODELS to ONNX, optionally quantize them to INT8, and
+compare them against the PyTorch originals.
+
+    python export_onnx.py --models yolov11n,rt-detr --quantize dynamic
+    python export_onnx.py --quantize static --calibration-images samples/ --compare samples/ --labels samples/labels
+
+Each model is written next to its weights as <weights>.onnx, and as
+<weights>.int8.onnx when quantized; the server then offers it as
+"<model>-onnx" / "<model>-onnx-int8". --compare reports mean / p95 latency
+and AP@50 for each variant and the delta to PyTorch (AP is measured
+against --labels, or against the PyTorch output without labels).
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import torch
+
+from detectors import MODELS, ONNX_EXPORTABLE, create_detector, onnx_model_path
+from detr_model import Detr
+from evaluation import load_images, load_labels, timed_predict, average_precision
+
+# Shape traced for DETR; height and width stay dynamic in the exported graph
+DETR_TRACE_SHAPE = (800, 1333)
+OPSET = 17
+
+
+def export_ultralytics(name, model_path, output_path, image_size=640):
+    from ultralytics import YOLO, RTDETR
+    model = (RTDETR if name == 'rt-detr' else YOLO)(model_path)
+    exported = model.export(format='onnx', imgsz=image_size, dynamic=True, simplify=True, opset=OPSET)
+    os.replace(exported, output_path)
+
+
+class _DetrOutputs(torch.nn.Module):
+    # Return plain tensors instead of the transformers output object
+    def __init__(self, detr):
+        super().__init__()
+        self.detr = detr
+
+    def forward(self, pixel_values, pixel_mask):
+        outputs = self.detr(pixel_values=pixel_values, pixel_mask=pixel_mask)
+        return outputs.logits, outputs.pred_boxes
+
+
+def export_detr(model_path, output_path):
+    detr = Detr.load_from_checkpoint(lr=1e-4, lr_backbone=1e-5, weight_decay=1e-4, checkpoint_path=model_path, map_location='cpu')
+    detr.eval()
+    height, width = DETR_TRACE_SHAPE
+    pixel_values = torch.zeros(1, 3, height, width)
+    pixel_mask = torch.ones(1, height, width, dtype=torch.int64)
+    torch.onnx.export(
+        _DetrOutputs(detr.model), (pixel_values, pixel_mask), output_path,
+        input_names=['pixel_values', 'pixel_mask'],
+        output_names=['logits', 'pred_boxes'],
+        dynamic_axes={
+            'pixel_values': {0: 'batch', 2: 'height', 3: 'width'},
+            'pixel_mask': {0: 'batch', 1: 'height', 2: 'width'},
+            'logits': {0: 'batch'},
+            'pred_boxes': {0: 'batch'},
+        },
+        opset_version=OPSET
+    )
+
+
+def export(name):
+    model_path = MODELS[name]
+    output_path = onnx_model_path(model_path, 'onnx')
+    if name == 'detr':
+        export_detr(model_path, output_path)
+    else:
+        export_ultralytics(name, model_path, output_path)
+    return output_path
+
+
+def quantize(name, mode, calibration_frames=None):
+    """
+    INT8 quantization of the exported model. dynamic quantizes weights only
+    and needs no data; static also calibrates activation ranges on sample
+    frames, which is what makes conv-heavy models faster on CPU.
+    """
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    fp32_path = onnx_model_path(MODELS[name], 'onnx')
+    int8_path = onnx_model_path(MODELS[name], 'onnx-int8')
+    prepared_path = f"{os.path.splitext(fp32_path)[0]}.prep.onnx"
+    quant_pre_process(fp32_path, prepared_path)
+    try:
+        if mode == 'dynamic':
+            quantize_dynamic(prepared_path, int8_path, weight_type=QuantType.QInt8)
+            return int8_path
+
+        fp32_detector = create_detector(f"{name}-onnx", MODELS[name])
+
+        class FrameReader(CalibrationDataReader):
+            def __init__(self):
+                self.feeds = iter(fp32_detector.prepare([frame])[0] for _, frame in calibration_frames)
+
+            def get_next(self):
+                return next(self.feeds, None)
+
+        quantize_static(
+            prepared_path, int8_path, FrameReader(),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True
+        )
+        return int8_path
+    finally:
+        os.remove(prepared_path)
+
+
+def compare(name, variants, frames, labels_dir=None):
+    """Latency and AP@50 of each variant next to the PyTorch model."""
+    torch_detections, torch_latencies = timed_predict(create_detector(name, MODELS[name]), frames)
+    if labels_dir:
+        references = [load_labels(labels_dir, frame_name, frame.shape) for frame_name, frame in frames]
+    else:
+        references = [detections.xyxy for detections in torch_detections]
+
+    def summary(detections, latencies):
+        return {
+            'mean_latency_ms': round(1000 * float(np.mean(latencies)), 1),
+            'p95_latency_ms': round(1000 * float(np.percentile(latencies, 95)), 1),
+            'ap50': average_precision(detections, references),
+        }
+
+    baseline = summary(torch_detections, torch_latencies)
+    rows = [{'model': name, **baseline}]
+    for variant in variants:
+        variant_name = f"{name}-{variant}"
+        detections, latencies = timed_predict(create_detector(variant_name, MODELS[name]), frames)
+        row = {'model': variant_name, **summary(detections, latencies)}
+        row['latency_delta_ms'] = round(row['mean_latency_ms'] - baseline['mean_latency_ms'], 1)
+        row['speedup'] = round(baseline['mean_latency_ms'] / row['mean_latency_ms'], 2) if row['mean_latency_ms'] else None
+        if row['ap50'] is not None and baseline['ap50'] is not None:
+            row['ap50_delta'] = round(row['ap50'] - baseline['ap50'], 3)
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', default=','.join(ONNX_EXPORTABLE), help='comma-separated models to export')
+    parser.add_argument('--quantize', choices=('none', 'dynamic', 'static'), default='none')
+    parser.add_argument('--calibration-images', help='sample frames for static quantization')
+    parser.add_argument('--compare', help='directory of frames to compare the variants with PyTorch on')
+    parser.add_argument('--labels', help='YOLO-format labels for the --compare frames')
+    parser.add_argument('--output', help='write the comparison as JSON to this file')
+    args = parser.parse_args()
+
+    if args.quantize == 'static' and not args.calibration_images:
+        parser.error('--quantize static needs --calibration-images')
+    calibration_frames = load_images(args.calibration_images) if args.calibration_images else None
+
+    results = []
+    for name in args.models.split(','):
+        if name not in ONNX_EXPORTABLE:
+            print(f"{name}: no ONNX export path, skipped")
+            continue
+        print(f"{name}: exported to {export(name)}")
+        variants = ['onnx']
+        if args.quantize != 'none':
+            print(f"{name}: quantized ({args.quantize}) to {quantize(name, args.quantize, calibration_frames)}")
+            variants.append('onnx-int8')
+        if args.compare:
+            for row in compare(name, variants, load_images(args.compare), args.labels):
+                results.append(row)
+                print("  " + ", ".join(f"{key}={value}" for key, value in row.items()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
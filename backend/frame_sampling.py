@@ -0,0 +1,148 @@
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+SAMPLING_MODES = ('interval', 'keyframe', 'scene')
+DEFAULT_FPS = 30.0
+
+
+def video_fps(cap):
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    # Some containers report 0 or NaN, fall back to the usual dashcam rate
+    if not fps or fps != fps or fps > 1000:
+        return DEFAULT_FPS
+    return fps
+
+
+def keyframe_times(source_path):
+    """
+    Return the presentation times (seconds) of the video's keyframes using
+    ffprobe, or None when ffprobe isn't available or fails.
+    """
+    if not shutil.which('ffprobe'):
+        return None
+    try:
+        output = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-skip_frame', 'nokey',
+             '-show_entries', 'frame=pts_time', '-of', 'csv=p=0', source_path],
+            capture_output=True, text=True, timeout=60, check=True
+        ).stdout
+    except (subprocess.SubprocessError, OSError):
+        return None
+    times = []
+    for line in output.splitlines():
+        try:
+            times.append(float(line.strip().strip(',')))
+        except ValueError:
+            continue
+    return times or None
+
+
+class FrameSampler:
+    """
+    Picks which frames of a video get processed.
+
+    interval: one frame every interval_s seconds of video, based on the
+        video's real FPS. Frames in between are skipped with grab() (no
+        colour conversion / copy) or, for long gaps, by seeking.
+    keyframe: only decode keyframes (found with ffprobe), at most one per
+        interval_s. Falls back to interval mode without ffprobe.
+    scene: sample like interval mode, then only keep frames whose picture
+        has changed noticeably since the last kept frame (or max_gap_s has
+        passed).
+    """
+
+    def __init__(self, interval_s=1.0, mode='interval', scene_threshold=12.0,
+                 max_gap_s=10.0, seek_min_step=150, overlay_height=100):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {mode}")
+        self.interval_s = interval_s
+        self.mode = mode
+        self.scene_threshold = scene_threshold
+        self.max_gap_s = max_gap_s
+        self.seek_min_step = seek_min_step
+        self.overlay_height = overlay_height
+        self.fps = DEFAULT_FPS
+        # Number of candidate frames read() is expected to yield, once known
+        self.expected_count = None
+
+        self._last_thumbnail = None
+        self._last_kept_index = None
+
+    def read(self, cap, source_path, should_stop=None):
+        """Yield (frame_index, frame) for every candidate frame of an opened capture."""
+        should_stop = should_stop or (lambda: False)
+        self.fps = video_fps(cap)
+
+        if self.mode == 'keyframe':
+            times = keyframe_times(source_path)
+            if times is not None:
+                self.expected_count = len(self._spaced(times))
+                yield from self._read_keyframes(cap, times, should_stop)
+                return
+        yield from self._read_interval(cap, should_stop)
+
+    def accept(self, index, frame):
+        """Decide whether a candidate frame is kept (only filters in scene mode)."""
+        if self.mode != 'scene':
+            return True
+
+        # Compare a small greyscale thumbnail, leaving out the OCR overlay whose clock always changes
+        height = frame.shape[0]
+        content = frame[:height - self.overlay_height] if height > 2 * self.overlay_height else frame
+        thumbnail = cv2.resize(cv2.cvtColor(content, cv2.COLOR_BGR2GRAY), (64, 36), interpolation=cv2.INTER_AREA)
+        thumbnail = thumbnail.astype(np.int16)
+
+        keep = (
+            self._last_thumbnail is None
+            or np.abs(thumbnail - self._last_thumbnail).mean() > self.scene_threshold
+            or (index - self._last_kept_index) / self.fps >= self.max_gap_s
+        )
+        if keep:
+            self._last_thumbnail = thumbnail
+            self._last_kept_index = index
+        return keep
+
+    def _read_interval(self, cap, should_stop):
+        step = max(1, int(round(self.fps * self.interval_s)))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if total:
+            self.expected_count = (total + step - 1) // step
+        index = 0
+        while cap.isOpened() and not should_stop():
+            if total and index >= total:
+                break
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index, frame
+
+            index += step
+            if step >= self.seek_min_step:
+                # Long gap: seeking lands on the nearest keyframe and decodes forward from there
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            else:
+                # Short gap: grab() advances without converting or copying the skipped frames
+                for _ in range(step - 1):
+                    if not cap.grab():
+                        return
+
+    def _spaced(self, times):
+        # Keep keyframes that are at least interval_s apart
+        spaced = []
+        for t in times:
+            if not spaced or t - spaced[-1] >= self.interval_s:
+                spaced.append(t)
+        return spaced
+
+    def _read_keyframes(self, cap, times, should_stop):
+        for t in self._spaced(times):
+            if should_stop():
+                break
+            cap.set(cv2.CAP_PROP_POS_MSEC, t * 1000)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield int(round(t * self.fps)), frame
@@ -0,0 +1,176 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GEOCODE_URL = 'https://maps.googleapis.com/maps/api/geocode/json'
+ADDRESS_NOT_FOUND = "Address not found"
+
+
+class GeocodeCache:
+    """
+    Reverse-geocodes coordinates through the Google Geocoding API with a
+    two-level cache keyed on coordinates rounded to `precision` decimals
+    (4 decimals is roughly an 11 m cell): an in-memory LRU in front of a
+    SQLite file, both expiring entries after ttl_s. Expired rows are deleted
+    from the file when it is opened and every purge_every writes.
+    """
+
+    def __init__(self, api_key, db_path=None, precision=4, ttl_s=30 * 24 * 3600,
+                 max_memory_entries=10000, timeout_s=5, max_workers=4, purge_every=1000):
+        self.api_key = api_key
+        self.precision = precision
+        self.ttl_s = ttl_s
+        self.max_memory_entries = max_memory_entries
+        self.timeout_s = timeout_s
+        self.max_workers = max_workers
+        self.purge_every = purge_every
+        self._writes = 0
+
+        # One pooled session so consecutive lookups reuse the HTTPS connection
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=max_workers))
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'api_calls': 0, 'api_errors': 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS geocode (key TEXT PRIMARY KEY, address TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS geocode_created_at ON geocode (created_at)')
+            self._purge_expired()
+            self._db.commit()
+
+    def key(self, lat, lon):
+        return f"{round(lat, self.precision):.{self.precision}f},{round(lon, self.precision):.{self.precision}f}"
+
+    def address(self, lat, lon):
+        """Return the formatted address for a coordinate, from cache when possible."""
+        key = self.key(lat, lon)
+        address = self._cached(key)
+        if address is not None:
+            return address
+
+        # Coalesce concurrent lookups of the same cell into one API call
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            event.wait(self.timeout_s * 2)
+            address = self._cached(key)
+            return address if address is not None else ADDRESS_NOT_FOUND
+
+        try:
+            lat_rounded, lon_rounded = (float(v) for v in key.split(','))
+            address, cacheable = self._fetch(lat_rounded, lon_rounded)
+            if cacheable:
+                self._store(key, address)
+            return address
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def addresses(self, coordinates):
+        """
+        Resolve a batch of (lat, lon) pairs, e.g. all frames of a job. Each
+        cell is looked up once and uncached cells are fetched in parallel.
+        """
+        keys = [self.key(lat, lon) for lat, lon in coordinates]
+        unique = {}
+        for key, coordinate in zip(keys, coordinates):
+            unique.setdefault(key, coordinate)
+
+        resolved = {key: self._cached(key) for key in unique}
+        missing = [key for key, address in resolved.items() if address is None]
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as pool:
+                for key, address in zip(missing, pool.map(lambda key: self.address(*unique[key]), missing)):
+                    resolved[key] = address
+        return [resolved[key] for key in keys]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['api_calls']
+        stats['hit_ratio'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else None
+        return stats
+
+    def _cached(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                address, created_at = entry
+                if now - created_at < self.ttl_s:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return address
+                del self._memory[key]
+
+            if self._db is None:
+                return None
+            row = self._db.execute('SELECT address, created_at FROM geocode WHERE key = ?', (key,)).fetchone()
+            if row is None or now - row[1] >= self.ttl_s:
+                return None
+            self._stats['disk_hits'] += 1
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def _store(self, key, address):
+        now = time.time()
+        with self._lock:
+            self._remember(key, address, now)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO geocode (key, address, created_at) VALUES (?, ?, ?)', (key, address, now))
+                self._writes += 1
+                if self._writes % self.purge_every == 0:
+                    self._purge_expired()
+                self._db.commit()
+
+    def _purge_expired(self):
+        # Caller holds self._lock (or is the constructor); expired rows are never read again
+        self._db.execute('DELETE FROM geocode WHERE created_at <= ?', (time.time() - self.ttl_s,))
+
+    def _remember(self, key, address, created_at):
+        # Caller holds self._lock
+        self._memory[key] = (address, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _fetch(self, lat, lon):
+        # Returns (address, cacheable); transient failures aren't cached
+        with self._lock:
+            self._stats['api_calls'] += 1
+        try:
+            response = self.session.get(
+                GEOCODE_URL,
+                params={'latlng': f'{lat},{lon}', 'key': self.api_key},
+                timeout=self.timeout_s
+            )
+            result = response.json()
+        except (requests.RequestException, ValueError):
+            with self._lock:
+                self._stats['api_errors'] += 1
+            return ADDRESS_NOT_FOUND, False
+
+        if response.status_code == 200 and result['status'] == 'OK':
+            return result['results'][0]['formatted_address'], True
+        if response.status_code == 200 and result['status'] == 'ZERO_RESULTS':
+            return ADDRESS_NOT_FOUND, True
+        with self._lock:
+            self._stats['api_errors'] += 1
+        return ADDRESS_NOT_FOUND, False
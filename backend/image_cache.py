@@ -0,0 +1,177 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Longest side in pixels of each derivative; 'original' is the blob as stored
+DERIVATIVE_SIZES = {
+    'thumb': 160,
+    'medium': 640,
+}
+ORIGINAL = 'original'
+JPEG_QUALITY = 85
+
+
+def make_derivative(image_data, max_side):
+    image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Blob is not a decodable image")
+    scale = max_side / max(image.shape[:2])
+    if scale < 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return buffer.tobytes()
+
+
+class ImageCache:
+    """
+    Serves blob images and their resized derivatives (see DERIVATIVE_SIZES)
+    from a size-bounded in-memory LRU in front of a size-bounded directory
+    on disk. A blob is downloaded once and cached as is; each derivative is
+    generated from that cached original the first time it is asked for.
+    Concurrent requests for an image that is still being downloaded or
+    generated wait for it instead of doing the work again.
+
+    fetch(blob_name) returns the blob's bytes.
+    """
+
+    def __init__(self, fetch, cache_dir, max_disk_bytes=512 * 1024 ** 2, max_memory_bytes=64 * 1024 ** 2):
+        self.fetch = fetch
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'downloads': 0}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.is_file())
+
+    def get(self, blob_name, size=ORIGINAL):
+        """Return the bytes of blob_name at the given size ('original' or a DERIVATIVE_SIZES key)."""
+        if size != ORIGINAL and size not in DERIVATIVE_SIZES:
+            raise ValueError(f"Unknown image size: {size}")
+        data = self._cached(blob_name, size)
+        if data is not None:
+            return data
+
+        key = (blob_name, size)
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            event.wait()
+            data = self._cached(blob_name, size)
+            if data is not None:
+                return data
+            # The leader failed; try again ourselves
+            return self.get(blob_name, size)
+
+        try:
+            if size == ORIGINAL:
+                with self._lock:
+                    self._stats['downloads'] += 1
+                data = self.fetch(blob_name)
+            else:
+                # An original that can't be resized stays servable as is
+                data = make_derivative(self.get(blob_name, ORIGINAL), DERIVATIVE_SIZES[size])
+            self._store(blob_name, size, data)
+            return data
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_bytes'] = self._memory_bytes
+            stats['disk_bytes'] = self._disk_bytes
+        requests = stats['memory_hits'] + stats['disk_hits'] + stats['downloads']
+        stats['hit_ratio'] = round((stats['memory_hits'] + stats['disk_hits']) / requests, 3) if requests else None
+        return stats
+
+    def _path(self, blob_name, size):
+        digest = hashlib.sha1(blob_name.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}_{size}")
+
+    def _cached(self, blob_name, size):
+        key = (blob_name, size)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return data
+
+        path = self._path(blob_name, size)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # The modification time doubles as the disk LRU clock
+            os.utime(path)
+        except OSError:
+            return None
+        with self._lock:
+            self._stats['disk_hits'] += 1
+            self._remember(key, data)
+        return data
+
+    def _store(self, blob_name, size, data):
+        path = self._path(blob_name, size)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            # Overwriting (e.g. a retry after a failed leader) only adds the difference
+            try:
+                previous = os.path.getsize(path)
+            except OSError:
+                previous = 0
+            os.replace(tmp_path, path)
+            self._disk_bytes += len(data) - previous
+            self._remember((blob_name, size), data)
+            over_budget = self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _remember(self, key, data):
+        # Caller holds self._lock
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        if len(data) > self.max_memory_bytes:
+            return
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        # Drop least recently used files until the directory is back under 90% of the budget
+        entries = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if entry.is_file() and not entry.name.endswith('.tmp')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        total = sum(entry.stat().st_size for entry in entries)
+        target = self.max_disk_bytes * 0.9
+        for entry in entries:
+            if total <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
@@ -0,0 +1,85 @@
+"""
+Measure how long importing the server takes and what it pulls in.
+
+    python import_budget.py --budget 5
+
+Imports app.py in a fresh interpreter with -X importtime, prints the
+slowest top-level imports, and exits 1 when the import takes longer than
+--budget seconds or loads any of the heavy packages that are meant to be
+imported only when a model or feature is first used (HEAVY_MODULES).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Imported on first use of a model family or feature, never by `import app`
+HEAVY_MODULES = (
+    'torch', 'ultralytics', 'transformers', 'pytorch_lightning', 'detectron2',
+    'onnxruntime', 'easyocr', 'google.cloud.vision', 'azure.storage.blob',
+)
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'heavy': [m for m in %r if m in sys.modules]}))
+"""
+
+
+def measure(backend_dir):
+    env = dict(os.environ)
+    # app.py refuses to start without a Maps key; the value is never used while importing
+    env.setdefault('VITE_GOOGLE_MAPS_API_KEY', 'import-budget')
+    env.setdefault('WARM_MODELS', '')
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE % (HEAVY_MODULES,)],
+        cwd=backend_dir, env=env, capture_output=True, text=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing app failed:\n{process.stderr[-4000:]}")
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['top_level'] = parse_importtime(process.stderr)
+    return result
+
+
+def parse_importtime(stderr):
+    """Cumulative microseconds of each top-level import, from the -X importtime output."""
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit() or name.startswith('  '):
+            continue
+        # Top-level entries have a single space of indentation
+        name = name.strip()
+        top_level[name] = top_level.get(name, 0) + int(cumulative)
+    return top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=float, default=float(os.getenv('IMPORT_TIME_BUDGET_S', '5')))
+    parser.add_argument('--top', type=int, default=15, help='number of slowest imports to list')
+    args = parser.parse_args()
+
+    result = measure(os.path.dirname(os.path.abspath(__file__)))
+    print(f"import app: {result['seconds']:.2f}s (budget {args.budget:.1f}s)")
+    for name, micros in sorted(result['top_level'].items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {micros / 1e6:7.3f}s  {name}")
+
+    failed = False
+    if result['heavy']:
+        print(f"Heavy packages imported eagerly: {', '.join(result['heavy'])}")
+        failed = True
+    if result['seconds'] > args.budget:
+        print("Over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Inference server: holds the detection models once for every web worker.
+
+    python inference_server.py --socket /tmp/potholytics-inference.sock --workers 2 --threads 4
+
+The models are loaded in the parent process, then --workers inference
+processes are forked from it. The weights are shared copy-on-write by
+all of them, so adding workers adds cores without adding copies of the
+models. Only the models given with --models are served, so none is
+loaded after the fork; a model evicted under MODEL_MEMORY_BUDGET_MB
+would be reloaded by each worker on its own, so leave the budget off
+with several workers. Every worker accepts connections on the same Unix socket and
+serves each connection on its own thread. Frames arrive through shared
+memory (see remote_inference.py); each model is used under its own lock
+inside a worker, so workers run in parallel across cores. Concurrent calls
+on a model within a worker are merged into micro-batches (MICRO_BATCH_*
+settings, as in app.py).
+
+serve.py starts this together with gunicorn; the web app connects with
+SERVING_MODE=remote.
+"""
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from multiprocessing.connection import Listener
+
+from batching import BatchingDetector
+from detectors import available_models, create_detector
+from model_registry import ModelRegistry
+from remote_inference import attach_shared_memory, detections_to_wire, frame_views
+import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceServer:
+
+    def __init__(self, address, authkey, registry, workers=1, threads=None):
+        self.address = address
+        self.authkey = authkey
+        self.registry = registry
+        self.workers = workers
+        self.threads = threads
+
+    def serve_forever(self, preload=None):
+        # Load before forking so the workers share the weights instead of loading their own
+        self.registry.warm_up(preload)
+        # Keep the garbage collector from writing to (and so copying) the pages of loaded objects
+        gc.freeze()
+
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        os.chmod(self.address, 0o600)
+        logger.info("Serving %s on %s with %d worker(s)", ', '.join(self.registry.loaders), self.address, self.workers)
+
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=self._worker, args=(listener,), name=f'inference-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+
+        def stop(signum, frame):
+            for process in processes:
+                process.terminate()
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            for process in processes:
+                process.join()
+        finally:
+            listener.close()
+
+    def _worker(self, listener):
+        if self.threads:
+            try:
+                import torch
+                torch.set_num_threads(self.threads)
+            except ImportError:
+                pass
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception:
+                # Failed handshake (wrong authkey) or a client that went away mid-handshake
+                logger.warning("Rejected an inference connection", exc_info=True)
+                continue
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        segment = None
+        try:
+            while True:
+                try:
+                    message = connection.recv()
+                except (EOFError, ConnectionError):
+                    return
+                try:
+                    if message[0] == 'predict':
+                        _, model, segment_name, layouts = message
+                        if segment is None or segment.name != segment_name:
+                            # The client grew (replaced) its segment
+                            if segment is not None:
+                                segment.close()
+                            segment = attach_shared_memory(segment_name)
+                        response = ('ok', self._predict(model, segment, layouts))
+                    elif message[0] == 'load':
+                        self.registry.get(message[1])
+                        response = ('ok', None)
+                    elif message[0] == 'stats':
+                        response = ('ok', self.registry.stats())
+                    else:
+                        response = ('error', f"Unknown request: {message[0]}")
+                except Exception as e:
+                    logger.exception("Inference request failed")
+                    response = ('error', str(e))
+                connection.send(response)
+        finally:
+            connection.close()
+            if segment is not None:
+                segment.close()
+
+    def _predict(self, model, segment, layouts):
+        frames = frame_views(segment.buf, layouts)
+        try:
+            with self.registry.use(model) as detector:
+                detections = detector.predict(frames)
+            return [detections_to_wire(d) for d in detections]
+        finally:
+            # The views must go before the segment can be closed
+            del frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default=os.getenv('INFERENCE_SOCKET', '/tmp/potholytics-inference.sock'))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('INFERENCE_WORKERS', '1')),
+                        help='inference processes forked after loading the models')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('INFERENCE_THREADS', '0')) or None,
+                        help='torch threads per inference process')
+    parser.add_argument('--models', default=os.getenv('INFERENCE_MODELS') or 'all',
+                        help='comma-separated models to serve, all loaded before forking, or "all"')
+    args = parser.parse_args()
+
+    telemetry.configure_logging(level=os.getenv('LOG_LEVEL', 'INFO').upper())
+    authkey = os.getenv('INFERENCE_AUTHKEY', 'potholytics').encode()
+    intra_op_threads = int(os.getenv('ONNX_INTRA_OP_THREADS', '0'))
+    inter_op_threads = int(os.getenv('ONNX_INTER_OP_THREADS', '1'))
+
+    max_batch_size = int(os.getenv('MICRO_BATCH_MAX_SIZE', '16'))
+    max_wait_ms = float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', '10'))
+    latency_slo_ms = float(os.getenv('INFERENCE_LATENCY_SLO_MS', '0')) or None
+
+    def load(name, path):
+        detector = create_detector(name, path, intra_op_threads, inter_op_threads)
+        if os.getenv('MICRO_BATCHING', '1') == '0':
+            return detector
+        return BatchingDetector(detector, max_batch_size, max_wait_ms, latency_slo_ms)
+
+    models, unavailable = available_models()
+    for name, missing in unavailable.items():
+        logger.warning("Model %s disabled, missing packages: %s", name, ', '.join(missing))
+    if args.models != 'all':
+        served = {m.strip() for m in args.models.split(',')}
+        models = {name: path for name, path in models.items() if name in served}
+    # Frames arrive already cropped and resized by the web worker's preprocessing
+    registry = ModelRegistry(
+        {name: (lambda name=name, path=path: load(name, path)) for name, path in models.items()},
+        memory_budget_mb=float(os.getenv('MODEL_MEMORY_BUDGET_MB', '0')) or None
+    )
+    InferenceServer(args.socket, authkey, registry, workers=args.workers, threads=args.threads).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
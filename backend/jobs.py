@@ -0,0 +1,272 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobResults:
+    """
+    Results of one job, appended to an NDJSON file as they come in. Only
+    the line offsets stay in memory, so finished jobs kept around for
+    polling don't hold their frame images.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._offsets = []
+        self._size = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._offsets)
+
+    def append(self, result):
+        line = (json.dumps(result) + '\n').encode('utf-8')
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'ab')
+            self._file.write(line)
+            # Readers open the file separately and only read up to the last flushed line
+            self._file.flush()
+            self._offsets.append(self._size)
+            self._size += len(line)
+
+    def since(self, start):
+        """Results from the start-th on, in the order they were added."""
+        with self._lock:
+            if start >= len(self._offsets):
+                return []
+            offset, end = self._offsets[max(start, 0)], self._size
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(end - offset)
+        return [json.loads(line) for line in data.splitlines()]
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Job:
+    def __init__(self, model, filename, results_dir):
+        self.id = uuid.uuid4().hex
+        self.model = model
+        self.filename = filename
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.frames_processed = 0
+        self.frames_total = None
+        self.results = JobResults(os.path.join(results_dir, f"{self.id}.ndjson"))
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self.cancel_event.set()
+        with self._lock:
+            if self.status == 'queued':
+                self.status = 'cancelled'
+                self.finished_at = time.time()
+
+    def mark_running(self):
+        with self._lock:
+            if self.status == 'cancelled':
+                return False
+            self.status = 'running'
+            self.started_at = time.time()
+            return True
+
+    def mark_finished(self, error=None):
+        with self._lock:
+            if error is not None:
+                self.status = 'failed'
+                self.error = error
+            else:
+                self.status = 'cancelled' if self.cancel_event.is_set() else 'completed'
+            self.finished_at = time.time()
+        self.results.close()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def report_progress(self, frames_processed, frames_total=None):
+        with self._lock:
+            self.frames_processed = frames_processed
+            if frames_total is not None:
+                self.frames_total = frames_total
+
+    def add_result(self, result):
+        self.results.append(result)
+
+    def eta_seconds(self):
+        if not self.started_at or not self.frames_total or not self.frames_processed:
+            return None
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        remaining = max(self.frames_total - self.frames_processed, 0)
+        return round(elapsed / self.frames_processed * remaining, 1)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'job_id': self.id,
+                'model': self.model,
+                'filename': self.filename,
+                'status': self.status,
+                'frames_processed': self.frames_processed,
+                'frames_total': self.frames_total,
+                'results_count': len(self.results),
+                'eta_s': self.eta_seconds() if self.status == 'running' else None,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'error': self.error,
+            }
+
+
+class JobManager:
+    """
+    Runs detection jobs on a local worker pool. Each job gets an id, progress
+    reporting and its own cancel flag, and a per-model semaphore caps how
+    many jobs use the same model at once. Job results are kept in
+    results_dir until the job is forgotten, keep_finished_s after it ends.
+    """
+
+    def __init__(self, results_dir, max_workers=4, model_concurrency=None, default_model_concurrency=1,
+                 keep_finished_s=3600):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='detection-job')
+        self.model_concurrency = model_concurrency or {}
+        self.default_model_concurrency = default_model_concurrency
+        self.keep_finished_s = keep_finished_s
+        self.results_dir = results_dir
+        os.makedirs(results_dir, exist_ok=True)
+        for entry in os.scandir(results_dir):
+            # Results of jobs from before a restart, which can no longer be looked up
+            if entry.name.endswith('.ndjson'):
+                os.remove(entry.path)
+        self._jobs = {}
+        self._model_slots = {}
+        self._lock = threading.Lock()
+
+    def create(self, model, filename):
+        """Register a job without scheduling it, for work that runs on the request thread."""
+        job = Job(model, filename, self.results_dir)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def submit(self, model, filename, work, cleanup=None):
+        """
+        Queue work(job) on the worker pool and return the job straight away.
+        work should check job.cancelled, call job.report_progress and
+        job.add_result as it goes. cleanup() runs once the job is over,
+        even if it was cancelled before starting.
+        """
+        job = self.create(model, filename)
+        self.executor.submit(self._run, job, work, cleanup)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def jobs(self):
+        with self._lock:
+            self._prune()
+            return list(self._jobs.values())
+
+    def model_slot(self, model):
+        # Semaphore limiting concurrent jobs per model, or None when the model's limit is 0 (unlimited)
+        with self._lock:
+            if model not in self._model_slots:
+                limit = self.model_concurrency.get(model, self.default_model_concurrency)
+                self._model_slots[model] = threading.BoundedSemaphore(limit) if limit else None
+            return self._model_slots[model]
+
+    @contextmanager
+    def model_slots(self, models, cancelled=lambda: False):
+        """
+        Hold a slot of each model for the duration of the with block, for
+        work on the request thread as well as queued jobs. Slots are taken
+        in name order so work on overlapping sets of models can't deadlock.
+        Yields False if cancelled() turns true while waiting.
+        """
+        held = []
+        try:
+            slots = [slot for slot in map(self.model_slot, sorted(set(models))) if slot is not None]
+            for slot in slots:
+                if not self._acquire(slot, cancelled):
+                    break
+                held.append(slot)
+            yield len(held) == len(slots)
+        finally:
+            for slot in held:
+                slot.release()
+
+    def _acquire(self, slot, cancelled):
+        while not slot.acquire(timeout=0.5):
+            if cancelled():
+                return False
+        return True
+
+    def _run(self, job, work, cleanup):
+        try:
+            self._run_in_slot(job, work)
+        finally:
+            if cleanup:
+                cleanup()
+
+    def _run_in_slot(self, job, work):
+        # Wait for a free slot on this model, giving up if the job is cancelled meanwhile
+        with self.model_slots([job.model], lambda: job.cancelled) as acquired:
+            if not acquired:
+                job.mark_finished()
+                return
+            try:
+                if not job.mark_running():
+                    return
+                work(job)
+                job.mark_finished()
+            except JobCancelled:
+                job.cancel_event.set()
+                job.mark_finished()
+            except Exception as e:
+                logger.exception("Detection job %s failed", job.id)
+                job.mark_finished(error=str(e))
+
+    def _prune(self):
+        # Caller holds self._lock. Forget finished jobs after keep_finished_s and delete their results
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at and now - job.finished_at > self.keep_finished_s:
+                del self._jobs[job_id]
+                job.results.remove()
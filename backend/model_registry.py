@@ -0,0 +1,189 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+
+def _process_rss_bytes():
+    # Resident set size of this process, read from /proc when available
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        import resource
+        return resident_pages * resource.getpagesize()
+    except (OSError, ImportError, ValueError, IndexError):
+        return 0
+
+
+def estimate_model_size(model):
+    """
+    Estimate the memory held by a loaded model in bytes by summing the
+    sizes of its parameter and buffer tensors.
+    """
+    # Ultralytics wrappers and detectron2 predictors keep the torch module on .model
+    module = model
+    for _ in range(3):
+        if hasattr(module, 'parameters') and callable(module.parameters):
+            break
+        module = getattr(module, 'model', None)
+        if module is None:
+            return None
+
+    try:
+        size = sum(p.numel() * p.element_size() for p in module.parameters())
+        size += sum(b.numel() * b.element_size() for b in module.buffers())
+        return size
+    except Exception:
+        return None
+
+
+def _close(model):
+    # Let wrappers release their threads so the evicted weights can be freed
+    close = getattr(model, 'close', None)
+    if close is not None:
+        close()
+
+
+class LoadedModel:
+    def __init__(self, name, model, load_time, size_bytes):
+        self.name = name
+        self.model = model
+        self.load_time = load_time
+        self.size_bytes = size_bytes
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.uses = 0
+        # Most detectors keep per-call state (ultralytics predictors in particular),
+        # so inference on one model instance is serialized, unless the model does it
+        # itself (a BatchingDetector) or keeps no state (thread_safe).
+        self.lock = nullcontext() if getattr(model, 'thread_safe', False) else threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Keeps detection models in memory so they are loaded once instead of on
+    every request. Models are loaded lazily on first use (or up front with
+    warm_up) and evicted least-recently-used first once the memory budget
+    is exceeded.
+    """
+
+    def __init__(self, loaders, memory_budget_mb=None):
+        self.loaders = loaders
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in loaders}
+        self._history = {}
+
+    def __contains__(self, name):
+        return name in self.loaders
+
+    def is_loaded(self, name):
+        with self._lock:
+            return name in self._models
+
+    def get(self, name):
+        """Return the LoadedModel for name, loading it if needed."""
+        if name not in self.loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                self._touch(entry)
+                return entry
+
+        # Only one thread loads a given model; others wait for it
+        with self._load_locks[name]:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    self._touch(entry)
+                    return entry
+
+            rss_before = _process_rss_bytes()
+            start = time.perf_counter()
+            model = self.loaders[name]()
+            load_time = time.perf_counter() - start
+            size_bytes = estimate_model_size(model)
+            if size_bytes is None:
+                size_bytes = max(_process_rss_bytes() - rss_before, 0)
+
+            entry = LoadedModel(name, model, load_time, size_bytes)
+            with self._lock:
+                self._models[name] = entry
+                self._history.setdefault(name, {'loads': 0, 'evictions': 0})['loads'] += 1
+                self._touch(entry)
+                self._enforce_budget(keep=name)
+            return entry
+
+    @contextmanager
+    def use(self, name):
+        """Borrow a model for inference, holding its inference lock."""
+        entry = self.get(name)
+        with entry.lock:
+            yield entry.model
+
+    def warm_up(self, names=None):
+        """Load the given models (all of them by default) ahead of the first request."""
+        for name in names or list(self.loaders):
+            try:
+                self.get(name)
+            except Exception:
+                logger.exception("Failed to warm up model %s", name)
+
+    def evict(self, name):
+        with self._lock:
+            entry = self._models.pop(name, None)
+            if entry is not None:
+                self._history.setdefault(name, {'loads': 0, 'evictions': 0})['evictions'] += 1
+        if entry is not None:
+            _close(entry.model)
+        return entry is not None
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(entry.size_bytes or 0 for entry in self._models.values())
+
+    def stats(self):
+        with self._lock:
+            models = {}
+            for name in self.loaders:
+                entry = self._models.get(name)
+                history = self._history.get(name, {'loads': 0, 'evictions': 0})
+                models[name] = {
+                    'loaded': entry is not None,
+                    'load_time_s': round(entry.load_time, 3) if entry else None,
+                    'size_mb': round(entry.size_bytes / (1024 * 1024), 1) if entry and entry.size_bytes else None,
+                    'uses': entry.uses if entry else 0,
+                    'last_used': entry.last_used if entry else None,
+                    'loads': history['loads'],
+                    'evictions': history['evictions'],
+                }
+            return {
+                'memory_budget_mb': self.memory_budget / (1024 * 1024) if self.memory_budget else None,
+                'resident_mb': round(sum(e.size_bytes or 0 for e in self._models.values()) / (1024 * 1024), 1),
+                'models': models,
+            }
+
+    def _touch(self, entry):
+        entry.last_used = time.time()
+        entry.uses += 1
+        self._models.move_to_end(entry.name)
+
+    def _enforce_budget(self, keep):
+        if not self.memory_budget:
+            return
+        total = sum(e.size_bytes or 0 for e in self._models.values())
+        for name in list(self._models):
+            if total <= self.memory_budget:
+                break
+            if name == keep:
+                continue
+            entry = self._models.pop(name)
+            self._history[name]['evictions'] += 1
+            total -= entry.size_bytes or 0
+            _close(entry.model)
@@ -0,0 +1,272 @@
+import logging
+import re
+import threading
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OVERLAY_HEIGHT = 100  # Height in pixels of the dashcam text strip at the bottom of the frame
+OCR_ENGINES = ('easyocr', 'cloud')
+
+# Separate patterns for date and time
+date_pattern = re.compile(r'(\d{2}-\d{2}-\d{4})')
+time_pattern = re.compile(r'(\d{2}:\d{2}:\d{2})')
+# Updated pattern to match the specific format with km/h
+longitude_pattern = re.compile(r'km/h\s*E\s*(\d+\s*\.\s*\d+)')
+latitude_pattern = re.compile(r',\s*[№N]\s*(\d+\s*\.\s*\d+)')  # Updated to capture potential spaces and both '№' and 'N'
+
+
+def overlay_crop(image):
+    # Get bottom portion of image
+    height = image.shape[0]
+    return image[height-OVERLAY_HEIGHT:height, :]
+
+
+def _parse_coordinate(match):
+    if not match:
+        return None
+    value = match.group(1)
+    # First remove all spaces
+    value = value.replace(" ", "")
+    # Then keep only digits and decimal point
+    value = ''.join(char for char in value if char.isdigit() or char == '.')
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_overlay_text(text):
+    """Pull date, time, latitude and longitude out of the overlay text."""
+    date_match = date_pattern.search(text)
+    time_match = time_pattern.search(text)
+    return {
+        'date': date_match.group(1) if date_match else None,
+        'time': time_match.group(1) if time_match else None,
+        'latitude': _parse_coordinate(latitude_pattern.search(text)),
+        'longitude': _parse_coordinate(longitude_pattern.search(text)),
+    }
+
+
+def is_valid_overlay(parsed):
+    """Check that every overlay field was read and makes sense."""
+    if not parsed['date'] or not parsed['time']:
+        return False
+    try:
+        datetime.strptime(f"{parsed['date']} {parsed['time']}", '%d-%m-%Y %H:%M:%S')
+    except ValueError:
+        return False
+    latitude, longitude = parsed['latitude'], parsed['longitude']
+    return (
+        latitude is not None and longitude is not None
+        and 0 < latitude <= 90 and 0 < longitude <= 180
+    )
+
+
+def text_words(gray):
+    """(start, end) column spans of the words in a greyscale overlay strip, left to right."""
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Text is the minority class, whether it is light on dark or dark on light
+    if np.count_nonzero(binary) > binary.size / 2:
+        binary = cv2.bitwise_not(binary)
+    rows = np.flatnonzero(np.count_nonzero(binary, axis=1) >= 2)
+    columns = np.flatnonzero(binary.any(axis=0))
+    if not len(rows) or not len(columns):
+        return []
+    # A space is much wider than the gap between the letters of a word
+    min_gap = max(2, int((rows[-1] - rows[0] + 1) * 0.3))
+    breaks = np.flatnonzero(np.diff(columns) > min_gap)
+    starts = np.concatenate(([columns[0]], columns[breaks + 1]))
+    ends = np.concatenate((columns[breaks], [columns[-1]])) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+class OverlayChangeDetector:
+    """
+    Cheap check of whether the overlay text can have changed since the last
+    frame it saw, by diffing a downscaled greyscale copy of the strip.
+    Compression noise only moves pixels a little, while a changed digit
+    flips a cluster of pixels between text and background.
+
+    region limits the comparison to a horizontal slice of the strip, as
+    (start, end) fractions of its width. By default it is everything after
+    the first skip_words words, i.e. after the date and the ticking clock,
+    found in the first frame whose words can be told apart; until then the
+    whole strip is compared, which can only skip fewer frames.
+    """
+
+    def __init__(self, region=None, scale=0.5, pixel_threshold=40, min_changed_pixels=12, skip_words=2):
+        self.region = region if region is not None or skip_words else (0.0, 1.0)
+        self.skip_words = skip_words
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_pixels = min_changed_pixels
+        self.skipped = 0
+        self._last = None
+
+    def _region(self, crop):
+        if self.region is None:
+            words = text_words(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY))
+            if len(words) <= self.skip_words:
+                return (0.0, 1.0)
+            start = (words[self.skip_words - 1][1] + words[self.skip_words][0]) / 2
+            self.region = (start / crop.shape[1], 1.0)
+        return self.region
+
+    def _signature(self, crop):
+        width = crop.shape[1]
+        region = self._region(crop)
+        start, end = int(width * region[0]), int(width * region[1])
+        strip = cv2.cvtColor(crop[:, start:end], cv2.COLOR_BGR2GRAY)
+        return cv2.resize(strip, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def changed(self, crop):
+        signature = self._signature(crop)
+        if self._last is None or self._last.shape != signature.shape:
+            self._last = signature
+            return True
+        diff = cv2.absdiff(signature, self._last)
+        if np.count_nonzero(diff > self.pixel_threshold) < self.min_changed_pixels:
+            self.skipped += 1
+            return False
+        self._last = signature
+        return True
+
+
+class OverlayOCR:
+    """
+    Reads the dashcam overlay. The local easyocr engine runs first, batched
+    over all crops; Google Cloud Vision is only called for crops whose parsed
+    fields fail validation (or for everything when engine='cloud').
+    """
+
+    def __init__(self, engine='easyocr', cloud_fallback=True, gpu=False):
+        if engine not in OCR_ENGINES:
+            raise ValueError(f"Unknown OCR engine: {engine}")
+        self.engine = engine
+        self.cloud_fallback = cloud_fallback
+        self.gpu = gpu
+        self._reader = None
+        self._vision_client = None
+        self._init_lock = threading.Lock()
+        self._reader_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'frames': 0,
+            'local_hits': 0,
+            'cloud_calls': 0,
+            'cloud_hits': 0,
+            'cloud_errors': 0,
+            'failures': 0,
+        }
+
+    @property
+    def reader(self):
+        with self._init_lock:
+            if self._reader is None:
+                import easyocr
+                self._reader = easyocr.Reader(['en'], gpu=self.gpu)
+            return self._reader
+
+    @property
+    def warm(self):
+        # Whether the engine used first is loaded; cloud OCR has nothing to load up front
+        return self.engine == 'cloud' or self._reader is not None
+
+    def warm_up(self):
+        if self.engine == 'easyocr':
+            self.reader
+
+    @property
+    def vision_client(self):
+        with self._init_lock:
+            if self._vision_client is None:
+                from google.cloud import vision
+                self._vision_client = vision.ImageAnnotatorClient()
+            return self._vision_client
+
+    def detect_text(self, frame):
+        """
+        Extract text from a single video frame using Google Cloud Vision API.
+        """
+        from google.cloud import vision
+
+        # Convert frame (NumPy array) to bytes
+        _, encoded_image = cv2.imencode('.jpg', frame)
+        content = encoded_image.tobytes()
+
+        # Prepare image for Google Vision API
+        image = vision.Image(content=content)
+        response = self.vision_client.text_detection(image=image)
+
+        if response.error.message:
+            raise Exception(response.error.message)
+
+        # Extract text from response
+        text = response.text_annotations[0].description if response.text_annotations else ""
+        return text.replace("\n", " ")  # Replace newlines with a space
+
+    def local_text(self, crops):
+        # easyocr is not safe to call from several threads at once, and batching is where it gains anyway
+        with self._reader_lock:
+            results = self.reader.readtext_batched(list(crops), detail=0)
+        return [" ".join(lines) for lines in results]
+
+    def read(self, crops):
+        """Return the parsed overlay fields for each overlay crop."""
+        crops = list(crops)
+        parsed = [None] * len(crops)
+        local_hits = cloud_calls = cloud_hits = cloud_errors = failures = 0
+
+        if self.engine == 'easyocr':
+            for i, text in enumerate(self.local_text(crops)):
+                parsed[i] = parse_overlay_text(text)
+                if is_valid_overlay(parsed[i]):
+                    local_hits += 1
+
+        for i, crop in enumerate(crops):
+            if parsed[i] is not None and is_valid_overlay(parsed[i]):
+                continue
+            if self.engine == 'cloud' or self.cloud_fallback:
+                cloud_calls += 1
+                try:
+                    text = self.detect_text(crop)
+                except Exception:
+                    # Quota, network or auth trouble must not fail the job; keep the local reading
+                    logger.warning("Cloud OCR failed", exc_info=True)
+                    cloud_errors += 1
+                    text = None
+                if text is not None:
+                    logger.debug("Cloud OCR text: %s", text)
+                    cloud_parsed = parse_overlay_text(text)
+                    if is_valid_overlay(cloud_parsed):
+                        cloud_hits += 1
+                    # Keep whichever reading got further; cloud wins ties
+                    if parsed[i] is None or sum(v is not None for v in cloud_parsed.values()) >= sum(v is not None for v in parsed[i].values()):
+                        parsed[i] = cloud_parsed
+            if parsed[i] is None:
+                parsed[i] = parse_overlay_text('')
+            if not is_valid_overlay(parsed[i]):
+                failures += 1
+
+        with self._stats_lock:
+            self._stats['frames'] += len(crops)
+            self._stats['local_hits'] += local_hits
+            self._stats['cloud_calls'] += cloud_calls
+            self._stats['cloud_hits'] += cloud_hits
+            self._stats['cloud_errors'] += cloud_errors
+            self._stats['failures'] += failures
+        return parsed
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        frames = stats['frames']
+        stats['engine'] = self.engine
+        stats['local_hit_rate'] = round(stats['local_hits'] / frames, 3) if frames else None
+        stats['cloud_hit_rate'] = round(stats['cloud_hits'] / stats['cloud_calls'], 3) if stats['cloud_calls'] else None
+        stats['cloud_call_rate'] = round(stats['cloud_calls'] / frames, 3) if frames else None
+        return stats
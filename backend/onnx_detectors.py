@@ -0,0 +1,178 @@
+import cv2
+import numpy as np
+import onnxruntime as ort
+import supervision as sv
+
+from detectors import (
+    Detector, _with_class_name, DETR_CONFIDENCE_TRESHOLD, DETR_IOU_TRESHOLD,
+    ULTRALYTICS_CONFIDENCE_TRESHOLD, ULTRALYTICS_IOU_TRESHOLD
+)
+
+DEFAULT_IMAGE_SIZE = 640
+
+
+def session_options(intra_op_threads=0, inter_op_threads=0):
+    # 0 leaves the thread count to ONNX Runtime (one intra-op thread per physical core)
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if intra_op_threads:
+        options.intra_op_num_threads = intra_op_threads
+    if inter_op_threads:
+        options.inter_op_num_threads = inter_op_threads
+    return options
+
+
+class OnnxDetector(Detector):
+    """
+    Runs an exported model with ONNX Runtime on CPU. Subclasses turn frames
+    into the model's input feed (prepare) and its outputs back into
+    sv.Detections in frame coordinates (postprocess).
+    """
+
+    def __init__(self, name, model_path, intra_op_threads=0, inter_op_threads=0):
+        super().__init__(name, model_path)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+    def load(self):
+        self.model = ort.InferenceSession(
+            self.model_path,
+            session_options(self.intra_op_threads, self.inter_op_threads),
+            providers=['CPUExecutionProvider']
+        )
+        shape = self.model.get_inputs()[0].shape
+        # Models exported with a fixed batch of 1 are run one frame at a time
+        self.fixed_batch = isinstance(shape[0], int)
+        self.image_size = shape[2] if isinstance(shape[2], int) else DEFAULT_IMAGE_SIZE
+        return self
+
+    def prepare(self, frames):
+        """Return the input feed for a batch of frames and whatever postprocess needs to undo."""
+        raise NotImplementedError
+
+    def postprocess(self, outputs, frames, meta):
+        raise NotImplementedError
+
+    def predict(self, frames):
+        if not frames:
+            return []
+        if self.fixed_batch and len(frames) > 1:
+            return [detections for frame in frames for detections in self.predict([frame])]
+        feed, meta = self.prepare(frames)
+        outputs = self.model.run(None, feed)
+        return self.postprocess(outputs, frames, meta)
+
+
+def _to_blob(images):
+    # BGR HWC uint8 -> RGB NCHW float32 in [0, 1]
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+
+def _cxcywh_to_xyxy(boxes):
+    cx, cy, w, h = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+
+def _detections(xyxy, scores, threshold):
+    # scores is (boxes, classes)
+    class_id = scores.argmax(axis=1)
+    confidence = scores.max(axis=1)
+    keep = confidence >= threshold
+    return sv.Detections(
+        xyxy=xyxy[keep].astype(np.float32),
+        confidence=confidence[keep].astype(np.float32),
+        class_id=class_id[keep].astype(int)
+    )
+
+
+class OnnxYoloDetector(OnnxDetector):
+    """YOLO11 exported by Ultralytics: letterboxed input, (4 + classes) x anchors output, needs NMS."""
+
+    def _letterbox(self, frame):
+        height, width = frame.shape[:2]
+        ratio = min(self.image_size / height, self.image_size / width)
+        new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+        resized = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        left = (self.image_size - new_width) // 2
+        top = (self.image_size - new_height) // 2
+        padded = cv2.copyMakeBorder(
+            resized, top, self.image_size - new_height - top, left, self.image_size - new_width - left,
+            cv2.BORDER_CONSTANT, value=(114, 114, 114)
+        )
+        return padded, (ratio, left, top)
+
+    def prepare(self, frames):
+        letterboxed = [self._letterbox(frame) for frame in frames]
+        feed = {self.model.get_inputs()[0].name: _to_blob([image for image, _ in letterboxed])}
+        return feed, [transform for _, transform in letterboxed]
+
+    def postprocess(self, outputs, frames, meta):
+        results = []
+        for prediction, frame, (ratio, left, top) in zip(outputs[0], frames, meta):
+            prediction = prediction.T
+            xyxy = _cxcywh_to_xyxy(prediction[:, :4])
+            xyxy = (xyxy - np.array([left, top, left, top])) / ratio
+            height, width = frame.shape[:2]
+            xyxy = np.clip(xyxy, 0, [width, height, width, height])
+            detections = _detections(xyxy, prediction[:, 4:], ULTRALYTICS_CONFIDENCE_TRESHOLD)
+            results.append(_with_class_name(detections.with_nms(threshold=ULTRALYTICS_IOU_TRESHOLD)))
+        return results
+
+
+class OnnxRtDetrDetector(OnnxDetector):
+    """RT-DETR exported by Ultralytics: stretched input, normalised boxes with scores, no NMS."""
+
+    def prepare(self, frames):
+        resized = [cv2.resize(frame, (self.image_size, self.image_size), interpolation=cv2.INTER_LINEAR) for frame in frames]
+        return {self.model.get_inputs()[0].name: _to_blob(resized)}, None
+
+    def postprocess(self, outputs, frames, meta):
+        results = []
+        for prediction, frame in zip(outputs[0], frames):
+            height, width = frame.shape[:2]
+            xyxy = _cxcywh_to_xyxy(prediction[:, :4]) * np.array([width, height, width, height])
+            results.append(_with_class_name(_detections(xyxy, prediction[:, 4:], ULTRALYTICS_CONFIDENCE_TRESHOLD)))
+        return results
+
+
+class OnnxDetrDetector(OnnxDetector):
+    """DETR exported by export_onnx.py: same processor as the PyTorch path, logits + normalised boxes out."""
+
+    def load(self):
+        from transformers import DetrImageProcessor
+        self.image_processor = DetrImageProcessor.from_pretrained('facebook/detr-resnet-50')
+        return super().load()
+
+    def prepare(self, frames):
+        inputs = self.image_processor(images=list(frames), return_tensors='np')
+        return {
+            'pixel_values': inputs['pixel_values'].astype(np.float32),
+            'pixel_mask': inputs['pixel_mask'].astype(np.int64),
+        }, None
+
+    def postprocess(self, outputs, frames, meta):
+        logits, pred_boxes = outputs
+        # Softmax over classes, dropping the trailing "no object" class
+        probabilities = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        probabilities = (probabilities / probabilities.sum(axis=-1, keepdims=True))[..., :-1]
+        results = []
+        for scores, boxes, frame in zip(probabilities, pred_boxes, frames):
+            height, width = frame.shape[:2]
+            xyxy = _cxcywh_to_xyxy(boxes) * np.array([width, height, width, height])
+            detections = _detections(xyxy, scores, DETR_CONFIDENCE_TRESHOLD)
+            results.append(_with_class_name(detections.with_nms(threshold=DETR_IOU_TRESHOLD)))
+        return results
+
+
+ONNX_DETECTOR_CLASSES = {
+    'yolov11n': OnnxYoloDetector,
+    'yolov11l': OnnxYoloDetector,
+    'rt-detr': OnnxRtDetrDetector,
+    'detr': OnnxDetrDetector,
+}
+
+
+def create_onnx_detector(name, base, model_path, intra_op_threads=0, inter_op_threads=0):
+    return ONNX_DETECTOR_CLASSES[base](name, model_path, intra_op_threads, inter_op_threads)
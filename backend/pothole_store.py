@@ -0,0 +1,235 @@
+import math
+import os
+import threading
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, GEOSPHERE, MongoClient, UpdateOne
+
+DATABASE_NAME = "potholytics"
+COLLECTION_NAME = "potholes"
+
+# Fields returned for map/table views; the image is fetched on demand
+META_PROJECTION = {'image': 0}
+# Fields replaced when a repeat sighting of a stored pothole has a better view; location goes
+# with info so the geo index agrees with the coordinates shown
+BEST_VIEW_FIELDS = ('image', 'info', 'location', 'detections_count', 'quality', 'tracks')
+EARTH_RADIUS_M = 6371000
+
+_client = None
+_indexes_ready = False
+_lock = threading.Lock()
+
+
+def get_client():
+    # One pooled client per process instead of connecting on every request
+    global _client
+    with _lock:
+        if _client is None:
+            _client = MongoClient(os.environ["MONGODB_URI"])
+        return _client
+
+
+def get_collection(name=COLLECTION_NAME):
+    collection = get_client()[DATABASE_NAME][name]
+    if name == COLLECTION_NAME:
+        ensure_indexes(collection)
+    return collection
+
+
+def ensure_indexes(collection):
+    """Create the geo/date indexes once per process and backfill older documents."""
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    with _lock:
+        if _indexes_ready:
+            return
+        drop_invalid_locations(collection)
+        backfill_locations(collection)
+        collection.create_index([('location', GEOSPHERE)])
+        collection.create_index([('captured_at', ASCENDING)])
+        _indexes_ready = True
+
+
+def location_of(info):
+    # Misread overlays and frames posted by clients can hold anything; a point outside the
+    # globe would make the insert and the 2dsphere index fail, so such frames get no location
+    try:
+        latitude, longitude = float(info.get('latitude')), float(info.get('longitude'))
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    # GeoJSON points are [longitude, latitude]
+    return {'type': 'Point', 'coordinates': [longitude, latitude]}
+
+
+def captured_at_of(info):
+    try:
+        return datetime.strptime(f"{info.get('date')} {info.get('time')}", '%d-%m-%Y %H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+
+
+def prepare_frame(frame):
+    """Add the indexed location and capture time fields to a frame before it is stored."""
+    info = frame.get('info') or {}
+    location = location_of(info)
+    if location:
+        frame['location'] = location
+    captured_at = captured_at_of(info)
+    if captured_at:
+        frame['captured_at'] = captured_at
+    return frame
+
+
+def drop_invalid_locations(collection):
+    # Points stored before coordinates were checked would keep the geo index from being built
+    invalid = {'$or': [
+        {'location.coordinates.0': {'$not': {'$gte': -180, '$lte': 180}}},
+        {'location.coordinates.1': {'$not': {'$gte': -90, '$lte': 90}}},
+    ]}
+    collection.update_many({'location': {'$exists': True}, **invalid}, {'$unset': {'location': ''}})
+
+
+def backfill_locations(collection):
+    # Documents saved before location/captured_at existed
+    for doc in collection.find({'location': {'$exists': False}}, {'info': 1}):
+        updates = {}
+        info = doc.get('info') or {}
+        location = location_of(info)
+        if location:
+            updates['location'] = location
+        captured_at = captured_at_of(info)
+        if captured_at:
+            updates['captured_at'] = captured_at
+        if updates:
+            collection.update_one({'_id': doc['_id']}, {'$set': updates})
+
+
+def build_query(bbox=None, date_from=None, date_to=None, after=None):
+    """
+    bbox is (min_lon, min_lat, max_lon, max_lat), dates are datetimes and
+    after is the _id of the last document of the previous page.
+    """
+    query = {}
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        query['location'] = {'$geoWithin': {'$geometry': {
+            'type': 'Polygon',
+            'coordinates': [[
+                [min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]
+            ]]
+        }}}
+    if date_from or date_to:
+        query['captured_at'] = {}
+        if date_from:
+            query['captured_at']['$gte'] = date_from
+        if date_to:
+            query['captured_at']['$lte'] = date_to
+    if after:
+        query['_id'] = {'$gt': ObjectId(after)}
+    return query
+
+
+def find_potholes(query, limit, include_image=False):
+    """Return a cursor over one page of potholes in _id order (limit + 1 to detect a next page)."""
+    projection = None if include_image else META_PROJECTION
+    return get_collection().find(query, projection).sort('_id', ASCENDING).limit(limit + 1)
+
+
+def find_pothole_image(pothole_id):
+    doc = get_collection().find_one({'_id': ObjectId(pothole_id)}, {'image': 1})
+    return doc.get('image') if doc else None
+
+
+def distance_m(a, b):
+    # Haversine distance between two GeoJSON points
+    lon1, lat1 = map(math.radians, a['coordinates'])
+    lon2, lat2 = map(math.radians, b['coordinates'])
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(h))
+
+
+def find_nearby(location, radius_m):
+    # Only single-pothole documents can be the same pothole as a single-pothole frame
+    return get_collection().find_one(
+        {'location': {'$nearSphere': {'$geometry': location, '$maxDistance': radius_m}}, 'detections_count': 1},
+        {'quality': 1}
+    )
+
+
+def track_ids(frame):
+    return {track['id'] for track in frame.get('tracks') or []}
+
+
+def is_same_pothole(frame, other, merge_radius_m):
+    # The same track of one video, or a lone pothole at (nearly) the same spot
+    if track_ids(frame) & track_ids(other):
+        return True
+    return (
+        merge_radius_m > 0 and frame.get('detections_count') == 1 and other.get('detections_count') == 1
+        and other.get('location') is not None
+        and distance_m(frame['location'], other['location']) <= merge_radius_m
+    )
+
+
+def save_frames(frames, merge_radius_m=0):
+    """
+    Store detection frames, merging a frame into a pothole already stored
+    when it shows the same pothole: a frame of the same track in the same
+    batch, or a frame holding a single pothole within merge_radius_m of a
+    stored single pothole (seen again on a later drive). The frame position
+    is the vehicle's, so frames with several potholes are never merged by
+    distance. A merge counts a sighting and keeps the better view.
+    Returns the frames that were inserted as new potholes.
+    """
+    collection = get_collection()
+    new_frames = []
+    merges = []
+    for frame in frames:
+        frame = prepare_frame(frame)
+        frame.setdefault('sightings', 1)
+        location = frame.get('location')
+        if not location:
+            new_frames.append(frame)
+            continue
+
+        duplicate = next((other for other in new_frames if is_same_pothole(frame, other, merge_radius_m)), None)
+        if duplicate is not None:
+            duplicate['sightings'] += 1
+            if frame.get('captured_at'):
+                seen = [duplicate.get('last_seen'), duplicate.get('captured_at'), frame['captured_at']]
+                duplicate['last_seen'] = max(t for t in seen if t is not None)
+            if frame.get('quality', 0) > duplicate.get('quality', 0):
+                duplicate.update({field: frame[field] for field in BEST_VIEW_FIELDS if field in frame})
+            continue
+
+        if not merge_radius_m or frame.get('detections_count') != 1:
+            new_frames.append(frame)
+            continue
+        existing = find_nearby(location, merge_radius_m)
+        if existing is None:
+            new_frames.append(frame)
+            continue
+        update = {'$inc': {'sightings': 1}}
+        if frame.get('captured_at'):
+            update['$max'] = {'last_seen': frame['captured_at']}
+        if frame.get('quality', 0) > existing.get('quality', 0):
+            update['$set'] = {field: frame[field] for field in BEST_VIEW_FIELDS if field in frame}
+        merges.append(UpdateOne({'_id': existing['_id']}, update))
+
+    if new_frames:
+        collection.insert_many(new_frames)
+    if merges:
+        collection.bulk_write(merges, ordered=False)
+    return new_frames
+
+
+def serialize(doc):
+    doc['_id'] = str(doc['_id'])  # Convert ObjectId to string
+    for field in ('captured_at', 'last_seen'):
+        if isinstance(doc.get(field), datetime):
+            doc[field] = doc[field].isoformat()
+    return doc
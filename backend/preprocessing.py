@@ -0,0 +1,106 @@
+import cv2
+import numpy as np
+
+from detectors import Detector
+from ocr import OVERLAY_HEIGHT
+
+# Longest side in pixels each model is fed by default. These match the size each model
+# resizes to internally anyway (Ultralytics letterboxes to 640, DETR and detectron2 cap the
+# long side at 1333), so the defaults only save the resize work; smaller sizes trade
+# accuracy for speed, see calibrate_preprocessing.py
+DEFAULT_INFERENCE_SIZES = {
+    'yolov11n': 640,
+    'yolov11l': 640,
+    'rt-detr': 640,
+    'detr': 1333,
+    'faster_rcnn': 1333,
+}
+
+
+class RoiPreprocessor:
+    """
+    Crops a frame to the road region of interest and downsizes the crop so
+    its longest side is at most inference_size, before it goes to a model.
+
+    roi is (top, bottom, left, right) as fractions of the frame; the
+    dashcam overlay strip at the bottom is always left out since it holds no
+    road. inference_size None keeps the crop at full resolution.
+    """
+
+    def __init__(self, roi=(0.0, 1.0, 0.0, 1.0), inference_size=None, exclude_overlay=True):
+        self.roi = roi
+        self.inference_size = inference_size
+        self.exclude_overlay = exclude_overlay
+
+    def region(self, frame_shape):
+        height, width = frame_shape[:2]
+        top, bottom, left, right = self.roi
+        y0, y1 = int(height * top), int(height * bottom)
+        if self.exclude_overlay and height > 2 * OVERLAY_HEIGHT:
+            y1 = min(y1, height - OVERLAY_HEIGHT)
+        return int(width * left), y0, int(width * right), y1
+
+    def prepare(self, frame):
+        """Return the model input and the (x offset, y offset, scale) to map boxes back."""
+        x0, y0, x1, y1 = self.region(frame.shape)
+        crop = frame[y0:y1, x0:x1]
+        scale = 1.0
+        if self.inference_size and max(crop.shape[:2]) > self.inference_size:
+            scale = self.inference_size / max(crop.shape[:2])
+            crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return crop, (x0, y0, scale)
+
+    def restore(self, detections, transform):
+        """Map boxes from model input coordinates back onto the original frame."""
+        x0, y0, scale = transform
+        if len(detections):
+            detections.xyxy = detections.xyxy / scale + np.array([x0, y0, x0, y0], dtype=detections.xyxy.dtype)
+        return detections
+
+
+class PreprocessedDetector(Detector):
+    """Runs a loaded detector on ROI-cropped, downsized frames and returns boxes in frame coordinates."""
+
+    def __init__(self, detector, preprocessor):
+        super().__init__(detector.name, detector.model_path)
+        self.detector = detector
+        self.preprocessor = preprocessor
+        self.model = detector.model
+        # Preprocessing keeps no per-call state
+        self.thread_safe = getattr(detector, 'thread_safe', False)
+
+    def load(self):
+        self.detector.load()
+        self.model = self.detector.model
+        return self
+
+    def predict(self, frames):
+        prepared = [self.preprocessor.prepare(frame) for frame in frames]
+        detections = self.detector.predict([crop for crop, _ in prepared])
+        return [
+            self.preprocessor.restore(frame_detections, transform)
+            for frame_detections, (_, transform) in zip(detections, prepared)
+        ]
+
+    def labels(self, detections):
+        return self.detector.labels(detections)
+
+    def close(self):
+        self.detector.close()
+
+
+def parse_roi(value):
+    roi = tuple(float(v) for v in value.split(','))
+    if len(roi) != 4 or not (0 <= roi[0] < roi[1] <= 1 and 0 <= roi[2] < roi[3] <= 1):
+        raise ValueError(f"Invalid ROI: {value}")
+    return roi
+
+
+def parse_inference_sizes(value):
+    # "yolov11n=480,detr=640"; 0 means full resolution
+    sizes = dict(DEFAULT_INFERENCE_SIZES)
+    for item in value.split(','):
+        if '=' in item:
+            name, size = item.split('=')
+            sizes[name.strip()] = int(size) or None
+    return sizes
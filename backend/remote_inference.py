@@ -0,0 +1,192 @@
+"""
+Client side of the inference server (inference_server.py).
+
+Web workers in the 'remote' serving mode use RemoteDetector instead of
+loading models themselves. Frames travel through a shared memory segment
+owned by each connection: the client copies a batch into it once and sends
+only the segment name and the frame layouts, and the server runs the model
+on numpy views of that same memory. Pixel data is never pickled or
+written to the socket; only the (small) detections come back that way.
+"""
+import atexit
+import queue
+import threading
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Client
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import supervision as sv
+
+from detectors import Detector
+
+# Frame offsets in the segment are aligned to this many bytes
+ALIGNMENT = 64
+# Smallest segment created; it grows (doubling) to fit larger batches
+MIN_SEGMENT_BYTES = 32 * 1024 * 1024
+
+
+class RemoteInferenceError(Exception):
+    pass
+
+
+def attach_shared_memory(name):
+    """Open a segment created by another process without taking over its cleanup."""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the segment with this process's
+        # resource tracker, which would unlink it when this process exits
+        shm = SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def frame_views(buffer, layouts):
+    """numpy views over the frames packed in buffer, from their (offset, shape, dtype) layouts."""
+    return [np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset) for offset, shape, dtype in layouts]
+
+
+def detections_to_wire(detections):
+    return {
+        'xyxy': detections.xyxy,
+        'confidence': detections.confidence,
+        'class_id': detections.class_id,
+        'data': dict(detections.data),
+    }
+
+
+def detections_from_wire(payload):
+    return sv.Detections(
+        xyxy=payload['xyxy'],
+        confidence=payload['confidence'],
+        class_id=payload['class_id'],
+        data=payload['data']
+    )
+
+
+class _Channel:
+    # One connection to the server plus the shared memory segment its frames go through
+
+    def __init__(self, address, authkey):
+        self.connection = Client(address, family='AF_UNIX', authkey=authkey)
+        self.segment = None
+
+    def request(self, *message):
+        self.connection.send(message)
+        status, payload = self.connection.recv()
+        if status == 'error':
+            raise RemoteInferenceError(payload)
+        return payload
+
+    def pack(self, frames):
+        """Copy frames into the segment, growing it if needed, and return their layouts."""
+        layouts = []
+        offset = 0
+        for frame in frames:
+            layouts.append((offset, frame.shape, frame.dtype.str))
+            offset += -(-frame.nbytes // ALIGNMENT) * ALIGNMENT
+        if self.segment is None or self.segment.size < offset:
+            size = max(offset, MIN_SEGMENT_BYTES, 2 * self.segment.size if self.segment else 0)
+            self._release_segment()
+            self.segment = SharedMemory(create=True, size=size)
+        for view, frame in zip(frame_views(self.segment.buf, layouts), frames):
+            np.copyto(view, frame)
+        return layouts
+
+    def _release_segment(self):
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+
+    def close(self):
+        try:
+            self.connection.close()
+        finally:
+            self._release_segment()
+
+
+class InferenceClient:
+    """
+    Pool of channels to one inference server. Each call borrows a channel,
+    so concurrent pipelines don't share a segment; a channel that fails is
+    dropped and the call is retried once on a fresh one (the server may
+    have been restarted).
+    """
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self._idle = queue.LifoQueue()
+
+    def _call(self, method):
+        for attempt in range(2):
+            try:
+                channel = self._idle.get_nowait()
+            except queue.Empty:
+                channel = _Channel(self.address, self.authkey)
+            try:
+                result = method(channel)
+            except (EOFError, ConnectionError, OSError):
+                channel.close()
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                channel.close()
+                raise
+            self._idle.put(channel)
+            return result
+
+    def load(self, model):
+        return self._call(lambda channel: channel.request('load', model))
+
+    def predict(self, model, frames):
+        def predict(channel):
+            layouts = channel.pack(frames)
+            return channel.request('predict', model, channel.segment.name, layouts)
+        return [detections_from_wire(payload) for payload in self._call(predict)]
+
+    def stats(self):
+        return self._call(lambda channel: channel.request('stats'))
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def inference_client(address, authkey):
+    # One pool per server for the whole process
+    with _clients_lock:
+        if address not in _clients:
+            _clients[address] = InferenceClient(address, authkey)
+            # Unlink the shared memory segments on a clean exit
+            atexit.register(_clients[address].close)
+        return _clients[address]
+
+
+class RemoteDetector(Detector):
+    """A model held by the inference server; load() asks the server to load it."""
+    # Each call borrows its own channel, and the server batches concurrent calls
+    thread_safe = True
+
+    def __init__(self, name, address, authkey):
+        super().__init__(name, None)
+        self.client = inference_client(address, authkey)
+
+    def load(self):
+        self.client.load(self.name)
+        return self
+
+    def predict(self, frames):
+        if not frames:
+            return []
+        return self.client.predict(self.name, frames)
@@ -0,0 +1,113 @@
+import base64
+
+import cv2
+import numpy as np
+import supervision as sv
+
+from tracking import detection_quality
+
+# Results show the frame at this fraction of its original size
+OUTPUT_SCALE = 0.25
+# Smaller Hershey text runs its glyphs together when drawn at output size
+MIN_TEXT_SCALE = 0.4
+# Image formats a result can carry: name -> (OpenCV extension, MIME type, quality flag).
+# 'boxes' carries no image, only the box coordinates, for clients that draw their own overlay
+IMAGE_FORMATS = {
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY),
+    'boxes': None,
+}
+
+
+def resize_image(image, scale=OUTPUT_SCALE):
+    width = int(image.shape[1] * scale)
+    height = int(image.shape[0] * scale)
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def scale_detections(detections, scale):
+    # Only the boxes are drawn, so a copy without masks is enough
+    return sv.Detections(
+        xyxy=detections.xyxy * scale,
+        confidence=detections.confidence,
+        class_id=detections.class_id,
+        tracker_id=detections.tracker_id,
+        data=detections.data
+    )
+
+
+class FrameRenderer:
+    """
+    Turns a frame and its detections into a result. The frame is
+    downscaled first and the boxes, scaled to match, are drawn on the small
+    frame by annotators created once; line widths and text are scaled so
+    the output looks like drawing at full size and downscaling afterwards
+    (down to MIN_TEXT_SCALE). The image is encoded as JPEG or WebP at the
+    given quality, or left out with image_format 'boxes'. Holds no per-call
+    state, so one renderer serves every thread.
+    """
+
+    def __init__(self, image_format='jpeg', quality=90, scale=OUTPUT_SCALE, thickness=4, text_scale=1.0,
+                 text_thickness=2, text_padding=10):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown image format: {image_format}")
+        self.image_format = image_format
+        self.quality = quality
+        self.scale = scale
+        self.box_annotator = sv.BoxAnnotator(thickness=max(1, round(thickness * scale)))
+        self.label_annotator = sv.LabelAnnotator(
+            text_scale=max(MIN_TEXT_SCALE, text_scale * scale),
+            text_thickness=max(1, round(text_thickness * scale)),
+            text_padding=max(1, round(text_padding * scale))
+        )
+
+    def annotate(self, frame, detections, labels):
+        # resize() allocates a new frame, so the original is left untouched without a copy
+        small = resize_image(frame, self.scale)
+        if not len(detections):
+            return small
+        scaled = scale_detections(detections, self.scale)
+        small = self.box_annotator.annotate(scene=small, detections=scaled)
+        return self.label_annotator.annotate(scene=small, detections=scaled, labels=labels)
+
+    def encode(self, image):
+        extension, _, quality_flag = IMAGE_FORMATS[self.image_format]
+        ok, buffer = cv2.imencode(extension, image, [quality_flag, self.quality])
+        if not ok:
+            raise ValueError(f"Failed to encode frame as {self.image_format}")
+        return base64.b64encode(buffer).decode('utf-8')
+
+    def render(self, frame, detections, labels, info):
+        # Used to keep the best view when a pothole is seen again
+        quality = float(detection_quality(detections, frame.shape).max()) if len(detections) else 0.0
+        result = {
+            "info": info,
+            "detections_count": len(detections),
+            "quality": quality
+        }
+        if self.image_format == 'boxes':
+            result["frame_size"] = [frame.shape[1], frame.shape[0]]
+            result["boxes"] = np.round(detections.xyxy, 1).tolist()
+            result["confidence"] = np.round(detections.confidence, 3).tolist() if detections.confidence is not None else None
+            result["labels"] = list(labels)
+        else:
+            result["image"] = self.encode(self.annotate(frame, detections, labels))
+            result["image_type"] = IMAGE_FORMATS[self.image_format][1]
+        if detections.tracker_id is not None:
+            result["tracks"] = [
+                {"id": int(track_id), "sightings": int(sightings)}
+                for track_id, sightings in zip(detections.tracker_id.tolist(), detections.data['sightings'].tolist())
+            ]
+        return result
+
+
+# OpenCV's default JPEG quality, which results were always encoded with
+DEFAULT_RENDERER = FrameRenderer(quality=95)
+
+
+def annotate_frame(frame, detections, labels):
+    return DEFAULT_RENDERER.annotate(frame, detections, labels)
+
+
+def build_frame_result(frame, detections, labels, info, renderer=DEFAULT_RENDERER):
+    return renderer.render(frame, detections, labels, info)
@@ -0,0 +1,337 @@
+"""
+Content-addressed cache of detection results on local disk.
+
+Results are kept at two levels:
+
+- Runs: the results of a finished run, stored under a key derived from
+  the sha256 of the uploaded file, the model and the settings that shape
+  the results. A repeat upload is answered from the stored file without
+  decoding a frame.
+- Frames: the detections of each model and the overlay OCR reading for
+  every sampled frame, keyed by a hash of the frame (or overlay crop)
+  pixels. A video whose run was cancelled or failed, or the same footage
+  uploaded in another file, goes through OCR and inference again only
+  from the first frame that is not cached.
+
+Both levels are bounded in size and evict least recently used entries.
+"""
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+import supervision as sv
+
+READ_CHUNK_BYTES = 1024 * 1024
+# Frame writes between re-reading the frame table's size, which other processes add to as well
+FRAME_RESYNC_WRITES = 100
+
+
+def file_digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_BYTES), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def array_digest(array):
+    """Hash of an image's pixels, shape and dtype."""
+    array = np.ascontiguousarray(array)
+    digest = hashlib.blake2b(f"{array.shape}{array.dtype.str}".encode(), digest_size=16)
+    digest.update(array.data)
+    return digest.hexdigest()
+
+
+def fingerprint(*parts):
+    """Short stable hash of JSON-like values (settings, model names, digests)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def dump_detections(detections):
+    arrays = {'xyxy': detections.xyxy}
+    for name in ('confidence', 'class_id'):
+        if getattr(detections, name) is not None:
+            arrays[name] = getattr(detections, name)
+    for name, values in detections.data.items():
+        values = np.asarray(values)
+        # Object arrays would need pickle to load; class names are plain strings
+        arrays[f'data.{name}'] = values.astype(str) if values.dtype == object else values
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def load_detections(payload):
+    with np.load(io.BytesIO(payload), allow_pickle=False) as stored:
+        arrays = {name: stored[name] for name in stored.files}
+    return sv.Detections(
+        xyxy=arrays['xyxy'],
+        confidence=arrays.get('confidence'),
+        class_id=arrays.get('class_id'),
+        data={name[len('data.'):]: values for name, values in arrays.items() if name.startswith('data.')}
+    )
+
+
+class ResultCache:
+    """
+    Run results are NDJSON files in cache_dir, at most max_bytes in total;
+    frame entries live in a SQLite file there, at most max_frame_bytes.
+    Several processes (gunicorn workers) may share cache_dir: the sizes
+    are taken from disk before evicting rather than from what this process
+    wrote, though frame entries from other processes are only counted
+    every FRAME_RESYNC_WRITES writes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=1024 ** 3, max_frame_bytes=64 * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_frame_bytes = max_frame_bytes
+
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stored': 0, 'frame_hits': 0, 'frame_misses': 0}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        for entry in os.scandir(cache_dir):
+            # Runs that were being written when the process stopped
+            if entry.name.endswith('.tmp'):
+                os.remove(entry.path)
+        self._bytes = sum(size for _, _, size in self._run_entries())
+
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'frames.sqlite3'), check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS frames (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, used_at REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS frames_used_at ON frames (used_at)')
+        self._db.commit()
+        self._frame_bytes = self._count_frame_bytes()
+        self._frame_writes = 0
+
+    # Runs
+
+    def results(self, key):
+        """Iterator over the stored results of a finished run, or None if there are none."""
+        path = self._path(key)
+        try:
+            f = open(path, encoding='utf-8')
+            # The modification time doubles as the LRU clock
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+        with self._lock:
+            self._stats['hits'] += 1
+        return self._read(f)
+
+    def writer(self):
+        return ResultWriter(self)
+
+    def _read(self, f):
+        # The open file stays readable even if the entry is evicted meanwhile
+        with f:
+            for line in f:
+                yield json.loads(line)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.ndjson")
+
+    def _run_entries(self):
+        """(path, mtime, size) of every stored run, skipping files another process removes meanwhile."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.ndjson'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((entry.path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _store(self, tmp_path, key):
+        size = os.path.getsize(tmp_path)
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            return
+        os.replace(tmp_path, self._path(key))
+        # Other processes store runs in the same directory, so the total comes from disk
+        total = sum(size for _, _, size in self._run_entries())
+        with self._lock:
+            self._stats['stored'] += 1
+            self._bytes = total
+        if total > self.max_bytes:
+            self._evict_runs()
+
+    def _evict_runs(self):
+        # Drop least recently used runs until the directory is back under 90% of the budget
+        entries = sorted(self._run_entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Evicted by another process
+                pass
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            self._bytes = total
+
+    # Frames
+
+    def batched(self, namespace, compute, dumps, loads, cacheable=None):
+        """
+        Wrap compute(images) -> one value per image so that images already
+        seen (by pixel hash) within namespace skip it; the rest go to
+        compute as one batch. Values for which cacheable(value) is false
+        (e.g. a failed OCR reading) are not stored.
+        """
+        def cached(images):
+            images = list(images)
+            keys = [f"{namespace}:{array_digest(image)}" for image in images]
+            stored = self._frame_values(keys)
+            values = [loads(stored[key]) if key in stored else None for key in keys]
+            missing = [i for i, key in enumerate(keys) if key not in stored]
+            if missing:
+                computed = compute([images[i] for i in missing])
+                entries = []
+                for i, value in zip(missing, computed):
+                    values[i] = value
+                    if cacheable is None or cacheable(value):
+                        entries.append((keys[i], dumps(value)))
+                self._store_frame_values(entries)
+            with self._lock:
+                self._stats['frame_hits'] += len(images) - len(missing)
+                self._stats['frame_misses'] += len(missing)
+            return values
+        return cached
+
+    def _frame_values(self, keys):
+        if not keys:
+            return {}
+        placeholders = ','.join('?' * len(keys))
+        with self._lock:
+            rows = self._db.execute(f'SELECT key, value FROM frames WHERE key IN ({placeholders})', keys).fetchall()
+            if rows:
+                self._db.execute(
+                    f'UPDATE frames SET used_at = ? WHERE key IN ({",".join("?" * len(rows))})',
+                    [time.time()] + [key for key, _ in rows]
+                )
+                self._db.commit()
+        return dict(rows)
+
+    def _store_frame_values(self, entries):
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            for key, value in entries:
+                row = self._db.execute('SELECT size FROM frames WHERE key = ?', (key,)).fetchone()
+                self._db.execute(
+                    'INSERT OR REPLACE INTO frames (key, value, size, used_at) VALUES (?, ?, ?, ?)',
+                    (key, value, len(value), now)
+                )
+                self._frame_bytes += len(value) - (row[0] if row else 0)
+            self._frame_writes += 1
+            if self._frame_writes % FRAME_RESYNC_WRITES == 0:
+                self._frame_bytes = self._count_frame_bytes()
+            if self._frame_bytes > self.max_frame_bytes:
+                self._frame_bytes = self._count_frame_bytes()
+                if self._frame_bytes > self.max_frame_bytes:
+                    self._evict_frames()
+            self._db.commit()
+
+    def _count_frame_bytes(self):
+        return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM frames').fetchone()[0]
+
+    def _evict_frames(self):
+        # Caller holds self._lock. Drop least recently used entries down to 90% of the budget
+        target = self.max_frame_bytes * 0.9
+        evicted = []
+        for key, size in self._db.execute('SELECT key, size FROM frames ORDER BY used_at'):
+            if self._frame_bytes <= target:
+                break
+            evicted.append((key,))
+            self._frame_bytes -= size
+        self._db.executemany('DELETE FROM frames WHERE key = ?', evicted)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['bytes'] = self._bytes
+            stats['frame_bytes'] = self._frame_bytes
+        runs = stats['hits'] + stats['misses']
+        frames = stats['frame_hits'] + stats['frame_misses']
+        stats['hit_ratio'] = round(stats['hits'] / runs, 3) if runs else None
+        stats['frame_hit_ratio'] = round(stats['frame_hits'] / frames, 3) if frames else None
+        return stats
+
+
+class ResultWriter:
+    """
+    Collects the results of one run in a temporary file. commit(key) files
+    them under key once the run has finished; discard() drops them.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.tmp_path = os.path.join(cache.cache_dir, f"{uuid.uuid4().hex}.tmp")
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+
+    def add(self, result):
+        self._file.write(json.dumps(result) + '\n')
+
+    def commit(self, key):
+        self._file.close()
+        self.cache._store(self.tmp_path, key)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class CachedDetector:
+    """
+    Serves detections of frames seen before (by pixel hash) from a
+    ResultCache and runs the wrapped detector on the others. namespace must
+    change whenever the model's output for a frame can: weights,
+    preprocessing, thresholds.
+    """
+
+    def __init__(self, detector, cache, namespace):
+        self.detector = detector
+        self.name = detector.name
+        self.model_path = getattr(detector, 'model_path', None)
+        self._predict = cache.batched(f"detections:{namespace}", detector.predict, dump_detections, load_detections)
+
+    @property
+    def model(self):
+        return self.detector.model
+
+    @property
+    def thread_safe(self):
+        return getattr(self.detector, 'thread_safe', False)
+
+    def close(self):
+        close = getattr(self.detector, 'close', None)
+        if close is not None:
+            close()
+
+    def predict(self, frames):
+        if not frames:
+            return []
+        return self._predict(frames)
+
+    def labels(self, detections):
+        return self.detector.labels(detections)
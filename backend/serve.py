@@ -0,0 +1,108 @@
+"""
+Production serving: one inference server holding the models, and gunicorn
+web workers that send it frames.
+
+    python serve.py --bind 0.0.0.0:5000 --web-threads 16 --inference-workers 2
+
+The inference server (inference_server.py) is started first and gunicorn
+only once its socket accepts connections, so no web worker loads a model
+itself (SERVING_MODE=remote). Web workers stay small; RAM grows with the
+number of inference workers only through what they allocate at run time,
+since the weights are shared. Stopping this process stops both.
+
+Upload sessions (/uploads), jobs (/jobs, /stop-detection) and the
+per-model slots live in the memory of the web worker that created them,
+and the bundled frontend always uploads in chunks and stops jobs by id,
+so its requests have to reach one process: --web-workers defaults to 1,
+which scales with --web-threads (the work happens in the inference
+server). More web workers are only safe for clients that send each
+file in one /detect-potholes request and never stop a job.
+"""
+import argparse
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing.connection import Client
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_for_server(address, authkey, process, timeout_s):
+    # Loading every model can take a while; give up early if the server died
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Inference server exited with status {process.returncode}")
+        try:
+            connection = Client(address, family='AF_UNIX', authkey=authkey)
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.5)
+            continue
+        connection.close()
+        return
+    raise RuntimeError(f"Inference server not ready after {timeout_s}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default='0.0.0.0:5000')
+    parser.add_argument('--web-workers', type=int, default=1,
+                        help='gunicorn processes; upload sessions and jobs are not shared between them')
+    parser.add_argument('--web-threads', type=int, default=8, help='threads per web worker (streams are long-lived)')
+    parser.add_argument('--inference-workers', type=int, default=max(1, (os.cpu_count() or 2) // 4))
+    parser.add_argument('--inference-threads', type=int, default=4, help='torch threads per inference worker')
+    parser.add_argument('--models', default=os.getenv('INFERENCE_MODELS') or 'all',
+                        help='comma-separated models to serve, all loaded up front, or "all"')
+    parser.add_argument('--startup-timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    socket_path = os.path.join(tempfile.mkdtemp(prefix='potholytics-'), 'inference.sock')
+    authkey = secrets.token_hex(16)
+    env = {
+        **os.environ,
+        'SERVING_MODE': 'remote',
+        'INFERENCE_SOCKET': socket_path,
+        'INFERENCE_AUTHKEY': authkey,
+    }
+
+    inference = subprocess.Popen([
+        sys.executable, os.path.join(BACKEND_DIR, 'inference_server.py'),
+        '--socket', socket_path,
+        '--workers', str(args.inference_workers),
+        '--threads', str(args.inference_threads),
+        '--models', args.models,
+    ], cwd=BACKEND_DIR, env=env)
+    web = None
+    try:
+        wait_for_server(socket_path, authkey.encode(), inference, args.startup_timeout)
+        # The models live in the inference server, so the web workers warm nothing themselves
+        web = subprocess.Popen([
+            sys.executable, '-m', 'gunicorn',
+            '--bind', args.bind,
+            '--workers', str(args.web_workers),
+            '--worker-class', 'gthread',
+            '--threads', str(args.web_threads),
+            '--timeout', '600',
+            'app:app',
+        ], cwd=BACKEND_DIR, env={**env, 'WARM_MODELS': '', 'WARM_OCR': os.getenv('WARM_OCR', '0')})
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        while web.poll() is None and inference.poll() is None:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in (web, inference):
+            if process is not None and process.poll() is None:
+                process.terminate()
+        for process in (web, inference):
+            if process is not None:
+                process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,387 @@
+"""
+Metrics, per-job traces and log rate limiting.
+
+Metrics are kept in process and rendered in the Prometheus text format by
+/metrics. Traces are opt-in per job: with tracing off, NULL_TRACE.span()
+returns a shared no-op context, so instrumented code costs a method call.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+# Request latencies include streamed detection responses, which can run for minutes
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+INFERENCE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+BATCH_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames=(), function=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        # function() returns [(labels dict, value)], read at scrape time instead of stored values
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def set_function(self, function):
+        self.function = function
+
+    def samples(self):
+        if self.function is not None:
+            for labels, value in self.function():
+                if value is not None:
+                    yield self.name, self._key(labels), (), value
+            return
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, key, (), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=INFERENCE_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Per-bucket counts (made cumulative when rendered), then sum
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", key, (('le', _format_value(float(bound))),), cumulative
+            yield f"{self.name}_sum", key, (), counts[-1]
+            yield f"{self.name}_count", key, (), cumulative
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = Histogram(
+    'potholytics_request_duration_seconds',
+    'HTTP request latency until the last byte of the response was sent',
+    ('route', 'method', 'status', 'model'), buckets=REQUEST_BUCKETS
+)
+INFERENCE_SECONDS = Histogram(
+    'potholytics_inference_duration_seconds', 'Time of one detector forward pass over a batch', ('model',)
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    'potholytics_inference_batch_size', 'Frames per detector forward pass', ('model',), buckets=BATCH_SIZE_BUCKETS
+)
+BATCH_WAIT_SECONDS = Histogram(
+    'potholytics_batch_wait_seconds', 'Time a predict() call waited for its micro-batch to start', ('model',),
+    buckets=BATCH_WAIT_BUCKETS
+)
+FRAMES_SAMPLED = Counter('potholytics_frames_sampled_total', 'Frames picked by the sampler for processing')
+FRAMES_DROPPED = Counter(
+    'potholytics_frames_dropped_total',
+    'Sampled frames that produced no result (overlay unchanged, vehicle not moved, no detections)',
+    ('reason',)
+)
+PIPELINE_QUEUE_DEPTH = Gauge(
+    'potholytics_pipeline_queue_depth', 'Items waiting between video pipeline stages, over running pipelines',
+    ('queue',)
+)
+PIPELINES_RUNNING = Gauge('potholytics_pipelines_running', 'Video pipelines currently running')
+
+
+def register_stats(prefix, stats, counters=None, gauges=None):
+    """
+    Expose fields of a component's stats() dict as metrics read at scrape
+    time: counters as <prefix>_<field>_total, gauges as <prefix>_<field>.
+    Both map field -> help text.
+    """
+    for field, help in (counters or {}).items():
+        Counter(f"{prefix}_{field}_total", help, function=lambda field=field: [({}, stats()[field])])
+    for field, help in (gauges or {}).items():
+        Gauge(f"{prefix}_{field}", help, function=lambda field=field: [({}, stats()[field])])
+
+
+class InstrumentedDetector:
+    """Records the latency and batch size of each predict() call of a detector."""
+
+    def __init__(self, detector, name):
+        self.detector = detector
+        self.name = name
+        self.model_path = getattr(detector, 'model_path', None)
+
+    @property
+    def model(self):
+        # Read by the registry to estimate the model's memory
+        return self.detector.model
+
+    @property
+    def thread_safe(self):
+        return getattr(self.detector, 'thread_safe', False)
+
+    def close(self):
+        close = getattr(self.detector, 'close', None)
+        if close is not None:
+            close()
+
+    def predict(self, frames):
+        start = time.perf_counter()
+        detections = self.detector.predict(frames)
+        INFERENCE_SECONDS.observe(time.perf_counter() - start, model=self.name)
+        INFERENCE_BATCH_SIZE.observe(len(frames), model=self.name)
+        return detections
+
+    def labels(self, detections):
+        return self.detector.labels(detections)
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'attrs', 'start')
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.trace._record(self.name, self.start, time.perf_counter(), self.attrs)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _NullTrace:
+    enabled = False
+
+    def span(self, name, **attrs):
+        return _NULL_SPAN
+
+
+NULL_TRACE = _NullTrace()
+
+
+class Trace:
+    """Timed spans of one job across the threads that worked on it, up to max_spans."""
+    enabled = True
+
+    def __init__(self, trace_id, max_spans=20000):
+        self.id = trace_id
+        self.max_spans = max_spans
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self._spans = []
+        self._threads = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def span(self, name, **attrs):
+        return _Span(self, name, attrs)
+
+    def _record(self, name, start, end, attrs):
+        thread = threading.current_thread()
+        with self._lock:
+            if len(self._spans) >= self.max_spans:
+                self.dropped += 1
+                return
+            self._threads[thread.ident] = thread.name
+            self._spans.append((name, start - self._origin, end - start, thread.ident, attrs))
+
+    def to_chrome_trace(self):
+        # Chrome trace event format, viewable in Perfetto or chrome://tracing
+        with self._lock:
+            spans = list(self._spans)
+            threads = dict(self._threads)
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': ident, 'args': {'name': name}}
+            for ident, name in threads.items()
+        ]
+        events.extend(
+            {'name': name, 'ph': 'X', 'pid': 1, 'tid': ident,
+             'ts': round(offset * 1e6, 1), 'dur': round(duration * 1e6, 1), 'args': attrs}
+            for name, offset, duration, ident, attrs in spans
+        )
+        return {
+            'traceEvents': events,
+            'otherData': {'trace_id': self.id, 'started_at': self.started_at, 'dropped_spans': self.dropped},
+        }
+
+
+class Tracer:
+    """
+    Creates a Trace per job when tracing is enabled (or forced for one job)
+    and keeps the most recent max_traces of them for retrieval.
+    """
+
+    def __init__(self, enabled=False, max_traces=50, max_spans=20000):
+        self.enabled = enabled
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, trace_id, force=False):
+        if not (self.enabled or force):
+            return NULL_TRACE
+        trace = Trace(trace_id, self.max_spans)
+        with self._lock:
+            self._traces[trace_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        return trace
+
+    def get(self, trace_id):
+        with self._lock:
+            return self._traces.get(trace_id)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most burst records per logger and message template in
+    each interval_s window; the first record of the next window says how
+    many were suppressed. Loggers in exempt (access logs) pass unlimited.
+    """
+
+    def __init__(self, burst=10, interval_s=60.0, exempt=('werkzeug',)):
+        super().__init__()
+        self.burst = burst
+        self.interval_s = interval_s
+        self.exempt = exempt
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.name in self.exempt:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval_s:
+                suppressed = window[2] if window else 0
+                if len(self._windows) > 10000:
+                    self._windows.clear()
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+def configure_logging(level='INFO', burst=10, interval_s=60.0):
+    handler = logging.StreamHandler()
+    handler.addFilter(RateLimitFilter(burst, interval_s))
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+        handlers=[handler],
+        force=True
+    )
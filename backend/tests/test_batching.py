@@ -0,0 +1,45 @@
+import threading
+import time
+
+from batching import BatchingDetector
+
+
+class RecordingDetector:
+    name = 'fake'
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def predict(self, frames):
+        self.calls.append(list(frames))
+        # The first call holds the scheduler so that the next callers queue up behind it
+        if len(self.calls) == 1:
+            self.release.wait(5)
+        return [f"detections of {frame}" for frame in frames]
+
+
+def call(detector, frame, results):
+    results[frame] = detector.predict([frame])
+
+
+def test_concurrent_callers_share_one_predict_call():
+    fake = RecordingDetector()
+    detector = BatchingDetector(fake, max_batch_size=4, max_wait_ms=0)
+    results = {}
+    threads = [threading.Thread(target=call, args=(detector, frame, results)) for frame in ('a', 'b', 'c')]
+    threads[0].start()
+    while not fake.calls:
+        time.sleep(0.01)
+    for thread in threads[1:]:
+        thread.start()
+    while len(detector._queue) < 2:
+        time.sleep(0.01)
+    fake.release.set()
+    for thread in threads:
+        thread.join(5)
+    detector.close()
+
+    assert len(fake.calls) == 2
+    assert sorted(fake.calls[1]) == ['b', 'c']
+    assert results == {frame: [f"detections of {frame}"] for frame in 'abc'}
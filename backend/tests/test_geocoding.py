@@ -0,0 +1,29 @@
+import sqlite3
+import time
+
+from geocoding import GeocodeCache
+
+
+def rows(db_path):
+    with sqlite3.connect(db_path) as db:
+        return sorted(key for key, in db.execute('SELECT key FROM geocode'))
+
+
+def test_expired_rows_are_purged_on_open_and_every_n_writes(tmp_path):
+    db_path = str(tmp_path / 'geocode.sqlite3')
+    cache = GeocodeCache('key', db_path=db_path, ttl_s=60, purge_every=2)
+    cache._store('1.0000,2.0000', 'Old street')
+    cache._db.execute('UPDATE geocode SET created_at = ?', (time.time() - 120,))
+    cache._db.commit()
+
+    # Reopening drops the expired row
+    cache = GeocodeCache('key', db_path=db_path, ttl_s=60, purge_every=2)
+    assert rows(db_path) == []
+
+    cache._store('1.0000,2.0000', 'Old street')
+    cache._db.execute('UPDATE geocode SET created_at = ?', (time.time() - 120,))
+    cache._db.commit()
+    # The second write purges
+    cache._store('3.0000,4.0000', 'New street')
+    assert rows(db_path) == ['3.0000,4.0000']
+    assert cache.address(3, 4) == 'New street'
@@ -0,0 +1,51 @@
+import os
+import threading
+
+from jobs import JobManager
+
+
+def test_results_are_read_back_from_disk(tmp_path):
+    manager = JobManager(str(tmp_path), max_workers=1)
+    done = threading.Event()
+
+    def work(job):
+        for i in range(3):
+            job.add_result({'frame': i, 'image': 'x' * 100})
+        done.set()
+
+    job = manager.submit('yolov11l', 'video.mp4', work)
+    assert done.wait(5)
+    manager.executor.shutdown(wait=True)
+    assert job.status == 'completed'
+    assert job.to_dict()['results_count'] == 3
+    assert [result['frame'] for result in job.results.since(1)] == [1, 2]
+    assert job.results.since(3) == []
+    assert os.path.exists(job.results.path)
+
+
+def test_finished_jobs_are_pruned_on_read(tmp_path):
+    manager = JobManager(str(tmp_path), keep_finished_s=0)
+    job = manager.create('yolov11l', 'video.mp4')
+    job.add_result({'frame': 0})
+    job.mark_finished()
+    job.finished_at -= 1
+    assert manager.get(job.id) is None
+    assert not os.path.exists(job.results.path)
+
+
+def test_model_slots_are_shared_with_queued_jobs(tmp_path):
+    manager = JobManager(str(tmp_path), model_concurrency={'detr': 1})
+    with manager.model_slots(['yolov11l', 'detr']) as acquired:
+        assert acquired
+        # The detr slot is taken, so a request for it gives up once cancelled
+        with manager.model_slots(['detr'], cancelled=lambda: True) as acquired_again:
+            assert not acquired_again
+    with manager.model_slots(['detr'], cancelled=lambda: True) as acquired:
+        assert acquired
+
+
+def test_models_without_a_limit_take_no_slot(tmp_path):
+    manager = JobManager(str(tmp_path), model_concurrency={'detr': 1}, default_model_concurrency=0)
+    with manager.model_slots(['yolov11l']) as acquired:
+        with manager.model_slots(['yolov11l'], cancelled=lambda: True) as acquired_again:
+            assert acquired and acquired_again
@@ -0,0 +1,41 @@
+import numpy as np
+
+from ocr import OverlayOCR
+
+LOCAL_TEXT = "01-06-2024 08:00:05 42km/h E 101.68690 , N 3.13900"
+
+
+def raising_ocr(local_text):
+    ocr = OverlayOCR(engine='easyocr', cloud_fallback=True)
+    ocr.local_text = lambda crops: [local_text for _ in crops]
+
+    def detect_text(crop):
+        raise RuntimeError("Quota exceeded")
+    ocr.detect_text = detect_text
+    return ocr
+
+
+def test_cloud_error_keeps_the_partial_local_reading():
+    # The time is missing locally, so the crop goes to the cloud fallback, which fails
+    ocr = raising_ocr("01-06-2024 42km/h E 101.68690 , N 3.13900")
+    parsed = ocr.read([np.zeros((100, 640, 3), np.uint8)])
+    assert parsed == [{'date': '01-06-2024', 'time': None, 'latitude': 3.139, 'longitude': 101.6869}]
+    stats = ocr.stats()
+    assert stats['cloud_calls'] == 1
+    assert stats['cloud_errors'] == 1
+    assert stats['failures'] == 1
+
+
+def test_cloud_error_without_a_local_reading_gives_empty_fields():
+    ocr = raising_ocr("")
+    ocr.engine = 'cloud'
+    parsed = ocr.read([np.zeros((100, 640, 3), np.uint8)])
+    assert parsed == [{'date': None, 'time': None, 'latitude': None, 'longitude': None}]
+    assert ocr.stats()['cloud_errors'] == 1
+
+
+def test_valid_local_reading_skips_the_cloud():
+    ocr = raising_ocr(LOCAL_TEXT)
+    parsed = ocr.read([np.zeros((100, 640, 3), np.uint8)])
+    assert parsed[0]['time'] == '08:00:05'
+    assert ocr.stats()['cloud_calls'] == 0
@@ -0,0 +1,72 @@
+import threading
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+import supervision as sv
+
+from frame_sampling import FrameSampler
+from ocr import OverlayChangeDetector, overlay_crop, text_words
+from video_pipeline import VideoPipeline
+
+WIDTH, HEIGHT, FPS = 1280, 480, 1
+
+
+def overlay_frame(seconds, latitude=3.13900, longitude=101.68690):
+    frame = np.full((HEIGHT, WIDTH, 3), 90, dtype=np.uint8)
+    moment = datetime(2024, 6, 1, 8, 0, 0) + timedelta(seconds=seconds)
+    text = f"{moment:%d-%m-%Y %H:%M:%S} 0km/h E {longitude:.5f} , N {latitude:.5f}"
+    cv2.rectangle(frame, (0, HEIGHT - 100), (WIDTH, HEIGHT), (0, 0, 0), -1)
+    cv2.putText(frame, text, (20, HEIGHT - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 255), 2)
+    return frame
+
+
+def write_video(path, frames):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), FPS, (WIDTH, HEIGHT))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+
+class CountingDetector:
+    def __init__(self):
+        self.frames = 0
+
+    def predict(self, frames):
+        self.frames += len(frames)
+        return [sv.Detections.empty() for _ in frames]
+
+
+def test_words_split_date_and_clock_from_gps():
+    words = text_words(cv2.cvtColor(overlay_crop(overlay_frame(0)), cv2.COLOR_BGR2GRAY))
+    # date, clock, speed, "E", longitude, ",", "N", latitude
+    assert len(words) == 8
+
+
+def test_clock_only_changes_are_skipped():
+    detector = OverlayChangeDetector()
+    assert detector.changed(overlay_crop(overlay_frame(0)))
+    for seconds in range(1, 6):
+        assert not detector.changed(overlay_crop(overlay_frame(seconds)))
+    assert detector.changed(overlay_crop(overlay_frame(6, latitude=3.14012)))
+
+
+def test_pipeline_skips_ocr_and_inference_when_only_the_clock_ticks(tmp_path):
+    path = write_video(tmp_path / 'parked.mp4', [overlay_frame(seconds) for seconds in range(6)])
+    detector = CountingDetector()
+    ocr_frames = []
+
+    def extract_infos(frames):
+        ocr_frames.extend(frames)
+        return [{'latitude': 3.139, 'longitude': 101.6869} for _ in frames]
+
+    change_detector = OverlayChangeDetector()
+    list(VideoPipeline(
+        path, detector, threading.Lock(), extract_infos, lambda *args: None,
+        sampler=FrameSampler(interval_s=1.0),
+        overlay_changed=lambda frame: change_detector.changed(overlay_crop(frame))
+    ))
+    assert change_detector.skipped == 5
+    assert len(ocr_frames) == 1
+    assert detector.frames == 1
@@ -0,0 +1,17 @@
+import pytest
+
+pytest.importorskip('pymongo')
+
+from pothole_store import location_of, prepare_frame
+
+
+def test_location_from_overlay_coordinates():
+    assert location_of({'latitude': 3.139, 'longitude': '101.6869'}) == {'type': 'Point', 'coordinates': [101.6869, 3.139]}
+
+
+@pytest.mark.parametrize('latitude, longitude', [
+    (None, 101.6869), (91, 101.6869), (3.139, -181), ('3.1x39', 101.6869), (float('nan'), 101.6869), ([3], 101.6869),
+])
+def test_invalid_coordinates_give_no_location(latitude, longitude):
+    assert location_of({'latitude': latitude, 'longitude': longitude}) is None
+    assert 'location' not in prepare_frame({'info': {'latitude': latitude, 'longitude': longitude}})
@@ -0,0 +1,18 @@
+import os
+
+from result_cache import ResultCache
+
+
+def store(cache, key):
+    writer = cache.writer()
+    writer.add({'image': 'x' * 990})
+    writer.commit(key)
+
+
+def test_runs_stored_by_other_processes_count_towards_the_budget(tmp_path):
+    # Two caches on one directory, as in two gunicorn workers
+    first, second = ResultCache(str(tmp_path), max_bytes=2500), ResultCache(str(tmp_path), max_bytes=2500)
+    for i, cache in enumerate([first, second, first, second]):
+        store(cache, f'run{i}')
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.ndjson')) == ['run2.ndjson', 'run3.ndjson']
+    assert list(second.results('run3'))[0]['image'] == 'x' * 990
@@ -0,0 +1,37 @@
+import numpy as np
+import supervision as sv
+
+from tracking import PotholeTracker
+
+FRAME = np.zeros((480, 640, 3), np.uint8)
+
+
+def detections(*boxes):
+    if not boxes:
+        return sv.Detections.empty()
+    return sv.Detections(
+        xyxy=np.array(boxes, dtype=float), confidence=np.full(len(boxes), 0.9), class_id=np.zeros(len(boxes), dtype=int)
+    )
+
+
+def track(frames):
+    tracker = PotholeTracker()
+    results = []
+    for index, frame_detections in enumerate(frames):
+        results += tracker.update(index, FRAME, frame_detections, {})
+    results += tracker.flush()
+    return [(index, len(found), found.data['sightings'].tolist()) for index, _, found, _ in results]
+
+
+def test_pothole_seen_once_after_the_first_frame_is_kept():
+    assert track([detections(), detections([100, 100, 200, 200]), detections()]) == [(1, 1, [1])]
+
+
+def test_pothole_seen_twice_comes_out_once_with_both_sightings():
+    results = track([detections(), detections([100, 100, 200, 200]), detections([102, 102, 204, 204]), detections()])
+    assert results == [(2, 1, [2])]
+
+
+def test_new_pothole_next_to_a_tracked_one_is_kept():
+    results = track([detections([10, 10, 60, 60]), detections([12, 12, 62, 62], [300, 300, 400, 400]), detections()])
+    assert sorted(results) == [(0, 1, [2]), (1, 1, [1])]
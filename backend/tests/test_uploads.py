@@ -0,0 +1,62 @@
+import io
+
+import cv2
+import numpy as np
+
+import uploads
+from uploads import StreamingCapture, UploadSession, stream_rotation
+
+
+def test_rotation_from_display_matrix():
+    stream = {'width': 1920, 'height': 1080, 'side_data_list': [{'side_data_type': 'Display Matrix', 'rotation': -90}]}
+    assert stream_rotation(stream) == 270
+
+
+def test_rotation_from_rotate_tag():
+    assert stream_rotation({'tags': {'rotate': '180'}}) == 180
+
+
+def test_no_rotation():
+    assert stream_rotation({'width': 1920, 'height': 1080}) == 0
+
+
+class FakeDecoder:
+    """Stands in for the ffmpeg process: writes the given raw BGR frames to stdout."""
+
+    def __init__(self, frames):
+        self.stdin = io.BytesIO()
+        self.stdout = io.BytesIO(b''.join(frame.tobytes() for frame in frames))
+
+    def poll(self):
+        return 0
+
+    def wait(self):
+        return 0
+
+
+def streaming_capture(monkeypatch, tmp_path, frames):
+    monkeypatch.setattr(uploads.subprocess, 'Popen', lambda *args, **kwargs: FakeDecoder(frames))
+    session = UploadSession('video.mp4', None, str(tmp_path))
+    session.finish()
+    height, width = frames[0].shape[:2]
+    return StreamingCapture(session, width, height, 30.0, len(frames))
+
+
+def test_streaming_capture_decodes_grabs_and_seeks(monkeypatch, tmp_path):
+    frames = [np.full((4, 6, 3), value, np.uint8) for value in range(5)]
+    capture = streaming_capture(monkeypatch, tmp_path, frames)
+
+    ok, first = capture.read()
+    assert ok and first.shape == (4, 6, 3) and (first == 0).all()
+    assert capture.grab()
+    assert capture.set(cv2.CAP_PROP_POS_FRAMES, 3)
+    ok, fourth = capture.read()
+    assert ok and (fourth == 3).all()
+    # Frames handed out stay as they were while the next ones are decoded
+    assert (first == 0).all()
+    assert capture.get(cv2.CAP_PROP_POS_FRAMES) == 4
+
+    assert capture.read()[0]
+    assert capture.read() == (False, None)
+    assert not capture.isOpened()
+    capture.release()
@@ -0,0 +1,143 @@
+import numpy as np
+import supervision as sv
+
+
+def detection_quality(detections, frame_shape):
+    # How good a view each box is: confident and large (i.e. close to the camera)
+    if len(detections) == 0:
+        return np.zeros(0)
+    height, width = frame_shape[:2]
+    area = detections.box_area / float(height * width)
+    return detections.confidence * np.sqrt(area)
+
+
+class PotholeTracker:
+    """
+    Follows potholes across the sampled frames of one video with ByteTrack
+    and keeps only the best view of each one. update() is called for every
+    frame that went through the detector and returns the frames whose
+    potholes are done: each such frame carries only the detections of the
+    tracks it is the best view of, so a pothole visible for several seconds
+    comes out once instead of once per frame.
+
+    ByteTrack only reports a track from its second sighting on (except on
+    the first frame), so detections it doesn't return are followed here
+    under a provisional negative id: if ByteTrack confirms them on the
+    next frame the track takes over ByteTrack's id, otherwise they come
+    out as potholes seen once.
+
+    lost_after is the number of sampled frames a track may go unseen before
+    it is considered finished.
+    """
+
+    def __init__(self, lost_after=2, activation_threshold=0.25, matching_threshold=0.8):
+        self.lost_after = lost_after
+        # ByteTrack scales its lost buffer by frame_rate / 30; each sampled frame counts as one tick
+        self.tracker = sv.ByteTrack(
+            track_activation_threshold=activation_threshold,
+            lost_track_buffer=lost_after,
+            minimum_matching_threshold=matching_threshold,
+            frame_rate=30
+        )
+        self._step = 0
+        self._next_provisional_id = -1
+        # provisional id -> box, for the detections ByteTrack didn't report on the last frame
+        self._pending = {}
+        # track id -> {'index', 'score', 'sightings', 'last_seen'}
+        self._tracks = {}
+        # frame index -> {'frame', 'detections', 'info', 'live': track ids, 'ended': {track id: sightings}}
+        self._frames = {}
+
+    def update(self, index, frame, detections, info):
+        self._step += 1
+        tracked = self.tracker.update_with_detections(detections)
+        self._confirm(tracked)
+        tracked = self._with_untracked(detections, tracked)
+        if len(tracked):
+            scores = detection_quality(tracked, frame.shape)
+            for track_id, score in zip(tracked.tracker_id.tolist(), scores.tolist()):
+                track = self._tracks.setdefault(track_id, {'index': None, 'score': -1.0, 'sightings': 0})
+                track['sightings'] += 1
+                track['last_seen'] = self._step
+                if score > track['score']:
+                    self._move_best(track_id, track, index, frame, tracked, info)
+                    track['score'] = score
+
+        ended = [
+            track_id for track_id, track in self._tracks.items()
+            if self._step - track['last_seen'] > self.lost_after
+        ]
+        return self._end(ended)
+
+    def _confirm(self, tracked):
+        # A track ByteTrack reports for the first time continues the provisional track it grew from
+        pending, self._pending = self._pending, {}
+        new = [i for i, track_id in enumerate(tracked.tracker_id.tolist()) if track_id not in self._tracks]
+        if not new or not pending:
+            return
+        provisional_ids = [track_id for track_id in pending if track_id in self._tracks]
+        if not provisional_ids:
+            return
+        ious = sv.box_iou_batch(tracked.xyxy[new], np.array([pending[track_id] for track_id in provisional_ids]))
+        while ious.size and ious.max() > 0:
+            row, column = np.unravel_index(ious.argmax(), ious.shape)
+            self._rename(provisional_ids[column], int(tracked.tracker_id[new[row]]))
+            ious[row, :] = 0
+            ious[:, column] = 0
+
+    def _rename(self, old_id, new_id):
+        track = self._tracks[new_id] = self._tracks.pop(old_id)
+        entry = self._frames[track['index']]
+        entry['live'].discard(old_id)
+        entry['live'].add(new_id)
+        entry['detections'].tracker_id[entry['detections'].tracker_id == old_id] = new_id
+
+    def _with_untracked(self, detections, tracked):
+        # ByteTrack returns copies of the detections it reports; the others get provisional ids
+        if len(tracked):
+            reported = (detections.xyxy[:, None, :] == tracked.xyxy[None, :, :]).all(axis=2).any(axis=1)
+        else:
+            reported = np.zeros(len(detections), dtype=bool)
+        if reported.all():
+            return tracked
+        untracked = detections[~reported]
+        untracked.tracker_id = np.arange(self._next_provisional_id, self._next_provisional_id - len(untracked), -1)
+        self._next_provisional_id -= len(untracked)
+        self._pending = dict(zip(untracked.tracker_id.tolist(), untracked.xyxy))
+        return sv.Detections.merge([tracked, untracked]) if len(tracked) else untracked
+
+    def flush(self):
+        """End every remaining track, at the end of the video."""
+        return self._end(list(self._tracks))
+
+    def _move_best(self, track_id, track, index, frame, tracked, info):
+        previous = self._frames.get(track['index'])
+        if previous is not None:
+            previous['live'].discard(track_id)
+            if not previous['live'] and not previous['ended']:
+                del self._frames[track['index']]
+        entry = self._frames.setdefault(index, {
+            'frame': frame, 'detections': tracked, 'info': info, 'live': set(), 'ended': {}
+        })
+        entry['live'].add(track_id)
+        track['index'] = index
+
+    def _end(self, track_ids):
+        finished = []
+        for track_id in track_ids:
+            track = self._tracks.pop(track_id)
+            entry = self._frames[track['index']]
+            entry['live'].discard(track_id)
+            entry['ended'][track_id] = track['sightings']
+            if not entry['live']:
+                finished.append(track['index'])
+
+        results = []
+        for index in sorted(set(finished)):
+            entry = self._frames.pop(index)
+            detections = entry['detections']
+            keep = np.isin(detections.tracker_id, list(entry['ended']))
+            detections = detections[keep]
+            detections.data['sightings'] = np.array([entry['ended'][t] for t in detections.tracker_id.tolist()])
+            results.append((index, entry['frame'], detections, entry['info']))
+        return results
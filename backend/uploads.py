@@ -0,0 +1,350 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+from frame_sampling import DEFAULT_FPS
+
+# Bytes to wait for before probing whether a partial video can already be decoded
+PROBE_BYTES = 1024 * 1024
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadOffsetMismatch(UploadError):
+    def __init__(self, offset):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class UploadAborted(UploadError):
+    pass
+
+
+class UploadSession:
+    """
+    One resumable upload, written to its own directory. Chunks are appended
+    at the offset the client says it is sending; a mismatch tells the client
+    where to resume. Readers can wait on the session to follow the file as
+    it grows.
+    """
+
+    def __init__(self, filename, size, directory):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.size = size
+        self.directory = os.path.join(directory, self.id)
+        self.path = os.path.join(self.directory, filename)
+        self.offset = 0
+        self.complete = False
+        self.aborted = False
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._condition = threading.Condition()
+        # Chunks arrive in order, so the file is hashed as it is written
+        self._sha256 = hashlib.sha256()
+
+        os.makedirs(self.directory)
+        open(self.path, 'wb').close()
+
+    def append(self, offset, data):
+        with self._condition:
+            if self.aborted:
+                raise UploadAborted()
+            if self.complete:
+                raise UploadError("Upload is already complete")
+            if offset != self.offset:
+                raise UploadOffsetMismatch(self.offset)
+            if self.size is not None and offset + len(data) > self.size:
+                raise UploadError("Chunk goes past the declared upload size")
+            with open(self.path, 'ab') as f:
+                f.write(data)
+            self._sha256.update(data)
+            self.offset += len(data)
+            self.updated_at = time.time()
+            if self.size is not None and self.offset == self.size:
+                self.complete = True
+            self._condition.notify_all()
+            return self.offset
+
+    def finish(self):
+        with self._condition:
+            if self.size is not None and self.offset != self.size:
+                raise UploadOffsetMismatch(self.offset)
+            self.complete = True
+            self.updated_at = time.time()
+            self._condition.notify_all()
+
+    @property
+    def digest(self):
+        """sha256 of the uploaded file, or None while it is still arriving."""
+        with self._condition:
+            return self._sha256.hexdigest() if self.complete and not self.aborted else None
+
+    def abort(self):
+        with self._condition:
+            self.aborted = True
+            self._condition.notify_all()
+
+    def wait_for(self, offset, should_stop=None, idle_timeout_s=300):
+        """
+        Block until more than offset bytes have arrived or the upload is
+        complete. Returns the number of bytes available.
+        """
+        should_stop = should_stop or (lambda: False)
+        with self._condition:
+            while self.offset <= offset and not self.complete:
+                if self.aborted:
+                    raise UploadAborted()
+                if should_stop():
+                    raise UploadAborted()
+                if time.time() - self.updated_at > idle_timeout_s:
+                    raise UploadError("Upload stalled")
+                self._condition.wait(timeout=0.5)
+            if self.aborted:
+                raise UploadAborted()
+            return self.offset
+
+    def wait_complete(self, should_stop=None, idle_timeout_s=300):
+        while not self.complete:
+            self.wait_for(self.offset, should_stop, idle_timeout_s)
+
+    def chunks(self, should_stop=None, idle_timeout_s=300):
+        """Yield the file's bytes from the start, waiting for chunks that haven't arrived yet."""
+        position = 0
+        with open(self.path, 'rb') as f:
+            while True:
+                available = self.wait_for(position, should_stop, idle_timeout_s)
+                while position < available:
+                    data = f.read(min(READ_CHUNK_BYTES, available - position))
+                    if not data:
+                        break
+                    position += len(data)
+                    yield data
+                if self.complete and position >= self.offset:
+                    return
+
+    def to_dict(self):
+        with self._condition:
+            return {
+                'upload_id': self.id,
+                'filename': self.filename,
+                'size': self.size,
+                'offset': self.offset,
+                'complete': self.complete,
+            }
+
+
+class UploadManager:
+    """Keeps upload sessions under root and forgets the ones left idle for keep_s."""
+
+    def __init__(self, root, keep_s=24 * 3600):
+        self.root = root
+        self.keep_s = keep_s
+        self._sessions = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def create(self, filename, size=None):
+        session = UploadSession(filename, size, self.root)
+        with self._lock:
+            self._prune()
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, upload_id):
+        with self._lock:
+            return self._sessions.get(upload_id)
+
+    def remove(self, upload_id):
+        with self._lock:
+            session = self._sessions.pop(upload_id, None)
+        if session is not None:
+            session.abort()
+            shutil.rmtree(session.directory, ignore_errors=True)
+
+    def _prune(self):
+        # Caller holds self._lock
+        now = time.time()
+        for upload_id, session in list(self._sessions.items()):
+            if now - session.updated_at > self.keep_s:
+                del self._sessions[upload_id]
+                session.abort()
+                shutil.rmtree(session.directory, ignore_errors=True)
+
+
+def stream_rotation(stream):
+    # Phone videos are stored sideways with a display matrix (or, from older muxers, a rotate tag)
+    rotations = [side_data.get('rotation') for side_data in stream.get('side_data_list', [])]
+    rotations.append(stream.get('tags', {}).get('rotate'))
+    for rotation in rotations:
+        try:
+            return int(float(rotation)) % 360
+        except (TypeError, ValueError):
+            continue
+    return 0
+
+
+def probe_video(path):
+    """
+    Return (width, height, fps, frame_count) of a possibly partial video
+    file with ffprobe, or None when it can't be read yet (for example an MP4
+    whose index is written at the end of the file). width and height are
+    those of the frames once rotated upright, as ffmpeg and OpenCV decode
+    them.
+    """
+    if not shutil.which('ffprobe'):
+        return None
+    try:
+        output = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'stream=width,height,avg_frame_rate,nb_frames:stream_tags=rotate:stream_side_data=rotation',
+             '-of', 'json', path],
+            capture_output=True, text=True, timeout=30, check=True
+        ).stdout
+        stream = json.loads(output)['streams'][0]
+        width, height = int(stream['width']), int(stream['height'])
+    except (subprocess.SubprocessError, OSError, ValueError, KeyError, IndexError):
+        return None
+    if stream_rotation(stream) % 180 == 90:
+        width, height = height, width
+    try:
+        numerator, denominator = stream.get('avg_frame_rate', '0/0').split('/')
+        fps = float(numerator) / float(denominator)
+    except (ValueError, ZeroDivisionError):
+        fps = DEFAULT_FPS
+    try:
+        frame_count = int(stream.get('nb_frames') or 0)
+    except ValueError:
+        frame_count = 0
+    return width, height, fps, frame_count
+
+
+class StreamingCapture:
+    """
+    Minimal cv2.VideoCapture stand-in that decodes an upload while it is
+    still arriving: the received bytes are piped into ffmpeg, which writes
+    raw BGR frames back, rotated upright like cv2.VideoCapture does.
+    Supports what FrameSampler uses (read, grab, retrieve, forward seeks
+    and the FPS / frame count properties).
+    """
+
+    def __init__(self, session, width, height, fps, frame_count, should_stop=None):
+        self.session = session
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_count = frame_count
+        self.should_stop = should_stop
+        self.position = 0
+        # Every frame is read into this one buffer; retrieve() copies out the ones that are kept
+        self._buffer = bytearray(width * height * 3)
+        self._grabbed = False
+        self._opened = True
+        self.process = subprocess.Popen(
+            ['ffmpeg', '-v', 'error', '-i', 'pipe:0',
+             '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self._feeder = threading.Thread(target=self._feed, daemon=True)
+        self._feeder.start()
+
+    def _feed(self):
+        try:
+            for chunk in self.session.chunks(self.should_stop):
+                self.process.stdin.write(chunk)
+        except (OSError, UploadError):
+            pass
+        finally:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+
+    def isOpened(self):
+        return self._opened
+
+    def grab(self):
+        if not self._opened:
+            return False
+        self._grabbed = False
+        view = memoryview(self._buffer)
+        filled = 0
+        while filled < len(self._buffer):
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                self._opened = False
+                return False
+            filled += count
+        self._grabbed = True
+        self.position += 1
+        return True
+
+    def retrieve(self):
+        if not self._grabbed:
+            return False, None
+        return True, np.frombuffer(self._buffer, np.uint8).reshape(self.height, self.width, 3).copy()
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.frame_count
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.position
+        return 0
+
+    def set(self, prop, value):
+        # The pipe only goes forward, so a seek decodes up to the target frame
+        if prop != cv2.CAP_PROP_POS_FRAMES or value < self.position:
+            return False
+        while self.position < value:
+            if not self.grab():
+                return False
+        return True
+
+    def release(self):
+        self._opened = False
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdout.close()
+
+
+def open_capture(session, streaming=True, should_stop=None):
+    """
+    Open a capture on an upload session. Decoding starts on the bytes
+    received so far when the container allows it and ffmpeg is available;
+    otherwise this waits for the whole upload and opens it with OpenCV.
+    Returns None if should_stop() turns true while waiting.
+    """
+    try:
+        if streaming and shutil.which('ffmpeg'):
+            received = 0
+            while received < PROBE_BYTES and not session.complete:
+                received = session.wait_for(received, should_stop)
+            if not session.complete:
+                probe = probe_video(session.path)
+                if probe is not None:
+                    return StreamingCapture(session, *probe, should_stop=should_stop)
+        session.wait_complete(should_stop)
+    except UploadAborted:
+        if should_stop and should_stop():
+            return None
+        raise
+    return cv2.VideoCapture(session.path)
@@ -0,0 +1,290 @@
+import queue
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+import telemetry
+from frame_sampling import FrameSampler
+
+_DONE = object()
+
+# Pipelines currently iterating, for the queue depth metrics
+_running = weakref.WeakSet()
+_running_lock = threading.Lock()
+
+
+def _queue_depths():
+    with _running_lock:
+        pipelines = list(_running)
+    depths = {}
+    for pipeline in pipelines:
+        for name, q in pipeline._queues.items():
+            depths[name] = depths.get(name, 0) + q.qsize()
+    return [({'queue': name}, depth) for name, depth in depths.items()]
+
+
+def _running_count():
+    with _running_lock:
+        return [({}, len(_running))]
+
+
+telemetry.PIPELINE_QUEUE_DEPTH.set_function(_queue_depths)
+telemetry.PIPELINES_RUNNING.set_function(_running_count)
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+class VideoPipeline:
+    """
+    Processes a video as a chain of stages connected by bounded queues:
+
+        decode -> sample -> metadata (OCR) -> detect -> encode
+
+    Each stage runs on its own thread; OCR and encoding additionally fan out
+    to small thread pools. OpenCV, torch and the network calls release the
+    GIL, so the stages overlap instead of running one after another. Results
+    are yielded in frame order as soon as they are ready.
+
+    With a tracker (see tracking.PotholeTracker) every detected frame goes
+    through it and only the best frame of each tracked pothole is encoded,
+    once its track has ended, so results follow track ends rather than
+    strict frame order.
+    """
+
+    def __init__(self, source_path, detector, detector_lock, extract_infos, encode,
+                 sampler=None, batch_size=8, queue_size=32, ocr_workers=4,
+                 ocr_batch_size=8, encode_workers=2, should_stop=None, on_progress=None,
+                 overlay_changed=None, tracker=None, open_capture=None, trace=None):
+        self.source_path = source_path
+        # open_capture(should_stop) returns a cv2.VideoCapture-like object, or None to
+        # stop without frames; used to decode an upload that is still arriving
+        self.open_capture = open_capture or (lambda should_stop: cv2.VideoCapture(source_path))
+        self.detector = detector
+        self.detector_lock = detector_lock
+        # extract_infos(frames) returns the overlay info of each frame
+        self.extract_infos = extract_infos
+        self.encode = encode
+        self.sampler = sampler or FrameSampler()
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.ocr_workers = ocr_workers
+        self.ocr_batch_size = ocr_batch_size
+        self.encode_workers = encode_workers
+        self.should_stop = should_stop or (lambda: False)
+        # Called as on_progress(frames_processed, frames_expected) after each sampled frame
+        self.on_progress = on_progress
+        # overlay_changed(frame) returns False when the overlay text can't have changed since the
+        # previous sampled frame; such frames skip OCR and inference and reuse the last info
+        self.overlay_changed = overlay_changed
+        self.tracker = tracker
+        # Per-job spans (telemetry.Trace); the null trace records nothing
+        self.trace = trace or telemetry.NULL_TRACE
+
+        self._queues = {}
+        self._stop = threading.Event()
+        self._error = None
+
+    def __iter__(self):
+        decoded = queue.Queue(self.queue_size)
+        sampled = queue.Queue(self.queue_size)
+        with_info = queue.Queue(self.queue_size)
+        detected = queue.Queue(self.queue_size)
+        encoded = queue.Queue(self.queue_size)
+        self._queues = {'decoded': decoded, 'sampled': sampled, 'with_info': with_info, 'detected': detected, 'encoded': encoded}
+
+        ocr_pool = ThreadPoolExecutor(max_workers=self.ocr_workers)
+        encode_pool = ThreadPoolExecutor(max_workers=self.encode_workers)
+        stages = [
+            threading.Thread(target=self._run_stage, args=(self._decode, None, decoded), name='pipeline-decode', daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._sample, decoded, sampled), name='pipeline-sample', daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._extract_metadata, sampled, with_info, ocr_pool), name='pipeline-metadata', daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._detect, with_info, detected), name='pipeline-detect', daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._encode, detected, encoded, encode_pool), name='pipeline-encode', daemon=True),
+        ]
+        with _running_lock:
+            _running.add(self)
+        for stage in stages:
+            stage.start()
+
+        try:
+            while True:
+                item = self._get(encoded)
+                if item is _DONE:
+                    break
+                yield item.result()
+        except PipelineStopped:
+            pass
+        finally:
+            # Unblock every stage if the consumer stops early (client gone, error, cancel)
+            self._stop.set()
+            for stage in stages:
+                stage.join(timeout=5)
+            ocr_pool.shutdown(wait=False, cancel_futures=True)
+            encode_pool.shutdown(wait=False, cancel_futures=True)
+            with _running_lock:
+                _running.discard(self)
+
+        if self._error is not None:
+            raise self._error
+
+    def _stopped(self):
+        return self._stop.is_set() or self.should_stop()
+
+    def _put(self, q, item):
+        while True:
+            if self._stop.is_set():
+                raise PipelineStopped()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q):
+        while True:
+            if self._stop.is_set():
+                raise PipelineStopped()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _items(self, q):
+        # Iterate a stage's input queue until the upstream stage finishes
+        while True:
+            item = self._get(q)
+            if item is _DONE:
+                return
+            yield item
+
+    def _run_stage(self, stage, in_q, out_q, *args):
+        try:
+            with self.trace.span(stage.__name__.lstrip('_')):
+                if in_q is None:
+                    stage(out_q, *args)
+                else:
+                    stage(in_q, out_q, *args)
+            self._put(out_q, _DONE)
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            self._error = e
+            self._stop.set()
+
+    def _decode(self, out_q):
+        # The sampler only fully decodes the frames it picks and skips the rest
+        cap = self.open_capture(self._stopped)
+        if cap is None:
+            return
+        try:
+            for index, frame in self.sampler.read(cap, self.source_path, self._stopped):
+                self._put(out_q, (index, frame))
+        finally:
+            cap.release()
+
+    def _sample(self, in_q, out_q):
+        for index, frame in self._items(in_q):
+            if self.sampler.accept(index, frame):
+                telemetry.FRAMES_SAMPLED.inc()
+                self._put(out_q, (index, frame))
+
+    def _extract_metadata(self, in_q, out_q, pool):
+        # Frames already waiting are OCR'd together; batches run concurrently
+        # on the pool and their futures are passed on in frame order
+        items = self._items(in_q)
+        finished = False
+        while not finished:
+            batch = []
+            for item in self._take_available(items, in_q, self.ocr_batch_size):
+                if item is _DONE:
+                    finished = True
+                    break
+                index, frame = item
+                if self.overlay_changed is not None and not self.overlay_changed(frame):
+                    self._submit_ocr(pool, batch, out_q)
+                    batch = []
+                    self._put(out_q, (index, frame, None, None))
+                else:
+                    batch.append(item)
+            self._submit_ocr(pool, batch, out_q)
+
+    def _submit_ocr(self, pool, batch, out_q):
+        if not batch:
+            return
+        future = pool.submit(self._traced_extract_infos, [frame for _, frame in batch])
+        for position, (index, frame) in enumerate(batch):
+            self._put(out_q, (index, frame, future, position))
+
+    def _traced_extract_infos(self, frames):
+        with self.trace.span('ocr_batch', frames=len(frames)):
+            return self.extract_infos(frames)
+
+    def _take_available(self, items, in_q, limit):
+        # Block for the next item, then take whatever else is already waiting, up to limit
+        taken = [next(items, _DONE)]
+        while len(taken) < limit and taken[-1] is not _DONE and not in_q.empty():
+            taken.append(next(items, _DONE))
+        return taken
+
+    def _detect(self, in_q, out_q):
+        last_info = {}
+        batch = []
+        processed = 0
+        items = self._items(in_q)
+        finished = False
+        while not finished:
+            # Take whatever frames are already waiting so batches grow under
+            # load without delaying a lone frame
+            for item in self._take_available(items, in_q, max(self.batch_size - len(batch), 1)):
+                if item is _DONE:
+                    finished = True
+                    break
+                index, frame, info_future, position = item
+                processed += 1
+                if self.on_progress:
+                    self.on_progress(processed, self.sampler.expected_count)
+                if info_future is None:
+                    # Overlay unchanged, so the position is the same as last time
+                    telemetry.FRAMES_DROPPED.inc(reason='overlay_unchanged')
+                    continue
+                info = info_future.result()[position]
+                # Skip frames where the vehicle hasn't moved since the last sampled frame
+                moved = info.get("latitude") != last_info.get("latitude") or info.get("longitude") != last_info.get("longitude")
+                last_info = info
+                if moved:
+                    batch.append((index, frame, info))
+                else:
+                    telemetry.FRAMES_DROPPED.inc(reason='not_moved')
+
+            if batch and (finished or len(batch) >= self.batch_size or in_q.empty()):
+                if self._stopped():
+                    return
+                with self.trace.span('detect_batch', frames=len(batch)):
+                    with self.detector_lock:
+                        batch_detections = self.detector.predict([frame for _, frame, _ in batch])
+                for (index, frame, info), detections in zip(batch, batch_detections):
+                    if len(detections) == 0:
+                        telemetry.FRAMES_DROPPED.inc(reason='no_detections')
+                    if self.tracker is not None:
+                        # Frames without detections still age the tracks
+                        for tracked in self.tracker.update(index, frame, detections, info):
+                            self._put(out_q, tracked)
+                    elif len(detections) != 0:
+                        self._put(out_q, (index, frame, detections, info))
+                batch = []
+
+        if self.tracker is not None:
+            for tracked in self.tracker.flush():
+                self._put(out_q, tracked)
+
+    def _encode(self, in_q, out_q, pool):
+        for index, frame, detections, info in self._items(in_q):
+            self._put(out_q, pool.submit(self._traced_encode, frame, detections, info))
+
+    def _traced_encode(self, frame, detections, info):
+        with self.trace.span('encode_frame', detections=len(detections)):
+            return self.encode(frame, detections, info)
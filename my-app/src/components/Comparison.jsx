@@ -17,6 +17,7 @@ const Comparison = () => {
   const [currentImageIndex, setCurrentImageIndex] = useState(0); // State to track the current image index
   const [selectedImageIndex, setSelectedImageIndex] = useState(null); // State to track the selected image index
   const [currentResults, setCurrentResults] = useState(null); // State to track which results are currently being viewed
+  const [comparisonStats, setComparisonStats] = useState(null); // Per-model latency and agreement from the server
 
   const handleFileChange = (e) => {
     const selectedFile = e.target.files[0];
@@ -27,16 +28,34 @@ const Comparison = () => {
     }
   };
 
-  const handleDetection = async (model, setResults) => {
+  // Split the aligned per-frame results of /compare-models into one result list per model
+  const resultsForModel = (frames, model) => ({
+    frames: frames
+      .filter((frame) => frame.models[model].detections_count > 0)
+      .map((frame) => ({ info: frame.info, ...frame.models[model] })),
+  });
+
+  const handleSubmit = async () => {
+    // Prevent submission if models are the same or not selected
+    if (selectedModel1 === selectedModel2) {
+      alert('Please select different models for comparison.');
+      return;
+    }
+    if (!selectedModel1 || !selectedModel2) {
+      alert('Please select both models before proceeding.');
+      return;
+    }
     if (!file) return;
 
+    // One request runs both models on the same decoded frames
     try {
       setIsProcessing(true);
       const formData = new FormData();
       formData.append('file', file);
-      formData.append('model', model);
+      formData.append('models', selectedModel1);
+      formData.append('models', selectedModel2);
 
-      const response = await fetch('http://localhost:5000/detect-potholes', {
+      const response = await fetch('http://localhost:5000/compare-models', {
         method: 'POST',
         body: formData,
       });
@@ -46,7 +65,11 @@ const Comparison = () => {
       }
 
       const results = await response.json();
-      setResults(results);
+      setDetectionResultsModel1(resultsForModel(results.frames, selectedModel1));
+      setDetectionResultsModel2(resultsForModel(results.frames, selectedModel2));
+      setComparisonStats(results.stats);
+      setIsPanelOpen(true);
+      setShowResults(true); // Automatically show results when detection is complete
     } catch (error) {
       console.error('Error during detection:', error);
       alert('Failed to process the file');
@@ -55,24 +78,6 @@ const Comparison = () => {
     }
   };
 
-  const handleSubmit = async () => {
-    // Prevent submission if models are the same or not selected
-    if (selectedModel1 === selectedModel2) {
-      alert('Please select different models for comparison.');
-      return;
-    }
-    if (!selectedModel1 || !selectedModel2) {
-      alert('Please select both models before proceeding.');
-      return;
-    }
-
-    // Trigger detection for both models
-    await handleDetection(selectedModel1, setDetectionResultsModel1);
-    await handleDetection(selectedModel2, setDetectionResultsModel2);
-    setIsPanelOpen(true);
-    setShowResults(true); // Automatically show results when detection is complete
-  };
-
   const ResultsPanel = ({ results1, results2, isOpen, onClose }) => {
     if (!isOpen || (!results1 && !results2)) return null;
 
@@ -85,10 +90,20 @@ const Comparison = () => {
         />
           <div className="flex justify-between items-center mb-4">
             <h2 className="text-xl font-bold">Comparison Results</h2>
+            {comparisonStats && comparisonStats.agreement.length > 0 && (
+              <span className="text-sm text-gray-600">
+                Agreement (F1): {comparisonStats.agreement[0].f1}
+              </span>
+            )}
           </div>
           <div className="flex">
             <div className="w-1/2 p-2">
               <h3 className="font-bold">Model 1: {selectedModel1}</h3>
+              {comparisonStats?.models[selectedModel1] && (
+                <p className="text-sm text-gray-600 mb-2">
+                  {comparisonStats.models[selectedModel1].mean_latency_ms} ms/frame · {comparisonStats.models[selectedModel1].detections} detections
+                </p>
+              )}
               <table className="min-w-full border-collapse border border-gray-300">
                 <thead>
                   <tr>
@@ -122,6 +137,11 @@ const Comparison = () => {
             </div>
             <div className="w-1/2 p-2">
               <h3 className="font-bold">Model 2: {selectedModel2}</h3>
+              {comparisonStats?.models[selectedModel2] && (
+                <p className="text-sm text-gray-600 mb-2">
+                  {comparisonStats.models[selectedModel2].mean_latency_ms} ms/frame · {comparisonStats.models[selectedModel2].detections} detections
+                </p>
+              )}
               <table className="min-w-full border-collapse border border-gray-300">
                 <thead>
                   <tr>
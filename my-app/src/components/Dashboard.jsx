@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import {APIProvider, Map, AdvancedMarker, Pin, InfoWindow} from '@vis.gl/react-google-maps';
 import { Bar } from 'react-chartjs-2';
 import { Chart, registerables } from 'chart.js';
@@ -10,14 +10,25 @@ const Dashboard = () => {
   const [uniqueRecentDetections, setUniqueRecentDetections] = useState([]);
   const [selectedPothole, setSelectedPothole] = useState(null);
   const [potholeImage, setPotholeImage] = useState(null);
+  const [clusters, setClusters] = useState([]);
+  const clusterRequest = useRef(null);
   const apiKey = import.meta.env.VITE_GOOGLE_MAPS_API_KEY;
   const mapID = import.meta.env.VITE_GOOGLE_MAPS_ID;
 
   useEffect(() => {
     const fetchPotholeData = async () => {
       try {
-        const response = await fetch('http://localhost:5000/get-pothole-data');
-        const data = await response.json();
+        // Page through the metadata; images are fetched when a marker is opened
+        const data = [];
+        let cursor = null;
+        do {
+          const params = new URLSearchParams({ limit: '1000' });
+          if (cursor) params.set('cursor', cursor);
+          const response = await fetch(`http://localhost:5000/get-pothole-data?${params}`);
+          const page = await response.json();
+          data.push(...page.items);
+          cursor = page.next_cursor;
+        } while (cursor);
         setPotholeData(data);
         const recentDetections = await getUniqueRecentDetections(data);
         setUniqueRecentDetections(recentDetections);
@@ -51,9 +62,6 @@ const Dashboard = () => {
       const key = `${city}, ${state}`;
       pothole.info.city = city;
       pothole.info.state = state;
-      const imageUrl = String(pothole.image).split('?')[0];
-      pothole.image = `${imageUrl}?${import.meta.env.VITE_AZURE_SAS_TOKEN}`;
-      console.log(pothole.image)
       if (!uniqueLocations[key] && city && state) {
         uniqueLocations[key] = { ...pothole, city, state };
       }
@@ -99,10 +107,29 @@ const Dashboard = () => {
     lng: 101.6869
   };
 
-  const markers = potholeData.map((pothole, index) => ({
-    key: index.toString(),
-    location: { lat: pothole.info.latitude, lng: pothole.info.longitude },
-    image: pothole.image
+  // The map shows server-side clusters for the current viewport instead of every pothole
+  const fetchClusters = (zoom, bounds) => {
+    clearTimeout(clusterRequest.current);
+    clusterRequest.current = setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({
+          zoom: String(zoom),
+          bbox: [bounds.west, bounds.south, bounds.east, bounds.north].join(','),
+        });
+        const response = await fetch(`http://localhost:5000/pothole-clusters?${params}`);
+        const data = await response.json();
+        setClusters(data.clusters ?? []);
+      } catch (error) {
+        console.error('Error fetching pothole clusters:', error);
+      }
+    }, 300);
+  };
+
+  const markers = clusters.map((cluster) => ({
+    key: cluster.geohash,
+    id: cluster.sample_id,
+    count: cluster.potholes,
+    location: { lat: cluster.latitude, lng: cluster.longitude }
   }));
 
   const getPotholeCounts = (data) => {
@@ -140,8 +167,15 @@ const Dashboard = () => {
     }],
   };
 
-  const handleMarkerClick = (imageUrl) => {
-    setPotholeImage(imageUrl);
+  const handleMarkerClick = async (potholeId) => {
+    try {
+      const response = await fetch(`http://localhost:5000/get-pothole-data/${potholeId}/image`);
+      const { image } = await response.json();
+      const imageUrl = String(image).split('?')[0];
+      setPotholeImage(`${imageUrl}?${import.meta.env.VITE_AZURE_SAS_TOKEN}`);
+    } catch (error) {
+      console.error('Error fetching pothole image:', error);
+    }
   };
   
 
@@ -208,6 +242,7 @@ const Dashboard = () => {
             scrollwheel={true}
             defaultZoom={9}
             draggable={true}
+            onCameraChanged={(event) => fetchClusters(event.detail.zoom, event.detail.bounds)}
           >
             {markers.map(marker => (
               <AdvancedMarker
@@ -215,10 +250,10 @@ const Dashboard = () => {
                 position={marker.location}
                 onClick={() => {
                   setSelectedPothole(marker);
-                  handleMarkerClick(marker.image);
+                  handleMarkerClick(marker.id);
                 }}
               >
-                <Pin background={'#FBBC04'} glyphColor={'#000'} borderColor={'#000'} />
+                <Pin background={'#FBBC04'} glyphColor={'#000'} borderColor={'#000'} glyph={String(marker.count)} />
               </AdvancedMarker>
             ))}
             {selectedPothole && potholeImage && (
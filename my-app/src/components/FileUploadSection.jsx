@@ -2,6 +2,53 @@ import React, { useState } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { uploadToBlob } from '../services/azureStorage'; // Import the uploadToBlob function
 
+// Read an NDJSON response line by line and pass each parsed event to onEvent
+const readDetectionStream = async (response, onEvent) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    for (const line of lines) {
+      if (line.trim()) onEvent(JSON.parse(line));
+    }
+  }
+  if (buffer.trim()) onEvent(JSON.parse(buffer));
+};
+
+const UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024;
+
+// Send a file to an upload session chunk by chunk. After a failed chunk the
+// server's offset says where to resume, so nothing is sent twice.
+const uploadInChunks = async (file, uploadId) => {
+  let offset = 0;
+  let failures = 0;
+  while (offset < file.size) {
+    try {
+      const response = await fetch(`http://localhost:5000/uploads/${uploadId}`, {
+        method: 'PATCH',
+        headers: { 'Upload-Offset': String(offset) },
+        body: file.slice(offset, offset + UPLOAD_CHUNK_SIZE),
+      });
+      const status = await response.json();
+      if (!response.ok && response.status !== 409) {
+        throw new Error(status.error);
+      }
+      offset = status.offset;
+      failures = 0;
+    } catch (error) {
+      if (++failures > 3) throw error;
+      const response = await fetch(`http://localhost:5000/uploads/${uploadId}`);
+      offset = (await response.json()).offset;
+    }
+  }
+};
+
 const FileUploadSection = () => {
   const [file, setFile] = useState(null);
   const [preview, setPreview] = useState(null);
@@ -13,6 +60,7 @@ const FileUploadSection = () => {
   const [showDetailModal, setShowDetailModal] = useState(false);
   const [selectedImageIndex, setSelectedImageIndex] = useState(null);
   const [isDetectionStopped, setIsDetectionStopped] = useState(false);
+  const [jobId, setJobId] = useState(null);
 
 
   const handleFileChange = (e) => {
@@ -29,38 +77,84 @@ const FileUploadSection = () => {
   const handleDetection = async () => {
     if (!file) return;
 
+    const detection = new AbortController();
+    let uploadId = null;
     try {
       setIsProcessing(true);
       setIsDetectionStopped(false);
       
+      // Open an upload session, then send the chunks while detection already runs on them
+      const sessionResponse = await fetch('http://localhost:5000/uploads', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ filename: file.name, size: file.size }),
+      });
+      if (!sessionResponse.ok) {
+        throw new Error('Failed to start upload');
+      }
+      ({ upload_id: uploadId } = await sessionResponse.json());
+      const uploading = uploadInChunks(file, uploadId);
+      // Stop reading results as soon as the upload fails; the catch below cleans up
+      uploading.catch(() => detection.abort());
+
       const formData = new FormData();
-      formData.append('file', file);
+      formData.append('upload_id', uploadId);
       formData.append('model', selectedModel);
+      formData.append('stream', 'ndjson');
 
       const response = await fetch('http://localhost:5000/detect-potholes', {
         method: 'POST',
         body: formData,
+        signal: detection.signal,
       });
 
       if (!response.ok) {
         throw new Error('Detection failed');
       }
 
-      const results = await response.json();
-      setDetectionResults(results);
+      // Results arrive as one JSON object per line, show each frame as soon as it is ready
+      setDetectionResults({ frames: [] });
       setIsPanelOpen(true);
+      await Promise.all([uploading, readDetectionStream(response, (event) => {
+        if (event.type === 'job') {
+          setJobId(event.job_id);
+        } else if (event.type === 'frame') {
+          const { type, ...frame } = event;
+          setDetectionResults(prevResults => ({
+            ...prevResults,
+            frames: [frame, ...(prevResults?.frames ?? [])]
+          }));
+        } else if (event.type === 'error') {
+          throw new Error(event.error);
+        }
+      })]);
     } catch (error) {
+      // Drop the upload session, otherwise the server job waits for the missing chunks until it
+      // expires, and close the result stream, which cancels the job
+      if (uploadId) {
+        fetch(`http://localhost:5000/uploads/${uploadId}`, { method: 'DELETE' }).catch(() => {});
+      }
+      detection.abort();
       console.error('Error during detection:', error);
       alert('Failed to process the file');
     } finally {
       setIsProcessing(false);
+      setJobId(null);
     }
   };
 
   const handleStopDetection = async () => {
+    if (!jobId) return;
+
     try {
       const response = await fetch('http://localhost:5000/stop-detection', {
         method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ job_id: jobId }),
       });
 
       if (!response.ok) {
@@ -271,7 +365,7 @@ const FileUploadSection = () => {
 
     return (
       <AnimatePresence>
-        {isOpen && !isProcessing && (
+        {isOpen && (
           <div
             className="fixed bottom-0 left-0 right-0 bg-white rounded-t-2xl shadow-lg"
             style={{ height: '80vh', zIndex: 10 }}
@@ -457,11 +551,7 @@ const FileUploadSection = () => {
       </div>
 
       <button
-        onClick={() => {
-          if (!isProcessing) {
-            setIsPanelOpen(!isPanelOpen);
-          }
-        }}
+        onClick={() => setIsPanelOpen(!isPanelOpen)}
         className="fixed bottom-0 left-0 right-0 bg-white shadow-[0_-4px_6px_-1px_rgba(0,0,0,0.1)] z-10 p-2 flex flex-col items-center gap-1"
       >
         <div className="w-12 h-1.5 bg-gray-300 rounded-full mx-auto cursor-pointer" />